@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Optional, List, Dict
 import os
 from dotenv import load_dotenv
 
@@ -13,6 +13,7 @@ class Settings(BaseSettings):
     PORT: int = 8000
     # 文件存储设置
     REVIEWS_SAVE_PATH: str = "data/reviews"
+    STORAGE_PATH: str = ""  # 任务结果存储目录，为空时使用 SmartReviewX/storage
     
     # API配置
     API_V1_STR: str = "/api/v1"
@@ -36,6 +37,12 @@ class Settings(BaseSettings):
     LLM_MAX_TOKENS: int = 2000
     LLM_FREQUENCY_PENALTY: float = 0.0
     LLM_PRESENCE_PENALTY: float = 0.0
+    LLM_TIMEOUT: float = 60.0  # 单次LLM调用的超时（秒），请求剩余时间更少时取剩余时间
+    
+    # LLM端点熔断配置（每个端点一个熔断器，生成、质量检查、增强共享）
+    CIRCUIT_BREAKER_ENABLED: bool = True
+    CIRCUIT_BREAKER_FAILURE_THRESHOLD: int = 5  # 连续失败（连接失败、超时、5xx）达到该次数后熔断
+    CIRCUIT_BREAKER_RECOVERY_TIMEOUT: float = 30.0  # 熔断后经过该秒数放行一个探测调用
     
     # 评价生成配置
     MAX_REVIEW_LENGTH: int = 1000
@@ -43,6 +50,68 @@ class Settings(BaseSettings):
     MAX_RETRIES: int = 3
     QUALITY_THRESHOLD: float = 0.8
     SENTIMENT_THRESHOLD: float = 0.8
+    PROMPT_TOKEN_BUDGET: int = 1500  # 生成提示词的token预算，超出时按类别字段优先级压缩产品信息，0表示不压缩
+    ADAPTIVE_MAX_TOKENS: bool = True  # 根据 MAX_REVIEW_LENGTH 估算生成的输出token上限（不超过 LLM_MAX_TOKENS）
+    GENERATION_CANDIDATES_PER_CALL: int = 1  # 每次LLM调用生成的评价条数，大于1时同一请求的多条评价共享一次提示词
+    GENERATION_CANDIDATES_MODE: str = "array"  # array: 提示词要求返回评价数组；n: 使用API的n参数（端点需支持）
+    
+    # 生成语义缓存配置（同一产品、用户背景相近的请求复用已生成的评价，适合可以容忍重复的数据集构建）
+    SEMANTIC_CACHE_ENABLED: bool = False
+    SEMANTIC_CACHE_THRESHOLD: float = 0.95  # 用户背景向量的余弦相似度阈值（默认只有地区、使用频率不同时命中）
+    SEMANTIC_CACHE_HIT_RATIO: float = 1.0  # 找到相似评价时复用的概率，其余请求照常生成并加入缓存
+    SEMANTIC_CACHE_MAX_REUSE: int = 3  # 每条缓存评价最多复用的次数，达到后移出缓存
+    SEMANTIC_CACHE_SIZE: int = 2000  # 每个类别缓存的评价数上限（LRU淘汰）
+    
+    # max_tokens 自动调整配置（按调用点统计实际 completion token 数）
+    MAX_TOKENS_AUTO_TUNE: bool = True
+    MAX_TOKENS_MIN_SAMPLES: int = 50  # 调用点样本数达到该值后才自动调整
+    MAX_TOKENS_PERCENTILE: float = 0.99  # 以实际用量的该分位数为基准
+    MAX_TOKENS_MARGIN: float = 0.2  # 在分位数基础上增加的余量比例
+    TOKEN_STATS_WINDOW: int = 1000  # 每个调用点保留的最近样本数
+    
+    # LLM调用延迟统计配置（按调用点统计成功调用的耗时，进程内）
+    LATENCY_STATS_WINDOW: int = 500  # 每个调用点保留的最近样本数
+    LATENCY_MIN_SAMPLES: int = 20  # 调用点样本数达到该值后才使用延迟分位数
+    LLM_LATENCY_PERCENTILE: float = 0.95  # 以该分位数作为一次调用的预期耗时：剩余时间不足时跳过该调用（对冲调用的等待时间见 HEDGE_PERCENTILE）
+    GENERATION_HEDGE_ENABLED: bool = False  # 首次生成的对冲调用改为简化上下文生成（不受 HEDGE_ENABLED 影响），先得到可用评价的一方胜出
+    
+    # LLM请求对冲配置（调用超过耗时分位数仍未返回时发起重复调用，先成功的一方胜出）
+    HEDGE_ENABLED: bool = False
+    HEDGE_PERCENTILE: float = 0.95  # 调用超过调用点耗时的该分位数仍未返回时发起对冲调用
+    HEDGE_BUDGET_RATIO: float = 0.05  # 对冲调用占可对冲调用数的比例上限
+    HEDGE_BUDGET_BURST: float = 10.0  # 对冲预算最多积攒的次数
+    HEDGE_API_BASE: str = ""  # 对冲调用的备用端点，为空时发往同一端点
+    HEDGE_API_KEY: str = ""  # 为空时使用 OPENAI_API_KEY3
+    HEDGE_API_MODEL: str = ""  # 为空时使用主调用的模型
+    
+    # 质量检查预筛选配置
+    PRE_FILTER_ENABLED: bool = True
+    PRE_FILTER_REJECT_THRESHOLD: float = 0.5  # 启发式得分低于该值直接拒绝，不再调用LLM
+    
+    # 质量门控生成配置
+    QUALITY_GATE_MAX_REGENERATIONS: int = 2  # 低于QUALITY_THRESHOLD的评价最多重新生成的轮数
+    
+    # 级联质量检查配置
+    QUALITY_CASCADE_ENABLED: bool = False
+    QUALITY_CASCADE_ORDER: List[str] = ["真实性", "一致性", "具体性", "语言自然度"]
+    QUALITY_CASCADE_CUTOFFS: Dict[str, float] = {"真实性": 2.0}  # 维度评分低于该值时跳过剩余维度和分析报告
+    
+    # 质量分析报告配置
+    QUALITY_ANALYSIS_MODE: str = "eager"  # eager: 同步生成；lazy: 按需生成；background: 后台生成并缓存
+    BATCH_QUALITY_ANALYSIS_MODE: str = "lazy"  # 批量质量检查默认不同步生成分析报告
+    ANALYSIS_CACHE_SIZE: int = 10000  # 缓存的待生成/已生成分析报告数量上限
+    
+    # 质量趋势配置
+    QUALITY_TRENDS_ENABLED: bool = True  # 将每条质量检查结果追加到按天分区的时间序列存储
+    QUALITY_TRENDS_PATH: str = ""  # 时间序列存储目录，为空时使用存储目录下的 trends
+    PROMPT_VERSION: str = "v1"  # 生成提示词版本，修改提示词后更新，质量趋势按版本区分
+    
+    # 离线批处理配置
+    BATCH_BACKEND: str = "provider"  # provider: OpenAI兼容的批处理接口；local: 本地逐条调用的替身
+    BATCH_API_BASE: str = ""  # 为空时使用 OPENAI_API_BASE3
+    BATCH_API_KEY: str = ""  # 为空时使用 OPENAI_API_KEY3
+    BATCH_COMPLETION_WINDOW: str = "24h"
+    BATCH_POLL_INTERVAL: int = 30  # 批处理任务状态轮询间隔（秒）
     
     # 数据库配置
     DATABASE_URL: str = "sqlite:///./data.db"
@@ -57,8 +126,30 @@ class Settings(BaseSettings):
     TOP_P: float = 0.9
     
     # 异步任务配置
-    TASK_TIMEOUT: int = 300  # 5分钟
-    TASK_CLEANUP_INTERVAL: int = 3600  # 1小时
+    TASK_TIMEOUT: int = 300  # 5分钟，同步接口（生成、增强、质量检查）的默认请求截止时间
+    REQUEST_DEADLINE_RESERVE: float = 2.0  # 为降级策略和保存结果预留的秒数，剩余时间不足时不再发起LLM调用
+    TASK_CLEANUP_INTERVAL: int = 3600  # 1小时，过期任务的清理间隔，0表示不清理
+    TASK_RESULT_TTL: int = 86400  # 已结束任务在任务存储中保留的秒数，可按任务通过 ttl 参数覆盖
+    TASK_STALE_TIMEOUT: int = 172800  # 2天，处理中的任务从开始起超过该时间仍未结束视为已中断（如服务重启），清理时标记为失败；需大于离线批处理的完成时限（24小时）
+    TASK_ARCHIVE_PATH: str = ""  # 过期任务的归档目录（gzip NDJSON），为空时使用存储目录下的 archive
+    
+    # 任务进度通知配置
+    TASK_EVENTS_POLL_INTERVAL: float = 2.0  # 进度流无新事件时读取任务存储的间隔（秒），同时作为心跳
+    TASK_CALLBACK_ALLOWED_HOSTS: List[str] = ["127.0.0.1", "localhost"]  # 允许的完成回调主机（只允许本地回调），为空时不接受回调
+    TASK_CALLBACK_TIMEOUT: float = 5.0  # 单次回调请求超时（秒）
+    TASK_CALLBACK_RETRIES: int = 3  # 回调失败时的最多尝试次数
+    
+    # 日志配置
+    LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: str = "text"  # text: 文本格式；json: 单行JSON结构化日志
+    LOG_FILE: str = "app.log"  # 为空时只输出到控制台
+    LOG_PROGRESS_EVERY: int = 10  # 逐条处理的进度日志每隔多少条记录一次
+    
+    # 部署配置
+    WARMUP_ON_STARTUP: bool = True  # 启动后在后台初始化单例并导入重量级模块，完成前 /ready 返回503
+    WORKERS: int = 1  # 工作进程数，大于1时任务存储强制使用 sqlite
+    TASK_STORE_BACKEND: str = "json"  # json: 单进程JSON文件；sqlite: 多进程共享的SQLite（WAL模式）
+    TASK_STORE_PATH: str = ""  # SQLite数据库路径，为空时使用存储目录下的 tasks.db
     
     
     class Config:
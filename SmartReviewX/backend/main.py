@@ -3,18 +3,17 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 import logging
 import sys
-from backend.service.routes import app
 from backend.config import settings
+from backend.utils.log_config import setup_logging
 
-# 配置日志
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(sys.stdout),  # 使用stdout而不是默认的stderr
-        logging.FileHandler('app.log', encoding='utf-8')  # 指定文件编码为utf-8
-    ]
-)
+# 配置日志（队列+后台写入线程，需在导入路由之前完成，以便记录初始化日志）
+setup_logging()
+
+from backend.utils.lazy import startup_profile
+
+with startup_profile.measure("import:backend.service.routes"):
+    from backend.service.routes import app
+from backend.utils.call_stats import token_tracker
 
 # 设置控制台输出编码
 if sys.platform == 'win32':
@@ -42,14 +41,16 @@ async def startup_event():
 async def shutdown_event():
     """应用关闭时的清理操作"""
     logger.info("Application shutting down...")  # 使用英文消息避免编码问题
+    token_tracker.save()
     # 这里可以添加数据库断开连接等清理操作
 
 if __name__ == "__main__":
-    # 启动应用
+    # 启动应用（多进程时各工作进程通过SQLite任务存储共享状态，热重载只支持单进程）
     uvicorn.run(
         "main:app",
         host=settings.HOST,
         port=settings.PORT,
-        reload=settings.DEBUG,  # 开发模式下启用热重载
+        workers=settings.WORKERS,
+        reload=settings.DEBUG and settings.WORKERS == 1,  # 开发模式下启用热重载
         log_level="info"
     ) 
\ No newline at end of file
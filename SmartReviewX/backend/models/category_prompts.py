@@ -122,6 +122,15 @@ class CategoryPromptTemplate:
 
 请以JSON格式返回评价结果。"""
 
+    @staticmethod
+    def multi_review_instruction(count: int) -> str:
+        """一次生成多条评价时追加到提示词末尾的要求"""
+        return f"""
+
+【多条评价】
+请为上述用户背景生成{count}条互不相同的评价：各条评价的关注点、使用场景、评分和语气应有所区别，不要改写同一条评价。
+以JSON对象返回，格式为 {{"reviews": [评价1, 评价2, ...]}}，数组中恰好{count}条评价，每条评价都是包含上述全部字段的JSON对象。"""
+
 class ElectronicsPromptTemplate(CategoryPromptTemplate):
     """电子产品提示词模板"""
     @staticmethod
@@ -69,15 +69,19 @@ class GeneratedReview(BaseModel):
     sentiment_score: float = Field(..., description="情感置信评分")
     quality_score: float = Field(..., description="质量置信评分")
     timeliness_analysis: Optional[Dict] = None
+    generation_tier: Optional[str] = Field(None, description="生成层级：primary/reduced_context/template/fallback/cache")
 
 class ReviewGenerationRequest(BaseModel):
     user_background: UserBackground
     product_info: ProductInfo
     num_reviews: int = Field(default=1, ge=1, le=10, description="生成评价数量")
+    quality_gate: bool = Field(default=False, description="是否启用质量门控，低于质量阈值的评价自动重新生成")
+    timeout: Optional[float] = Field(default=None, gt=0, description="请求截止时间（秒），默认读取配置 TASK_TIMEOUT")
 
 class ReviewGenerationResponse(BaseModel):
     reviews: List[GeneratedReview]
     generation_time: float 
+    quality_gate: Optional[Dict[str, Any]] = Field(None, description="质量门控统计信息，仅在启用质量门控时返回")
     
 class AsyncTask(BaseModel):
     task_id: str
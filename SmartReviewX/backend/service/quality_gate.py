@@ -0,0 +1,135 @@
+from typing import List, Dict, Any, Tuple
+from ..models.data_model import UserBackground, ProductInfo, GeneratedReview
+from ..utils.pre_filter import ReviewPreFilter
+from ..utils.log_config import should_log_progress
+from ..utils.deadline import DeadlineExceeded, llm_call_timeout
+from ..config import settings
+from .category_generators import BaseReviewGenerator
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+class QualityGate:
+    """质量门控：生成与低成本质量评分流水线并行，低于阈值的评价自动重新生成"""
+
+    def __init__(self, max_regenerations: int = None):
+        """
+        初始化质量门控
+
+        Args:
+            max_regenerations: 最多重新生成的轮数，默认读取配置
+        """
+        self.pre_filter = ReviewPreFilter()
+        self.max_regenerations = (
+            settings.QUALITY_GATE_MAX_REGENERATIONS if max_regenerations is None else max_regenerations
+        )
+
+    def score(self, review: GeneratedReview) -> Dict[str, Any]:
+        """
+        计算评价的低成本质量评分（不调用LLM）
+
+        质量分取本地启发式得分与模型自评质量分中的较小值，
+        并与 QUALITY_THRESHOLD、SENTIMENT_THRESHOLD 比较。
+
+        Args:
+            review: 评价对象
+
+        Returns:
+            包含质量分、是否通过及原因的字典
+        """
+        pre_filter_result = self.pre_filter.evaluate(review)
+        quality = min(pre_filter_result["score"], review.quality_score)
+
+        reasons = list(pre_filter_result["reasons"])
+        if quality < settings.QUALITY_THRESHOLD:
+            reasons.append(f"质量分{quality:.2f}低于阈值{settings.QUALITY_THRESHOLD}")
+        if review.sentiment_score < settings.SENTIMENT_THRESHOLD:
+            reasons.append(f"情感置信评分{review.sentiment_score:.2f}低于阈值{settings.SENTIMENT_THRESHOLD}")
+
+        return {
+            "quality": round(quality, 4),
+            "passed": not reasons,
+            "reasons": reasons
+        }
+
+    async def generate(
+        self,
+        generator: BaseReviewGenerator,
+        user_background: UserBackground,
+        product_info: ProductInfo,
+        num_reviews: int
+    ) -> Tuple[List[GeneratedReview], Dict[str, Any]]:
+        """
+        生成指定数量的评价，并只对低于阈值的评价重新生成
+
+        第k条（批）评价的质量评分在后台线程中进行，与第k+1条（批）评价的生成重叠。
+
+        Args:
+            generator: 评价生成器
+            user_background: 用户背景信息
+            product_info: 产品信息
+            num_reviews: 需要生成的评价数量
+
+        Returns:
+            (评价列表, 质量门控统计信息)
+        """
+        best_reviews: List[GeneratedReview] = [None] * num_reviews
+        best_verdicts: List[Dict[str, Any]] = [None] * num_reviews
+        pending = list(range(num_reviews))
+        attempts = 0
+        # 同一请求不重复复用同一条语义缓存，未通过的评价重新生成时也不会再次得到它
+        cache_exclude = set()
+        per_call = max(1, settings.GENERATION_CANDIDATES_PER_CALL)
+
+        for round_index in range(self.max_regenerations + 1):
+            if round_index > 0:
+                # 请求剩余时间不足以调用LLM时不再重新生成，保留目前最好的评价
+                try:
+                    llm_call_timeout()
+                except DeadlineExceeded as e:
+                    logger.warning(f"停止重新生成: {str(e)}")
+                    break
+                # LLM端点熔断期间重新生成只能得到模板评价，不再重新生成
+                if not generator.circuit_breaker.available:
+                    logger.warning("LLM端点已熔断，停止重新生成")
+                    break
+            checks = []
+            # 每次生成 GENERATION_CANDIDATES_PER_CALL 条（默认逐条）
+            for start in range(0, len(pending), per_call):
+                indices = pending[start:start + per_call]
+                if should_log_progress(indices[0] + 1, num_reviews):
+                    logger.info(f"质量门控第 {round_index + 1} 轮：正在生成第 {indices[0] + 1}/{num_reviews} 条评价")
+                reviews = await asyncio.to_thread(
+                    generator.generate_reviews,
+                    user_background,
+                    product_info,
+                    len(indices),
+                    cache_exclude
+                )
+                attempts += len(indices)
+                # 后台评分，与下一批评价的生成重叠
+                for i, review in zip(indices, reviews):
+                    checks.append((i, review, asyncio.create_task(asyncio.to_thread(self.score, review))))
+
+            next_pending = []
+            for i, review, check in checks:
+                verdict = await check
+                if best_verdicts[i] is None or verdict["quality"] > best_verdicts[i]["quality"]:
+                    best_reviews[i] = review
+                    best_verdicts[i] = verdict
+                if not verdict["passed"]:
+                    logger.info(f"第 {i + 1} 条评价未通过质量门控: {verdict['reasons']}")
+                    next_pending.append(i)
+
+            pending = next_pending
+            if not pending:
+                break
+
+        stats = {
+            "attempts": attempts,
+            "regenerated": attempts - num_reviews,
+            "below_threshold": pending,
+            "scores": [verdict["quality"] for verdict in best_verdicts]
+        }
+        return best_reviews, stats
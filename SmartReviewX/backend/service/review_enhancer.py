@@ -1,26 +1,34 @@
-from openai import OpenAI
 from typing import List, Dict, Optional, Any
 from ..models.data_model import GeneratedReview
+from ..utils.call_stats import token_tracker, latency_tracker
+from ..utils.deadline import llm_call_timeout, llm_client
+from ..utils.circuit_breaker import circuit_breakers
+from ..utils.hedging import LLMTarget, hedger
 from ..config import settings
 import json
 import logging
 import asyncio
-import aiohttp
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
 
 logger = logging.getLogger(__name__)
 
 class ReviewEnhancer:
     """评价增强处理类"""
     
+    # 单次API调用的超时（秒），请求剩余时间更少时取剩余时间
+    REQUEST_TIMEOUT = 30.0
+    
     def __init__(self):
         """初始化评价增强器"""
-        # 初始化 OpenAI 客户端
+        # 初始化 OpenAI 客户端（延迟导入openai，加快服务启动）
+        from openai import OpenAI
         self.client = OpenAI(
             api_key=settings.OPENAI_API_KEY2,
             base_url=settings.OPENAI_API_BASE2,
-            timeout=30.0
+            timeout=self.REQUEST_TIMEOUT
         )
+        # 熔断期间增强直接失败，保留原有评价内容
+        self.circuit_breaker = circuit_breakers.get(self.client)
+        self.target = LLMTarget(self.client, self.circuit_breaker, "moonshot-v1-auto")
         self.search_api_url = settings.OPENAI_API_BASE2
         self.search_model = settings.OPENAI_API_MODEL2
 
@@ -70,17 +78,20 @@ class ReviewEnhancer:
 
             finish_reason = None
             while finish_reason is None or finish_reason == "tool_calls":
-                response = self.client.chat.completions.create(
-                    model="moonshot-v1-auto",  # 使用自动选择模型大小的版本
-                    messages=messages,
-                    temperature=0.3,
-                    tools=[{
-                        "type": "builtin_function",
-                        "function": {
-                            "name": "$web_search",
-                        }
-                    }]
-                )
+                timeout = llm_call_timeout(self.REQUEST_TIMEOUT)
+                with self.circuit_breaker.call():
+                    response = llm_client(self.client, timeout).chat.completions.create(
+                        model="moonshot-v1-auto",  # 使用自动选择模型大小的版本
+                        messages=messages,
+                        temperature=0.3,
+                        timeout=timeout,
+                        tools=[{
+                            "type": "builtin_function",
+                            "function": {
+                                "name": "$web_search",
+                            }
+                        }]
+                    )
                 
                 choice = response.choices[0]
                 finish_reason = choice.finish_reason
@@ -119,11 +130,16 @@ class ReviewEnhancer:
             search_result = self._search_with_ai(prompt)
             
             # 使用搜索结果增强评价
-            response = self.client.chat.completions.create(
-                model="moonshot-v1-auto",
-                messages=[
-                    {"role": "system", "content": "你是一个专业的评价增强助手。请基于搜索结果，将补充的信息自然地融入到原始评价中，以联网信息为准，保持评价的连贯性和可读性。"},
-                    {"role": "user", "content": f"""原始评价：
+            max_tokens = token_tracker.max_tokens("enhance", settings.LLM_MAX_TOKENS)
+            timeout = llm_call_timeout(self.REQUEST_TIMEOUT)
+
+            def create(target: LLMTarget):
+                with target.circuit_breaker.call(), latency_tracker.measure("enhance"):
+                    return llm_client(target.client, timeout).chat.completions.create(
+                        model=target.model,
+                        messages=[
+                            {"role": "system", "content": "你是一个专业的评价增强助手。请基于搜索结果，将补充的信息自然地融入到原始评价中，以联网信息为准，保持评价的连贯性和可读性。"},
+                            {"role": "user", "content": f"""原始评价：
 {prompt}
 
 搜索结果：
@@ -137,11 +153,19 @@ class ReviewEnhancer:
 - confidence_score: 补充信息的可信度(0-1)
 - pros: 产品的优点列表
 - cons: 产品的缺点列表"""}
-                ],
-                temperature=settings.LLM_TEMPERATURE,
-                max_tokens=settings.LLM_MAX_TOKENS,
-                response_format={"type": "json_object"}
+                        ],
+                        temperature=settings.LLM_TEMPERATURE,
+                        max_tokens=max_tokens,
+                        response_format={"type": "json_object"},
+                        timeout=timeout
+                    )
+            # 联网搜索依赖服务商的内置工具，只对冲增强调用，且只发往同一端点
+            response = hedger.run(
+                "enhance",
+                lambda: create(self.target),
+                lambda: create(hedger.hedge_target(self.target, allow_alternate=False))
             )
+            token_tracker.record("enhance", response, max_tokens)
             
             content = response.choices[0].message.content
             if not content:
@@ -190,8 +214,11 @@ class ReviewEnhancer:
             review.quality_score = min(1.0, review.quality_score + 0.1)
             
             # 记录补充的信息
-            logger.info(f"评价增强成功，补充信息: {result['added_info']}")
-            logger.info(f"补充信息可信度: {result['confidence_score']}")
+            logger.info(
+                f"评价增强成功 - 补充信息 {len(result['added_info'])} 条，可信度: {result['confidence_score']}",
+                extra={"added_info_count": len(result["added_info"]), "confidence_score": result["confidence_score"]}
+            )
+            logger.debug(f"补充信息: {result['added_info']}")
             
             return review
             
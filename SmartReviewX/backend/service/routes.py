@@ -1,20 +1,37 @@
-from fastapi import FastAPI, HTTPException, BackgroundTasks, Response
-from fastapi.responses import RedirectResponse
-from typing import List, Dict, Any
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Request, Response
+from fastapi.responses import RedirectResponse, JSONResponse, StreamingResponse
+from typing import List, Dict, Any, Optional, Tuple
 from ..models.data_model import UserBackground, ProductInfo, GeneratedReview, ReviewGenerationRequest, ReviewGenerationResponse
 from .category_generators import ReviewGeneratorFactory
 from ..models.category_prompts import PromptTemplateFactory
 from ..utils.review_saver import ReviewSaver
-from ..utils.quality_check import QualityChecker
+from ..utils.quality_check import QualityChecker, ANALYSIS_MODES, batch_result_id
+from ..utils.batch_client import create_batch_client, BATCH_TERMINAL_STATUSES
+from ..utils.response_parser import review_response_parser
+from ..utils.call_stats import token_tracker, latency_tracker
+from ..utils.circuit_breaker import circuit_breakers
+from ..utils.hedging import hedger
+from ..utils.semantic_cache import semantic_caches
+from ..utils.task_store import create_task_store, iter_results, TASK_FINISHED_STATUSES
+from ..utils.quality_stats import QualitySummary
+from ..utils.quality_trends import QualityTrendStore, TREND_BUCKETS
+from ..utils.task_events import task_events, task_event, format_sse, validate_callback_url, send_callback
+from ..utils.task_retention import TaskArchive, TaskJanitor
+from ..utils.log_config import should_log_progress
+from ..utils.lazy import LazySingleton, startup_profile
+from ..utils.deadline import Deadline, DeadlineExceeded, RequestCancelled, current_deadline
+from ..config import settings
 from .review_enhancer import ReviewEnhancer
+from .quality_gate import QualityGate
 import time
 import os
 import asyncio
+import importlib
 from uuid import uuid4
 import logging
 import json
 from pathlib import Path
-from datetime import datetime
+from datetime import datetime, date, timedelta, timezone
 
 # 配置日志
 logger = logging.getLogger(__name__)
@@ -25,51 +42,151 @@ app = FastAPI(
     version="1.0.0"
 )
 
-# 初始化评价保存器
-review_saver = ReviewSaver()
+# 存储目录
+STORAGE_DIR = Path(settings.STORAGE_PATH) if settings.STORAGE_PATH else Path(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) / "storage"
 
-# 初始化评价增强器
-review_enhancer = ReviewEnhancer()
+def _create_task_store():
+    """创建任务存储（单进程使用JSON文件，多进程部署使用共享的SQLite），并加载token统计"""
+    logger.info(f"存储目录路径: {STORAGE_DIR}")
+    STORAGE_DIR.mkdir(parents=True, exist_ok=True)
+    store = create_task_store(STORAGE_DIR)
+    # 多进程部署时token统计也通过任务存储在进程间共享
+    if store.shared:
+        token_tracker.attach_store(store)
+    else:
+        token_tracker.attach(STORAGE_DIR / "token_stats.json")
+    return store
 
-# 初始化质量检查器
-quality_checker = QualityChecker()
+def _create_quality_checker() -> QualityChecker:
+    """创建质量检查器，多进程部署时通过任务存储共享分析报告缓存"""
+    checker = QualityChecker()
+    if task_store.shared:
+        checker.share_analysis_cache(task_store.instance())
+    return checker
 
-# 创建存储目录
-STORAGE_DIR = Path(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) / "storage"
-logger.info(f"存储目录路径: {STORAGE_DIR}")
-STORAGE_DIR.mkdir(exist_ok=True)
-QUALITY_CHECK_FILE = STORAGE_DIR / "quality_check_results.json"
-logger.info(f"存储文件路径: {QUALITY_CHECK_FILE}")
+# 各单例在首次使用（或启动预热）时才初始化，避免导入时读取文件、创建客户端
+review_saver = LazySingleton("review_saver", ReviewSaver)
+review_enhancer = LazySingleton("review_enhancer", ReviewEnhancer)
+quality_checker = LazySingleton("quality_checker", _create_quality_checker)
+quality_gate = LazySingleton("quality_gate", QualityGate)
+batch_client = LazySingleton("batch_client", create_batch_client)
+task_store = LazySingleton("task_store", _create_task_store)
+task_archive = LazySingleton(
+    "task_archive",
+    lambda: TaskArchive(Path(settings.TASK_ARCHIVE_PATH) if settings.TASK_ARCHIVE_PATH else STORAGE_DIR / "archive")
+)
+# 传入惰性单例而不是实例：启动清理时不在事件循环中加载任务存储，首次清理时才在工作线程中创建
+task_janitor = LazySingleton("task_janitor", lambda: TaskJanitor(task_store, task_archive))
+quality_trends = LazySingleton(
+    "quality_trends",
+    lambda: QualityTrendStore(
+        Path(settings.QUALITY_TRENDS_PATH) if settings.QUALITY_TRENDS_PATH else STORAGE_DIR / "trends",
+        list(QualityChecker.DIMENSIONS)
+    )
+)
 
-# 初始化存储
-def init_storage():
-    try:
-        if QUALITY_CHECK_FILE.exists():
-            logger.info(f"从文件加载任务结果: {QUALITY_CHECK_FILE}")
-            with open(QUALITY_CHECK_FILE, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                logger.info(f"加载的任务结果: {data}")
-                return data
-        else:
-            logger.info("存储文件不存在，创建新的存储")
-            return {}
-    except Exception as e:
-        logger.error(f"初始化存储时发生错误: {str(e)}")
-        return {}
+# 启动预热时初始化的单例和预先导入的重量级模块
+WARMUP_SINGLETONS = (task_store, review_saver, quality_checker, quality_gate, review_enhancer, batch_client)
+WARMUP_MODULES = ("pandas", "openai")
 
-def save_storage(data):
+def warm_up():
+    """初始化全部单例并导入重量级模块，完成后标记就绪"""
     try:
-        logger.info(f"保存任务结果到文件: {QUALITY_CHECK_FILE}")
-        logger.info(f"保存的数据: {data}")
-        with open(QUALITY_CHECK_FILE, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-        logger.info("任务结果保存成功")
+        for module in WARMUP_MODULES:
+            with startup_profile.measure(f"import:{module}"):
+                importlib.import_module(module)
+        for singleton in WARMUP_SINGLETONS:
+            singleton.instance()
+        with startup_profile.measure("init:generators"):
+            for category in ReviewGeneratorFactory._generators:
+                ReviewGeneratorFactory.create_generator(category)
+        startup_profile.mark_ready()
     except Exception as e:
-        logger.error(f"保存任务结果时发生错误: {str(e)}")
+        logger.error(f"启动预热失败: {str(e)}")
+        startup_profile.mark_failed(str(e))
+
+_warmup_tasks = set()
+
+def start_warm_up_task():
+    """在后台线程中启动预热（已有预热在进行时不重复启动）"""
+    if _warmup_tasks:
+        return
+    task = asyncio.create_task(asyncio.to_thread(warm_up))
+    _warmup_tasks.add(task)
+    task.add_done_callback(_warmup_tasks.discard)
 
-# 初始化存储
-quality_check_results = init_storage()
-logger.info(f"初始化后的任务结果: {quality_check_results}")
+@app.on_event("startup")
+async def start_warm_up():
+    """在后台线程中预热，不阻塞服务启动；/health 立即可用，/ready 在预热完成后返回就绪"""
+    if not settings.WARMUP_ON_STARTUP:
+        startup_profile.mark_ready()
+        return
+    start_warm_up_task()
+
+@app.on_event("startup")
+async def start_task_janitor():
+    """启动过期任务的后台清理"""
+    task_janitor.start()
+
+@app.on_event("startup")
+async def start_offline_task_resume():
+    """在后台恢复服务重启前未完成的离线批处理任务，不阻塞服务启动"""
+    resume = asyncio.create_task(resume_offline_tasks())
+    _offline_resume_tasks.add(resume)
+    resume.add_done_callback(_offline_resume_tasks.discard)
+
+@app.on_event("shutdown")
+async def stop_task_janitor():
+    """停止后台清理"""
+    if task_janitor.initialized:
+        task_janitor.stop()
+
+# 同步接口检查客户端是否断开连接的间隔（秒）
+DISCONNECT_POLL_INTERVAL = 0.5
+
+async def run_with_deadline(http_request: Request, coro, timeout: Optional[float] = None):
+    """
+    在请求截止时间内执行耗时的处理，超时或客户端断开连接时取消正在进行的工作
+
+    截止时间通过 contextvars 传递给生成器线程和质量检查：每次LLM调用的超时不超过剩余时间，
+    剩余时间不足时不再重试；取消后线程中尚未发起的LLM调用和降级策略也会停止。
+
+    Args:
+        http_request: 当前HTTP请求，用于检测客户端是否断开连接
+        coro: 要执行的协程
+        timeout: 截止时间（秒），默认读取配置 TASK_TIMEOUT
+
+    Returns:
+        协程的返回值
+
+    Raises:
+        HTTPException: 超过截止时间（504）或客户端已断开连接（499）
+    """
+    deadline = Deadline(timeout or settings.TASK_TIMEOUT)
+
+    async def run():
+        current_deadline.set(deadline)
+        return await coro
+
+    task = asyncio.create_task(run())
+    try:
+        while not task.done():
+            await asyncio.wait({task}, timeout=min(DISCONNECT_POLL_INTERVAL, deadline.remaining()))
+            if task.done():
+                break
+            if deadline.remaining() <= 0:
+                logger.warning(f"请求超过截止时间 {deadline.timeout}秒，取消正在进行的工作")
+                raise HTTPException(status_code=504, detail=f"请求超过截止时间 {deadline.timeout}秒")
+            if await http_request.is_disconnected():
+                logger.warning("客户端已断开连接，取消正在进行的工作")
+                raise HTTPException(status_code=499, detail="客户端已断开连接")
+        return task.result()
+    except (DeadlineExceeded, RequestCancelled) as e:
+        raise HTTPException(status_code=504, detail=f"请求超过截止时间: {str(e)}")
+    finally:
+        if not task.done():
+            deadline.cancel()
+            task.cancel()
 
 @app.get("/")
 async def root():
@@ -79,52 +196,244 @@ async def root():
 async def process_quality_check(review: GeneratedReview, task_id: str):
     """异步处理质量检查"""
     try:
-        result = quality_checker.check_quality(review)
-        quality_check_results[task_id] = {
+        result = await quality_checker.check_quality(review)
+        await asyncio.to_thread(task_store.create, task_id, {
             "status": "completed",
             "result": result
-        }
+        })
     except Exception as e:
-        quality_check_results[task_id] = {
+        await asyncio.to_thread(task_store.create, task_id, {
             "status": "failed",
             "error": str(e)
-        }
+        })
+
+def trend_key(review: GeneratedReview) -> Tuple[str, str, str]:
+    """
+    质量趋势的序列键：(产品类别, 生成模型, 提示词版本)
 
-async def process_batch_quality_check(reviews: List[GeneratedReview], task_id: str):
+    评价不携带生成时的模型和提示词版本，使用当前配置（所有生成器都使用 OPENAI_API_MODEL3）
+    """
+    category = review.product_info.category if review.product_info else "unknown"
+    return category, settings.OPENAI_API_MODEL3, settings.PROMPT_VERSION
+
+async def record_quality_trends(reviews: List[GeneratedReview], results: List[Dict[str, Any]]):
+    """将质量检查结果追加到质量趋势存储（预筛选拒绝和LLM端点熔断时的降级评分不计入）"""
+    if not settings.QUALITY_TRENDS_ENABLED:
+        return
+    entries = [
+        (trend_key(review), result)
+        for review, result in zip(reviews, results)
+        if not result.get("degraded") and (result.get("pre_filter") or {}).get("decision") != "reject"
+    ]
+    try:
+        # 文件锁等待和写入不在事件循环中执行
+        await asyncio.to_thread(quality_trends.record, entries)
+    except Exception as e:
+        logger.error(f"记录质量趋势失败: {str(e)}")
+
+async def notify_task_finished(task_id: str):
+    """任务结束后向进度流订阅者发布终态事件，并向任务的回调地址发送通知"""
+    task = await asyncio.to_thread(task_store.get_meta, task_id)
+    if task is None:
+        return
+    event = task_event(task_id, task)
+    task_events.publish(task_id, event)
+    callback_url = task.get("callback_url")
+    if callback_url:
+        delivered = await send_callback(callback_url, {**event, "results_url": f"/check_quality_batch/{task_id}"})
+        await asyncio.to_thread(task_store.update, task_id, callback_delivered=delivered)
+
+async def process_batch_quality_check(
+    reviews: List[GeneratedReview],
+    task_id: str,
+    cascade: Optional[bool] = None,
+    analysis_mode: Optional[str] = None
+):
     """异步处理批量质量检查"""
     try:
         logger.info(f"开始处理批量质量检查任务 {task_id}")
-        results = []
         total_reviews = len(reviews)
+        # 每条结果写入时增量更新统计，查询任务状态时无需重新扫描结果
+        summary = QualitySummary(QualityChecker.DIMENSIONS)
         
         for i, review in enumerate(reviews, 1):
-            logger.info(f"正在检查第 {i}/{total_reviews} 条评价")
-            result = await quality_checker.check_quality(review)
-            results.append(result)
+            if should_log_progress(i, total_reviews):
+                logger.info(
+                    f"正在检查第 {i}/{total_reviews} 条评价",
+                    extra={"task_id": task_id, "processed": i, "total": total_reviews}
+                )
+            result = await quality_checker.check_quality(
+                review,
+                cascade=cascade,
+                analysis_mode=analysis_mode or settings.BATCH_QUALITY_ANALYSIS_MODE,
+                result_id=batch_result_id(task_id, i - 1)
+            )
             
-            # 更新进度
-            quality_check_results[task_id]["processed_reviews"] = i
-            quality_check_results[task_id]["results"] = results
-            save_storage(quality_check_results)
+            # 更新进度和统计
+            summary.add(result)
+            # SQLite 写入在跨进程锁竞争时可能等待数秒，不在事件循环中执行
+            await asyncio.to_thread(task_store.add_result, task_id, i - 1, result, processed_reviews=i, summary=summary.report())
+            await record_quality_trends([review], [result])
+            task_events.publish(task_id, task_event(task_id, {
+                "status": "processing",
+                "total_reviews": total_reviews,
+                "processed_reviews": i
+            }))
             
-        logger.info(f"批量质量检查任务 {task_id} 完成")
+        logger.info(f"批量质量检查任务 {task_id} 完成", extra={"task_id": task_id, "total": total_reviews})
         
         # 更新任务结果
-        quality_check_results[task_id].update({
-            "status": "completed",
-            "results": results,
-            "end_time": datetime.now().isoformat()
-        })
-        save_storage(quality_check_results)
+        await asyncio.to_thread(
+            task_store.update,
+            task_id,
+            status="completed",
+            end_time=datetime.now().isoformat()
+        )
         
     except Exception as e:
         logger.error(f"批量质量检查任务 {task_id} 失败: {str(e)}")
-        quality_check_results[task_id].update({
-            "status": "failed",
-            "error": str(e),
-            "end_time": datetime.now().isoformat()
-        })
-        save_storage(quality_check_results)
+        await asyncio.to_thread(
+            task_store.update,
+            task_id,
+            status="failed",
+            error=str(e),
+            end_time=datetime.now().isoformat()
+        )
+    
+    await notify_task_finished(task_id)
+
+# 本工作进程的标识，用于离线批处理任务的轮询租约
+WORKER_ID = f"{os.getpid()}-{uuid4().hex[:8]}"
+
+def claim_offline_task(task_id: str) -> bool:
+    """
+    获取或续期离线批处理任务的轮询租约
+
+    多进程部署时同一任务只由一个工作进程轮询；持有者每次轮询时续期，
+    进程退出后租约过期，重启的工作进程可以接手（见 resume_offline_tasks）
+    """
+    now = time.time()
+    lease_seconds = settings.BATCH_POLL_INTERVAL * 3 + 60
+
+    def claim(lease):
+        if lease is None or lease["expires_at"] <= now or lease["owner"] == WORKER_ID:
+            return {"owner": WORKER_ID, "expires_at": now + lease_seconds}
+        return lease
+
+    return task_store.update_value("offline_lease", task_id, claim)["owner"] == WORKER_ID
+
+async def process_offline_batch_quality_check(reviews: List[GeneratedReview], task_id: str, batch_id: Optional[str] = None):
+    """
+    通过服务商批处理接口离线处理批量质量检查
+
+    batch_id 不为空时不重新提交，继续轮询已提交的批处理任务（服务重启后恢复）
+    """
+    try:
+        # 先取得租约，避免其他工作进程启动时把刚创建的任务当作中断的任务接手
+        if not await asyncio.to_thread(claim_offline_task, task_id):
+            logger.warning(f"离线批量质量检查任务 {task_id} 已由其他工作进程处理")
+            return
+        outputs = {}
+        if batch_id is None:
+            logger.info(f"开始离线批量质量检查任务 {task_id}")
+            requests = quality_checker.build_batch_requests(reviews)
+            if requests:
+                batch_id = await asyncio.to_thread(batch_client.submit, requests)
+                await asyncio.to_thread(task_store.update, task_id, batch_id=batch_id)
+        else:
+            logger.info(f"恢复离线批量质量检查任务 {task_id}，继续轮询批处理任务 {batch_id}")
+        
+        if batch_id is not None:
+            # 轮询批处理任务状态
+            while True:
+                if not await asyncio.to_thread(claim_offline_task, task_id):
+                    logger.warning(f"离线批量质量检查任务 {task_id} 已由其他工作进程轮询")
+                    return
+                batch_status = await asyncio.to_thread(batch_client.poll, batch_id)
+                await asyncio.to_thread(task_store.update, task_id, persist=False, batch_status=batch_status)
+                task_events.publish(task_id, task_event(task_id, {
+                    "status": "processing",
+                    "total_reviews": len(reviews),
+                    "processed_reviews": 0,
+                    "batch_status": batch_status
+                }))
+                if batch_status["status"] in BATCH_TERMINAL_STATUSES:
+                    break
+                await asyncio.sleep(settings.BATCH_POLL_INTERVAL)
+            
+            outputs = await asyncio.to_thread(batch_client.fetch_results, batch_id)
+            if batch_status["status"] != "completed":
+                logger.warning(f"批处理任务 {batch_id} 状态为 {batch_status['status']}，已获取 {len(outputs)} 条输出")
+                if not outputs:
+                    raise ValueError(f"批处理任务{batch_status['status']}")
+        
+        # 将批处理结果映射回评价下标
+        results = await quality_checker.assemble_batch_results(reviews, outputs, task_id)
+        summary = QualitySummary(QualityChecker.DIMENSIONS)
+        for result in results:
+            summary.add(result)
+        logger.info(f"离线批量质量检查任务 {task_id} 完成")
+        
+        await asyncio.to_thread(
+            task_store.set_results,
+            task_id,
+            results,
+            status="completed",
+            processed_reviews=len(results),
+            summary=summary.report(),
+            end_time=datetime.now().isoformat()
+        )
+        await record_quality_trends(reviews, results)
+        
+    except Exception as e:
+        logger.error(f"离线批量质量检查任务 {task_id} 失败: {str(e)}")
+        await asyncio.to_thread(
+            task_store.update,
+            task_id,
+            status="failed",
+            error=str(e),
+            end_time=datetime.now().isoformat()
+        )
+    
+    await notify_task_finished(task_id)
+
+_offline_resume_tasks = set()
+
+async def resume_offline_task(task_id: str):
+    """接手一个中断的离线批处理任务：等待原持有者的租约过期后，已提交的继续轮询，尚未提交的重新提交"""
+    while True:
+        task = await asyncio.to_thread(task_store.get_meta, task_id)
+        if task is None or task["status"] != "processing":
+            return
+        if await asyncio.to_thread(claim_offline_task, task_id):
+            break
+        await asyncio.sleep(settings.BATCH_POLL_INTERVAL)
+    if "reviews" not in task:
+        await asyncio.to_thread(
+            task_store.update,
+            task_id,
+            status="failed",
+            error="任务记录中没有评价，服务重启后无法恢复",
+            end_time=datetime.now().isoformat()
+        )
+        await notify_task_finished(task_id)
+        return
+    reviews = [GeneratedReview.model_validate(review) for review in task["reviews"]]
+    await process_offline_batch_quality_check(reviews, task_id, task.get("batch_id"))
+
+async def resume_offline_tasks():
+    """服务启动时恢复处理中的离线批处理任务（批处理在服务商处继续执行，重启后只需继续轮询）"""
+    try:
+        task_ids = await asyncio.to_thread(task_store.processing_tasks)
+        for task_id in task_ids:
+            task = await asyncio.to_thread(task_store.get_meta, task_id)
+            if task is None or task.get("mode") != "offline":
+                continue
+            resume = asyncio.create_task(resume_offline_task(task_id))
+            _offline_resume_tasks.add(resume)
+            resume.add_done_callback(_offline_resume_tasks.discard)
+    except Exception as e:
+        logger.error(f"恢复离线批量质量检查任务失败: {str(e)}")
 
 def validate_user_background(user_background: UserBackground, category: str) -> bool:
     """验证用户背景是否符合类别要求"""
@@ -142,14 +451,42 @@ def validate_user_background(user_background: UserBackground, category: str) ->
         logger.error(f"用户背景验证失败: {str(e)}")
         return False
 
+async def generate_sequential(generator, request: ReviewGenerationRequest) -> List[GeneratedReview]:
+    """逐条（GENERATION_CANDIDATES_PER_CALL 大于1时每次多条）生成指定数量的评价"""
+    reviews = []
+    # 同一请求的多条评价不重复复用同一条语义缓存
+    cache_exclude = set()
+    per_call = max(1, settings.GENERATION_CANDIDATES_PER_CALL)
+    for i in range(0, request.num_reviews, per_call):
+        count = min(per_call, request.num_reviews - i)
+        try:
+            if should_log_progress(i + 1, request.num_reviews):
+                logger.info(f"正在生成第 {i+1}/{request.num_reviews} 条评价")
+            # 使用同步方式调用生成器
+            reviews.extend(await asyncio.to_thread(
+                generator.generate_reviews,
+                request.user_background,
+                request.product_info,
+                count,
+                cache_exclude
+            ))
+        except RequestCancelled:
+            raise
+        except Exception as e:
+            logger.error(f"生成第 {i+1} 条评价时发生错误: {str(e)}")
+            raise HTTPException(status_code=500, detail=f"生成评价失败: {str(e)}")
+    return reviews
+
 @app.post("/generate_reviews", response_model=ReviewGenerationResponse)
-async def generate_reviews(request: ReviewGenerationRequest):
+async def generate_reviews(request: ReviewGenerationRequest, http_request: Request):
     """
     生成产品评价
     
     - **user_background**: 用户背景信息
     - **product_info**: 产品信息
     - **num_reviews**: 需要生成的评价数量（1-10）
+    - **quality_gate**: 是否启用质量门控（可选，默认关闭）
+    - **timeout**: 请求截止时间（秒，可选，默认读取配置 TASK_TIMEOUT），超时返回504；客户端断开连接时停止生成且不保存
     
     返回生成的评价列表
     """
@@ -184,22 +521,34 @@ async def generate_reviews(request: ReviewGenerationRequest):
         
         # 生成指定数量的评价
         reviews = []
+        gate_stats = None
         total_time = 0
         start_time = time.time()
         
-        for i in range(request.num_reviews):
+        if request.quality_gate:
+            # 质量门控模式：生成与质量评分流水线并行，只重新生成低于阈值的评价
             try:
-                logger.info(f"正在生成第 {i+1}/{request.num_reviews} 条评价")
-                # 使用同步方式调用生成器
-                review = await asyncio.to_thread(
-                    generator.generate_review,
-                    request.user_background,
-                    request.product_info
+                reviews, gate_stats = await run_with_deadline(
+                    http_request,
+                    quality_gate.generate(
+                        generator,
+                        request.user_background,
+                        request.product_info,
+                        request.num_reviews
+                    ),
+                    request.timeout
                 )
-                reviews.append(review)
+            except HTTPException:
+                raise
             except Exception as e:
-                logger.error(f"生成第 {i+1} 条评价时发生错误: {str(e)}")
+                logger.error(f"质量门控生成评价时发生错误: {str(e)}")
                 raise HTTPException(status_code=500, detail=f"生成评价失败: {str(e)}")
+        else:
+            reviews = await run_with_deadline(
+                http_request,
+                generate_sequential(generator, request),
+                request.timeout
+            )
             
         total_time = time.time() - start_time
         logger.info(f"评价生成完成 - 总耗时: {total_time:.2f}秒")
@@ -218,7 +567,8 @@ async def generate_reviews(request: ReviewGenerationRequest):
             
         return ReviewGenerationResponse(
             reviews=reviews,
-            generation_time=total_time
+            generation_time=total_time,
+            quality_gate=gate_stats
         )
         
     except HTTPException:
@@ -231,34 +581,29 @@ async def generate_reviews(request: ReviewGenerationRequest):
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 @app.post("/enhance_reviews", response_model=ReviewGenerationResponse)
-async def enhance_reviews(request: ReviewGenerationRequest):
+async def enhance_reviews(request: ReviewGenerationRequest, http_request: Request):
     """
     增强产品评价
     
     - **user_background**: 用户背景信息
     - **product_info**: 产品信息
     - **num_reviews**: 需要生成的评价数量（1-10）
+    - **timeout**: 请求截止时间（秒，可选，默认读取配置 TASK_TIMEOUT）
     
     返回增强后的评价列表
     """
     try:
         # 首先生成原始评价
         generator = ReviewGeneratorFactory.create_generator(request.product_info.category)
-        reviews = []
         total_time = 0
         start_time = time.time()
         
-        for i in range(request.num_reviews):
-            # 使用同步方式调用生成器
-            review = await asyncio.to_thread(
-                generator.generate_review,
-                request.user_background,
-                request.product_info
-            )
-            reviews.append(review)
-            
-        # 对评价进行增强
-        enhanced_reviews = review_enhancer.enhance_reviews(reviews)
+        async def generate_and_enhance():
+            reviews = await generate_sequential(generator, request)
+            # 对评价进行增强
+            return await asyncio.to_thread(review_enhancer.enhance_reviews, reviews)
+        
+        enhanced_reviews = await run_with_deadline(http_request, generate_and_enhance(), request.timeout)
         
         total_time = time.time() - start_time
         
@@ -274,6 +619,8 @@ async def enhance_reviews(request: ReviewGenerationRequest):
             generation_time=total_time
         )
         
+    except HTTPException:
+        raise
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
@@ -303,11 +650,130 @@ async def get_review_stats(category: str):
     - **category**: 产品类别
     """
     try:
-        stats = review_saver.get_review_stats(category)
+        # 读取分区新增部分和统计文件不在事件循环中执行
+        stats = await asyncio.to_thread(review_saver.get_review_stats, category)
         return stats
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get review stats: {str(e)}")
 
+@app.get("/generation_stats")
+async def get_generation_stats():
+    """
+    获取评价生成响应的解析统计信息（修复、默认值填充、补充请求的次数及挽救率）
+    """
+    return review_response_parser.get_stats()
+
+@app.get("/token_stats")
+async def get_token_stats():
+    """
+    获取各LLM调用点预留的 max_tokens 与实际 completion token 用量的对比报告
+    """
+    return token_tracker.report()
+
+@app.get("/latency_stats")
+async def get_latency_stats():
+    """
+    获取各LLM调用点成功调用的耗时分位数（用于判断剩余时间能否覆盖一次调用，以及对冲调用的等待时间）
+    """
+    return latency_tracker.report()
+
+@app.get("/hedging")
+async def get_hedging():
+    """
+    获取LLM请求对冲的统计：可对冲的调用数、对冲次数、对冲胜出次数、因预算不足未对冲的次数及剩余预算
+    """
+    return hedger.report()
+
+@app.get("/task_retention")
+async def get_task_retention():
+    """
+    获取任务清理统计：归档和删除的任务数、任务存储中的任务数及归档占用空间
+    """
+    return await asyncio.to_thread(task_janitor.report)
+
+@app.get("/circuit_breakers")
+async def get_circuit_breakers():
+    """
+    获取各LLM端点的熔断器状态（closed/open/half_open）及调用、失败、拒绝次数
+    """
+    return circuit_breakers.report()
+
+# 质量趋势查询最多返回的分桶数
+MAX_TREND_POINTS = 2000
+
+@app.get("/quality_trends", response_model=Dict[str, Any])
+async def get_quality_trends(
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    bucket: str = "day",
+    window: int = 1,
+    percentiles: str = "50,90",
+    category: Optional[str] = None,
+    model: Optional[str] = None,
+    prompt_version: Optional[str] = None
+):
+    """
+    获取质量趋势：各维度和总分按时间分桶的均值、滚动均值和滚动分位数
+    
+    - **start**, **end**: 起止日期 YYYY-MM-DD（UTC，含两端，默认最近30天）
+    - **bucket**: 分桶粒度 day/hour
+    - **window**: 滚动窗口包含的分桶数（默认1，即不滚动）
+    - **percentiles**: 逗号分隔的分位数（0-100）
+    - **category**, **model**, **prompt_version**: 按产品类别、生成模型、提示词版本过滤（可选）
+    """
+    try:
+        try:
+            end_day = date.fromisoformat(end) if end else datetime.now(timezone.utc).date()
+            start_day = date.fromisoformat(start) if start else end_day - timedelta(days=29)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="start 和 end 必须是 YYYY-MM-DD 格式的日期")
+        if start_day > end_day:
+            raise HTTPException(status_code=400, detail="start 不能晚于 end")
+        if bucket not in TREND_BUCKETS:
+            raise HTTPException(status_code=400, detail=f"bucket 必须是 {', '.join(TREND_BUCKETS)} 之一")
+        if window < 1:
+            raise HTTPException(status_code=400, detail="window 必须大于0")
+        try:
+            percentile_values = [float(p) for p in percentiles.split(",") if p.strip()]
+        except ValueError:
+            raise HTTPException(status_code=400, detail="percentiles 必须是逗号分隔的数字")
+        if not all(0 <= p <= 100 for p in percentile_values):
+            raise HTTPException(status_code=400, detail="percentiles 必须在0-100之间")
+        points = ((end_day - start_day).days + 1) * 86400 // TREND_BUCKETS[bucket]
+        if points > MAX_TREND_POINTS:
+            raise HTTPException(status_code=400, detail=f"时间范围过大：最多返回 {MAX_TREND_POINTS} 个分桶")
+
+        trends = await asyncio.to_thread(
+            quality_trends.query,
+            start_day,
+            end_day,
+            bucket=bucket,
+            window=window,
+            percentiles=percentile_values,
+            category=category,
+            model=model,
+            prompt_version=prompt_version
+        )
+        return {
+            "start": start_day.isoformat(),
+            "end": end_day.isoformat(),
+            "bucket": bucket,
+            "window": window,
+            **trends
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"获取质量趋势时发生错误: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+@app.get("/semantic_cache")
+async def get_semantic_cache_stats():
+    """
+    获取生成语义缓存的统计信息（各类别的缓存条目数、命中次数和命中率）
+    """
+    return semantic_caches.report()
+
 @app.get("/health")
 async def health_check():
     """
@@ -315,18 +781,46 @@ async def health_check():
     """
     return {"status": "healthy"}
 
+@app.get("/ready")
+async def readiness_check():
+    """
+    就绪检查接口：启动预热完成前返回503，同时返回启动耗时剖析；预热失败时返回失败原因并重新预热
+    """
+    profile = startup_profile.report()
+    if not profile["ready"]:
+        if profile["error"] is not None:
+            # 失败可能是暂时的（如存储目录暂不可写），由就绪探测驱动重试
+            start_warm_up_task()
+            return JSONResponse(status_code=503, content={"status": "failed", "startup_profile": profile})
+        return JSONResponse(status_code=503, content={"status": "warming_up", "startup_profile": profile})
+    return {"status": "ready", "startup_profile": profile}
+
 @app.post("/check_quality", response_model=Dict[str, Any])
-async def check_quality(request: ReviewGenerationResponse, background_tasks: BackgroundTasks):
+async def check_quality(
+    request: ReviewGenerationResponse,
+    background_tasks: BackgroundTasks,
+    http_request: Request,
+    cascade: Optional[bool] = None,
+    analysis_mode: Optional[str] = None,
+    timeout: Optional[float] = None
+):
     """
     检查评价质量
     
     - **request**: 包含评价列表的请求对象
+    - **cascade**: 是否使用级联检查（可选，默认读取配置）
+    - **analysis_mode**: 分析报告生成方式 eager/lazy/background（可选，默认读取配置）
+    - **timeout**: 请求截止时间（秒，可选，默认读取配置 TASK_TIMEOUT），剩余时间不足时分析报告改为延迟生成
     
     返回质量检查结果
     """
     try:
         if not request.reviews or len(request.reviews) == 0:
             raise HTTPException(status_code=400, detail="评价列表不能为空")
+        if analysis_mode and analysis_mode not in ANALYSIS_MODES:
+            raise HTTPException(status_code=400, detail=f"analysis_mode 必须是 {', '.join(ANALYSIS_MODES)} 之一")
+        if timeout is not None and timeout <= 0:
+            raise HTTPException(status_code=400, detail="timeout 必须大于0")
             
         # 获取第一个评价进行检查
         review = request.reviews[0]
@@ -345,7 +839,12 @@ async def check_quality(request: ReviewGenerationResponse, background_tasks: Bac
             raise HTTPException(status_code=400, detail="质量置信评分必须在0-1之间")
             
         # 执行质量检查
-        result = await quality_checker.check_quality(review)
+        result = await run_with_deadline(
+            http_request,
+            quality_checker.check_quality(review, cascade=cascade, analysis_mode=analysis_mode),
+            timeout
+        )
+        await record_quality_trends([review], [result])
         
         return {
             "status": "completed",
@@ -359,12 +858,25 @@ async def check_quality(request: ReviewGenerationResponse, background_tasks: Bac
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 @app.post("/check_quality_batch", response_model=Dict[str, Any])
-async def check_quality_batch(request: ReviewGenerationResponse, background_tasks: BackgroundTasks):
+async def check_quality_batch(
+    request: ReviewGenerationResponse,
+    background_tasks: BackgroundTasks,
+    cascade: Optional[bool] = None,
+    analysis_mode: Optional[str] = None,
+    mode: str = "online",
+    ttl: Optional[int] = None,
+    callback_url: Optional[str] = None
+):
     """
     批量检查评价质量
     
     - **reviews**: 评价列表
     - **generation_time**: 生成时间
+    - **cascade**: 是否使用级联检查（可选，默认读取配置）
+    - **analysis_mode**: 分析报告生成方式（可选，默认 BATCH_QUALITY_ANALYSIS_MODE，即按需生成）
+    - **mode**: online 逐条调用；offline 打包为服务商批处理任务（适合对延迟不敏感的任务）
+    - **ttl**: 任务结束后结果在任务存储中保留的秒数（可选，默认 TASK_RESULT_TTL），过期后归档，仍可查询
+    - **callback_url**: 任务结束时 POST 通知的地址（可选，主机须在 TASK_CALLBACK_ALLOWED_HOSTS 中）
     
     返回任务ID，用于后续查询结果
     """
@@ -372,6 +884,17 @@ async def check_quality_batch(request: ReviewGenerationResponse, background_task
         # 验证请求参数
         if not request.reviews:
             raise HTTPException(status_code=400, detail="评价列表不能为空")
+        if analysis_mode and analysis_mode not in ANALYSIS_MODES:
+            raise HTTPException(status_code=400, detail=f"analysis_mode 必须是 {', '.join(ANALYSIS_MODES)} 之一")
+        if mode not in ("online", "offline"):
+            raise HTTPException(status_code=400, detail="mode 必须是 online 或 offline")
+        if ttl is not None and ttl <= 0:
+            raise HTTPException(status_code=400, detail="ttl 必须大于0")
+        if callback_url:
+            try:
+                validate_callback_url(callback_url)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
             
         logger.info(f"开始批量质量检查 - 评价数量: {len(request.reviews)}")
         
@@ -380,22 +903,38 @@ async def check_quality_batch(request: ReviewGenerationResponse, background_task
         logger.info(f"创建新任务: {task_id}")
         
         # 初始化任务状态
-        quality_check_results[task_id] = {
+        task = {
             "status": "processing",
             "message": "质量检查任务已启动",
             "total_reviews": len(request.reviews),
             "processed_reviews": 0,
             "results": [],
+            "mode": mode,
+            "ttl": ttl or settings.TASK_RESULT_TTL,
             "start_time": datetime.now().isoformat()
         }
-        save_storage(quality_check_results)
+        if callback_url:
+            task["callback_url"] = callback_url
+        if mode == "offline":
+            # 服务重启后恢复任务时需要评价内容来映射批处理结果
+            task["reviews"] = [review.model_dump(mode="json") for review in request.reviews]
+        await asyncio.to_thread(task_store.create, task_id, task)
         
         # 启动异步任务
-        background_tasks.add_task(
-            process_batch_quality_check,
-            request.reviews,
-            task_id
-        )
+        if mode == "offline":
+            background_tasks.add_task(
+                process_offline_batch_quality_check,
+                request.reviews,
+                task_id
+            )
+        else:
+            background_tasks.add_task(
+                process_batch_quality_check,
+                request.reviews,
+                task_id,
+                cascade,
+                analysis_mode
+            )
         
         return {
             "status": "processing",
@@ -410,43 +949,101 @@ async def check_quality_batch(request: ReviewGenerationResponse, background_task
         logger.error(f"启动批量质量检查任务时发生错误: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
+# 批量检查结果的字段投影：scores 只返回评分，不返回分析报告和预筛选详情
+RESULT_FIELDS = ("full", "scores")
+SCORE_RESULT_FIELDS = ("scores", "overall_score", "degraded", "analysis_status", "result_id")
+# 分页查询单页最多返回的结果数
+MAX_RESULTS_PAGE_SIZE = 1000
+
+def project_result(result: Dict[str, Any], fields: str) -> Dict[str, Any]:
+    """按 fields 裁剪单条检查结果"""
+    if fields == "scores":
+        return {key: result[key] for key in SCORE_RESULT_FIELDS if key in result}
+    return result
+
+async def load_batch_task(task_id: str):
+    """
+    读取批量检查任务（不含结果列表）
+
+    Returns:
+        (任务记录, 结果来源)：结果来源为任务存储或归档，由调用方通过 get_results 按需分段读取
+    """
+    task = await asyncio.to_thread(task_store.get_meta, task_id)
+    if task is not None:
+        return task, task_store.instance()
+    task = await asyncio.to_thread(task_archive.get, task_id)
+    if task is None:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    return task, task_archive.instance()
+
 @app.get("/check_quality_batch/{task_id}", response_model=Dict[str, Any])
-async def get_batch_quality_check_result(task_id: str):
+async def get_batch_quality_check_result(
+    task_id: str,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+    fields: str = "full"
+):
     """
     获取批量质量检查结果
     
     - **task_id**: 任务ID
+    - **cursor**: 分页游标（可选，取上一页返回的 next_cursor）
+    - **limit**: 每页结果数（可选，不超过 MAX_RESULTS_PAGE_SIZE），不传 cursor 和 limit 时返回全部结果
+    - **fields**: full 返回完整结果；scores 只返回评分，不含分析报告
     
-    返回质量检查结果或任务状态
+    返回质量检查结果或任务状态（超过保留时间的任务从归档中读取）
     """
     try:
-        if task_id not in quality_check_results:
-            raise HTTPException(status_code=404, detail="任务不存在")
-            
-        result = quality_check_results[task_id]
+        if fields not in RESULT_FIELDS:
+            raise HTTPException(status_code=400, detail=f"fields 必须是 {', '.join(RESULT_FIELDS)} 之一")
+        if limit is not None and not 0 < limit <= MAX_RESULTS_PAGE_SIZE:
+            raise HTTPException(status_code=400, detail=f"limit 必须在1-{MAX_RESULTS_PAGE_SIZE}之间")
+        if cursor is not None and not cursor.isdigit():
+            raise HTTPException(status_code=400, detail="cursor 无效")
+        paginated = cursor is not None or limit is not None
+        if paginated and limit is None:
+            limit = MAX_RESULTS_PAGE_SIZE
+
+        # 轮询进度时只读取任务状态，不读取结果列表
+        result, source = await load_batch_task(task_id)
+        archived = source is task_archive.instance()
         
         # 如果任务还在处理中，返回当前状态
         if result["status"] == "processing":
-            return {
+            response = {
                 "status": "processing",
                 "task_id": task_id,
                 "message": "质量检查任务进行中",
                 "total_reviews": result["total_reviews"],
                 "processed_reviews": result["processed_reviews"],
-                "progress": f"{result['processed_reviews']}/{result['total_reviews']}"
+                "progress": f"{result['processed_reviews']}/{result['total_reviews']}",
+                "summary": result.get("summary")
             }
+            # 离线批处理任务返回服务商批处理进度
+            if "batch_status" in result:
+                response["batch_status"] = result["batch_status"]
+            return response
             
-        # 如果任务完成，返回完整结果
+        # 如果任务完成，返回结果（分页时只返回一页）
         if result["status"] == "completed":
-            return {
+            start = int(cursor or 0)
+            results = await asyncio.to_thread(source.get_results, task_id, start, limit)
+            response = {
                 "status": "completed",
                 "task_id": task_id,
                 "message": "质量检查任务已完成",
                 "total_reviews": result["total_reviews"],
-                "results": result["results"],
+                "summary": result.get("summary"),
+                "results": [project_result(item, fields) for item in results],
                 "start_time": result["start_time"],
-                "end_time": result.get("end_time", datetime.now().isoformat())
+                "end_time": result.get("end_time", datetime.now().isoformat()),
+                "archived": archived
             }
+            if paginated:
+                next_start = start + len(results)
+                has_more = len(results) == limit and next_start < result.get("processed_reviews", result["total_reviews"])
+                response["next_cursor"] = str(next_start) if has_more else None
+            return response
             
         # 如果任务失败，返回错误信息
         if result["status"] == "failed":
@@ -454,7 +1051,8 @@ async def get_batch_quality_check_result(task_id: str):
                 "status": "failed",
                 "task_id": task_id,
                 "message": "质量检查任务失败",
-                "error": result.get("error", "未知错误")
+                "error": result.get("error", "未知错误"),
+                "archived": archived
             }
             
     except HTTPException:
@@ -463,3 +1061,133 @@ async def get_batch_quality_check_result(task_id: str):
         logger.error(f"获取批量质量检查结果时发生错误: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
+@app.get("/check_quality_batch/{task_id}/export")
+async def export_batch_quality_check_results(task_id: str, fields: str = "full"):
+    """
+    以 NDJSON 格式导出批量质量检查结果，每行一条结果（附带 index 字段）
+    
+    - **task_id**: 任务ID
+    - **fields**: full 导出完整结果；scores 只导出评分
+    
+    结果从任务存储中分块读取并逐行输出，不在内存中构建完整列表；任务进行中时导出已完成的部分
+    """
+    if fields not in RESULT_FIELDS:
+        raise HTTPException(status_code=400, detail=f"fields 必须是 {', '.join(RESULT_FIELDS)} 之一")
+    try:
+        _, source = await load_batch_task(task_id)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"导出批量质量检查结果时发生错误: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+    # 归档的结果在一次解压中逐条读取，任务存储中的结果分块读取
+    items = source.iter_results(task_id) if source is task_archive.instance() else iter_results(source, task_id)
+
+    def lines():
+        # 同步生成器由 StreamingResponse 在线程池中迭代，不阻塞事件循环
+        for index, item in enumerate(items):
+            yield json.dumps({"index": index, **project_result(item, fields)}, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(
+        lines(),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="quality-{task_id}.ndjson"'}
+    )
+
+async def task_event_stream(http_request: Request, task_id: str, task: Dict[str, Any], queue: asyncio.Queue):
+    """
+    生成任务进度的SSE消息流：先发送当前状态，之后转发进度事件，任务结束后关闭
+
+    无新事件时每隔 TASK_EVENTS_POLL_INTERVAL 秒读取任务存储（由其他工作进程处理的任务本进程收不到事件），
+    状态未变化时发送心跳注释
+    """
+    try:
+        event = task_event(task_id, task)
+        yield format_sse(event)
+        while event["status"] not in TASK_FINISHED_STATUSES:
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=settings.TASK_EVENTS_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                if await http_request.is_disconnected():
+                    return
+                task = await asyncio.to_thread(task_store.get_meta, task_id)
+                if task is None:
+                    return
+                polled = task_event(task_id, task)
+                if polled == event:
+                    yield ": keep-alive\n\n"
+                    continue
+                event = polled
+            yield format_sse(event)
+    finally:
+        task_events.unsubscribe(task_id, queue)
+
+@app.get("/check_quality_batch/{task_id}/events")
+async def stream_batch_quality_check_events(task_id: str, http_request: Request):
+    """
+    以 Server-Sent Events 推送批量质量检查进度
+    
+    - **task_id**: 任务ID
+    
+    事件名为 progress、completed 或 failed，数据与查询接口的任务状态一致；任务结束后服务端关闭连接
+    """
+    # 先订阅再读取当前状态，避免遗漏两者之间发布的事件
+    queue = task_events.subscribe(task_id)
+    try:
+        task, _ = await load_batch_task(task_id)
+    except HTTPException:
+        task_events.unsubscribe(task_id, queue)
+        raise
+    except Exception as e:
+        task_events.unsubscribe(task_id, queue)
+        logger.error(f"订阅批量质量检查进度时发生错误: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+    return StreamingResponse(
+        task_event_stream(http_request, task_id, task, queue),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+async def load_analysis_source(result_id: str) -> Optional[Dict[str, Any]]:
+    """从批量任务记录中读取检查结果的 analysis_source，结果ID不属于批量任务或已不存在时返回None"""
+    task_id, _, index = result_id.rpartition(":")
+    if not task_id or not index.isdigit():
+        return None
+    try:
+        _, source = await load_batch_task(task_id)
+    except HTTPException:
+        return None
+    results = await asyncio.to_thread(source.get_results, task_id, int(index), 1)
+    if not results or results[0].get("result_id") != result_id:
+        return None
+    return results[0].get("analysis_source")
+
+@app.get("/quality_analysis/{result_id}", response_model=Dict[str, Any])
+async def get_quality_analysis(result_id: str):
+    """
+    获取延迟生成的质量分析报告
+    
+    - **result_id**: 质量检查结果中的 result_id
+    
+    分析报告尚未生成时立即生成并缓存；批量任务的结果在缓存过期后从任务记录（或归档）中找回评价内容和评分重新生成
+    """
+    try:
+        analysis = await quality_checker.get_analysis(result_id)
+        if analysis is None:
+            source = await load_analysis_source(result_id)
+            if source is not None:
+                analysis = await quality_checker.get_analysis(result_id, source)
+        if analysis is None:
+            raise HTTPException(status_code=404, detail="分析报告不存在或已过期")
+        return {
+            "result_id": result_id,
+            "analysis_status": "completed",
+            "analysis": analysis
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"获取质量分析报告时发生错误: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
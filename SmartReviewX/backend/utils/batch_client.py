@@ -0,0 +1,176 @@
+from typing import List, Dict, Any, Optional
+from uuid import uuid4
+from ..config import settings
+import json
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# 批处理任务的终止状态
+BATCH_TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+def parse_batch_output(text: str) -> Dict[str, Optional[str]]:
+    """
+    解析批处理输出文件（JSONL），返回 custom_id 到模型返回内容的映射
+
+    Args:
+        text: 输出文件内容
+
+    Returns:
+        custom_id -> 模型返回内容，请求失败时为None
+    """
+    outputs = {}
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        try:
+            item = json.loads(line)
+            response = item.get("response") or {}
+            if item.get("error") or response.get("status_code") != 200:
+                logger.warning(f"批处理请求 {item.get('custom_id')} 失败: {item.get('error')}")
+                outputs[item["custom_id"]] = None
+                continue
+            outputs[item["custom_id"]] = response["body"]["choices"][0]["message"]["content"]
+        except (json.JSONDecodeError, KeyError, IndexError, TypeError) as e:
+            logger.error(f"解析批处理输出失败: {str(e)}")
+    return outputs
+
+class ProviderBatchClient:
+    """OpenAI兼容的批处理接口客户端（/files + /batches）"""
+
+    def __init__(self):
+        self.base_url = (settings.BATCH_API_BASE or settings.OPENAI_API_BASE3).rstrip("/")
+        self.headers = {"Authorization": f"Bearer {settings.BATCH_API_KEY or settings.OPENAI_API_KEY3}"}
+
+    def _request(self, method: str, path: str, **kwargs):
+        import httpx
+        response = httpx.request(method, f"{self.base_url}{path}", headers=self.headers, timeout=60.0, **kwargs)
+        response.raise_for_status()
+        return response
+
+    def submit(self, requests: List[Dict[str, Any]]) -> str:
+        """
+        上传批处理文件并创建批处理任务
+
+        Args:
+            requests: 批处理请求列表（每项包含 custom_id 和 body）
+
+        Returns:
+            批处理任务ID
+        """
+        lines = [
+            json.dumps({
+                "custom_id": request["custom_id"],
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": request["body"]
+            }, ensure_ascii=False)
+            for request in requests
+        ]
+        batch_file = self._request(
+            "POST",
+            "/files",
+            data={"purpose": "batch"},
+            files={"file": ("quality_check_batch.jsonl", "\n".join(lines).encode("utf-8"), "application/jsonl")}
+        ).json()
+        batch = self._request(
+            "POST",
+            "/batches",
+            json={
+                "input_file_id": batch_file["id"],
+                "endpoint": "/v1/chat/completions",
+                "completion_window": settings.BATCH_COMPLETION_WINDOW
+            }
+        ).json()
+        logger.info(f"已创建批处理任务 {batch['id']}，请求数: {len(requests)}")
+        return batch["id"]
+
+    def poll(self, batch_id: str) -> Dict[str, Any]:
+        """
+        查询批处理任务状态
+
+        Returns:
+            包含 status、completed、failed、total 的字典
+        """
+        batch = self._request("GET", f"/batches/{batch_id}").json()
+        counts = batch.get("request_counts") or {}
+        return {
+            "status": batch["status"],
+            "completed": counts.get("completed", 0),
+            "failed": counts.get("failed", 0),
+            "total": counts.get("total", 0)
+        }
+
+    def fetch_results(self, batch_id: str) -> Dict[str, Optional[str]]:
+        """
+        下载批处理输出并解析
+
+        Returns:
+            custom_id -> 模型返回内容
+        """
+        batch = self._request("GET", f"/batches/{batch_id}").json()
+        if not batch.get("output_file_id"):
+            return {}
+        text = self._request("GET", f"/files/{batch['output_file_id']}/content").text
+        return parse_batch_output(text)
+
+class LocalBatchClient:
+    """本地批处理替身：在后台线程中逐条调用聊天接口，用于测试或不支持批处理接口的服务商"""
+
+    def __init__(self):
+        import openai
+        self.client = openai.OpenAI(
+            api_key=settings.BATCH_API_KEY or settings.OPENAI_API_KEY3,
+            base_url=settings.BATCH_API_BASE or settings.OPENAI_API_BASE3
+        )
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def _run(self, batch_id: str, requests: List[Dict[str, Any]]):
+        job = self._jobs[batch_id]
+        for request in requests:
+            try:
+                response = self.client.chat.completions.create(**request["body"])
+                content = response.choices[0].message.content
+                with self._lock:
+                    job["outputs"][request["custom_id"]] = content
+                    job["completed"] += 1
+            except Exception as e:
+                logger.error(f"本地批处理请求 {request['custom_id']} 失败: {str(e)}")
+                with self._lock:
+                    job["outputs"][request["custom_id"]] = None
+                    job["failed"] += 1
+        with self._lock:
+            job["status"] = "completed"
+
+    def submit(self, requests: List[Dict[str, Any]]) -> str:
+        batch_id = f"local_batch_{uuid4().hex}"
+        self._jobs[batch_id] = {
+            "status": "in_progress",
+            "completed": 0,
+            "failed": 0,
+            "total": len(requests),
+            "outputs": {}
+        }
+        threading.Thread(target=self._run, args=(batch_id, requests), daemon=True).start()
+        return batch_id
+
+    def poll(self, batch_id: str) -> Dict[str, Any]:
+        job = self._jobs.get(batch_id)
+        if job is None:
+            raise ValueError(f"批处理任务不存在: {batch_id}")
+        with self._lock:
+            return {key: job[key] for key in ("status", "completed", "failed", "total")}
+
+    def fetch_results(self, batch_id: str) -> Dict[str, Optional[str]]:
+        job = self._jobs.pop(batch_id, None)
+        return job["outputs"] if job else {}
+
+def create_batch_client():
+    """根据配置创建批处理客户端"""
+    if settings.BATCH_BACKEND == "local":
+        return LocalBatchClient()
+    if settings.BATCH_BACKEND == "provider":
+        return ProviderBatchClient()
+    raise ValueError(f"不支持的批处理后端: {settings.BATCH_BACKEND}")
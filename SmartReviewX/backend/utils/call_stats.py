@@ -0,0 +1,280 @@
+from typing import Dict, Any, Optional, List
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+from ..config import settings
+import json
+import logging
+import math
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+def percentile(values: List[float], q: float) -> float:
+    """最近秩法计算分位数"""
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))
+    return ordered[index]
+
+class CompletionTokenTracker:
+    """
+    按调用点统计实际的 completion token 数，并据此自动调整 max_tokens
+
+    调用点命名: generate:{category}、generate_followup、generate_reduced、check:{维度}、analysis、enhance
+    """
+
+    # 自动调整后的 max_tokens 下限
+    MIN_MAX_TOKENS = 64
+    # 每记录多少次保存一次统计文件（在后台线程中保存，记录方不等待文件写入）
+    SAVE_EVERY = 20
+
+    def __init__(self):
+        # 调用点 -> 最近的 (实际token数, 预留token数, 是否被截断)
+        self._samples: Dict[str, deque] = {}
+        self._lock = threading.Lock()
+        self._path: Optional[Path] = None
+        self._unsaved = 0
+        # 多进程部署时共享统计的任务存储，以及尚未合并到共享存储的样本
+        self._store = None
+        self._pending: Dict[str, List[tuple]] = {}
+        # 后台保存线程：record 可能在事件循环中调用，文件写入和共享存储合并都放到该线程
+        self._save_requested = threading.Event()
+        self._save_lock = threading.Lock()
+        self._saver: Optional[threading.Thread] = None
+
+    def attach(self, path: Path):
+        """指定统计文件路径并加载已有统计"""
+        self._path = Path(path)
+        if not self._path.exists():
+            return
+        try:
+            with open(self._path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            with self._lock:
+                for site, samples in data.items():
+                    self._samples[site] = deque(
+                        (tuple(sample) for sample in samples),
+                        maxlen=settings.TOKEN_STATS_WINDOW
+                    )
+            logger.info(f"已加载 {len(data)} 个调用点的token统计")
+        except Exception as e:
+            logger.error(f"加载token统计失败: {str(e)}")
+
+    def attach_store(self, store):
+        """通过任务存储在多个工作进程之间共享统计，并加载已有统计"""
+        self._store = store
+        self._path = None
+        self._merge_pending()
+
+    def _merge_pending(self):
+        """将本进程新增的样本合并到共享存储，并以合并后的样本作为本地窗口"""
+        window = settings.TOKEN_STATS_WINDOW
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            sites = set(self._samples) | set(pending)
+            self._unsaved = 0
+        try:
+            # 共享存储中的调用点列表，用于发现其他进程新增的调用点
+            sites |= set(self._store.update_value(
+                "token_stats", "__sites__", lambda old: sorted(set(old or []) | set(pending))
+            ))
+            for site in sites:
+                new_samples = [list(sample) for sample in pending.get(site, [])]
+                merged = self._store.update_value(
+                    "token_stats", site, lambda old: ((old or []) + new_samples)[-window:]
+                )
+                with self._lock:
+                    self._samples[site] = deque((tuple(sample) for sample in merged), maxlen=window)
+        except Exception as e:
+            logger.error(f"合并token统计失败: {str(e)}")
+
+    def save(self):
+        """保存统计到文件（多进程部署时合并到共享存储）"""
+        # 后台保存与关闭服务时的保存可能同时发生，串行执行
+        with self._save_lock:
+            if self._store is not None:
+                self._merge_pending()
+                return
+            if self._path is None:
+                return
+            try:
+                with self._lock:
+                    data = {site: list(samples) for site, samples in self._samples.items()}
+                    self._unsaved = 0
+                with open(self._path, "w", encoding="utf-8") as f:
+                    json.dump(data, f)
+            except Exception as e:
+                logger.error(f"保存token统计失败: {str(e)}")
+
+    def _request_save(self):
+        """通知后台线程保存统计，首次调用时启动该线程"""
+        with self._lock:
+            if self._saver is None:
+                self._saver = threading.Thread(target=self._save_loop, name="token-stats-saver", daemon=True)
+                self._saver.start()
+        self._save_requested.set()
+
+    def _save_loop(self):
+        while True:
+            self._save_requested.wait()
+            self._save_requested.clear()
+            self.save()
+
+    def record(self, site: str, response: Any, reserved: int):
+        """
+        记录一次调用的 completion token 数
+
+        Args:
+            site: 调用点名称
+            response: chat.completions.create 的响应
+            reserved: 本次调用预留的 max_tokens
+        """
+        usage = getattr(response, "usage", None)
+        used = getattr(usage, "completion_tokens", None)
+        if used is None:
+            return
+        try:
+            truncated = response.choices[0].finish_reason == "length"
+        except (AttributeError, IndexError):
+            truncated = False
+        with self._lock:
+            samples = self._samples.setdefault(site, deque(maxlen=settings.TOKEN_STATS_WINDOW))
+            samples.append((int(used), int(reserved), truncated))
+            if self._store is not None:
+                self._pending.setdefault(site, []).append((int(used), int(reserved), truncated))
+            self._unsaved += 1
+            should_save = self._unsaved >= self.SAVE_EVERY
+        if should_save:
+            self._request_save()
+
+    def max_tokens(self, site: str, default: int) -> int:
+        """
+        获取调用点的 max_tokens：样本足够时取实际用量的高分位数加余量，不超过默认值
+
+        Args:
+            site: 调用点名称
+            default: 默认（最大）的 max_tokens
+
+        Returns:
+            本次调用应使用的 max_tokens
+        """
+        if not settings.MAX_TOKENS_AUTO_TUNE:
+            return default
+        with self._lock:
+            samples = list(self._samples.get(site, ()))
+        if len(samples) < settings.MAX_TOKENS_MIN_SAMPLES:
+            return default
+        # 近期截断过多说明预留偏小，回退到默认值
+        truncated = sum(1 for _, _, is_truncated in samples if is_truncated)
+        if truncated / len(samples) > 1 - settings.MAX_TOKENS_PERCENTILE:
+            return default
+        used = percentile([sample[0] for sample in samples], settings.MAX_TOKENS_PERCENTILE)
+        recommended = math.ceil(used * (1 + settings.MAX_TOKENS_MARGIN))
+        return min(default, max(self.MIN_MAX_TOKENS, recommended))
+
+    def report(self) -> Dict[str, Any]:
+        """
+        生成各调用点预留与实际用量的对比报告
+
+        Returns:
+            调用点 -> 统计信息
+        """
+        with self._lock:
+            snapshot = {site: list(samples) for site, samples in self._samples.items()}
+        report = {}
+        for site, samples in sorted(snapshot.items()):
+            if not samples:
+                continue
+            used = [sample[0] for sample in samples]
+            reserved = [sample[1] for sample in samples]
+            used_mean = sum(used) / len(used)
+            reserved_mean = sum(reserved) / len(reserved)
+            report[site] = {
+                "samples": len(samples),
+                "used": {
+                    "mean": round(used_mean, 1),
+                    "p50": percentile(used, 0.50),
+                    "p95": percentile(used, 0.95),
+                    "p99": percentile(used, 0.99),
+                    "max": max(used)
+                },
+                "reserved_mean": round(reserved_mean, 1),
+                "last_reserved": reserved[-1],
+                "gap_mean": round(reserved_mean - used_mean, 1),
+                "utilization": round(used_mean / reserved_mean, 4) if reserved_mean else 0.0,
+                "truncated": sum(1 for sample in samples if sample[2]),
+                "recommended_max_tokens": self.max_tokens(site, max(reserved))
+            }
+        return report
+
+# 所有调用点共享的token统计
+token_tracker = CompletionTokenTracker()
+
+class LatencyTracker:
+    """
+    按调用点统计成功的LLM调用耗时，用于估计一次调用的预期耗时（剩余时间是否足够、何时发起对冲调用）
+
+    调用点命名与 CompletionTokenTracker 相同；统计只保存在进程内，多进程部署时各工作进程独立统计
+    """
+
+    def __init__(self):
+        # 调用点 -> 最近的耗时（秒）
+        self._samples: Dict[str, deque] = {}
+        self._lock = threading.Lock()
+
+    def record(self, site: str, seconds: float):
+        """记录一次成功调用的耗时"""
+        with self._lock:
+            samples = self._samples.setdefault(site, deque(maxlen=settings.LATENCY_STATS_WINDOW))
+            samples.append(seconds)
+
+    @contextmanager
+    def measure(self, site: str):
+        """记录代码块的耗时，代码块抛出异常（调用失败、超时）时不记录"""
+        start = time.monotonic()
+        yield
+        self.record(site, time.monotonic() - start)
+
+    def percentile(self, site: str, q: Optional[float] = None) -> Optional[float]:
+        """
+        调用点耗时的分位数
+
+        Args:
+            site: 调用点名称
+            q: 分位数（0-1），默认读取配置 LLM_LATENCY_PERCENTILE
+
+        Returns:
+            秒数，样本数不足 LATENCY_MIN_SAMPLES 时返回None
+        """
+        with self._lock:
+            samples = list(self._samples.get(site, ()))
+        if len(samples) < settings.LATENCY_MIN_SAMPLES:
+            return None
+        return percentile(samples, settings.LLM_LATENCY_PERCENTILE if q is None else q)
+
+    def report(self) -> Dict[str, Any]:
+        """
+        生成各调用点的耗时报告
+
+        Returns:
+            调用点 -> 样本数及耗时分位数（秒）
+        """
+        with self._lock:
+            snapshot = {site: list(samples) for site, samples in self._samples.items()}
+        return {
+            site: {
+                "samples": len(samples),
+                "mean": round(sum(samples) / len(samples), 3),
+                "p50": round(percentile(samples, 0.50), 3),
+                "p90": round(percentile(samples, 0.90), 3),
+                "p95": round(percentile(samples, 0.95), 3),
+                "p99": round(percentile(samples, 0.99), 3),
+                "max": round(max(samples), 3)
+            }
+            for site, samples in sorted(snapshot.items())
+            if samples
+        }
+
+# 所有调用点共享的延迟统计
+latency_tracker = LatencyTracker()
@@ -0,0 +1,188 @@
+from typing import Dict, Any, Optional
+from contextlib import contextmanager
+from ..config import settings
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+class CircuitOpenError(Exception):
+    """LLM端点已熔断，调用被立即拒绝"""
+
+def is_endpoint_failure(error: BaseException) -> bool:
+    """
+    判断调用错误是否说明端点不可用：连接失败、超时和5xx计入熔断，
+    4xx（参数错误、鉴权失败、限流等）说明端点可以访问，不计入
+    """
+    status_code = getattr(error, "status_code", None)
+    if status_code is not None:
+        return status_code >= 500
+    import openai
+    return isinstance(error, openai.APIConnectionError)
+
+class CircuitBreaker:
+    """
+    单个LLM端点的熔断器
+
+    - closed: 正常调用，连续失败达到 CIRCUIT_BREAKER_FAILURE_THRESHOLD 次后熔断
+    - open: 立即拒绝调用，经过 CIRCUIT_BREAKER_RECOVERY_TIMEOUT 秒后进入半开状态
+    - half_open: 只放行一个探测调用，成功则恢复，失败则重新熔断
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self._probing = False
+        self._lock = threading.Lock()
+        self.stats = {"calls": 0, "failures": 0, "rejected": 0, "opened": 0}
+
+    def _recovery_elapsed(self) -> bool:
+        return time.monotonic() - self.opened_at >= settings.CIRCUIT_BREAKER_RECOVERY_TIMEOUT
+
+    @property
+    def available(self) -> bool:
+        """当前是否可能放行调用（不改变状态）"""
+        if not settings.CIRCUIT_BREAKER_ENABLED:
+            return True
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN:
+                return self._recovery_elapsed()
+            return not self._probing
+
+    @property
+    def recovering(self) -> bool:
+        """是否已熔断、尚未恢复：此时只放行一个探测调用，并发的其他调用会被拒绝"""
+        if not settings.CIRCUIT_BREAKER_ENABLED:
+            return False
+        with self._lock:
+            return self.state != CLOSED
+
+    def before_call(self) -> bool:
+        """
+        调用前检查
+
+        Returns:
+            本次调用是否为半开状态下的探测调用
+
+        Raises:
+            CircuitOpenError: 端点已熔断
+        """
+        if not settings.CIRCUIT_BREAKER_ENABLED:
+            return False
+        with self._lock:
+            if self.state == OPEN and self._recovery_elapsed():
+                self.state = HALF_OPEN
+                logger.info(f"熔断器 {self.name} 进入半开状态，发送探测调用")
+            if self.state == CLOSED:
+                self.stats["calls"] += 1
+                return False
+            if self.state == HALF_OPEN and not self._probing:
+                self._probing = True
+                self.stats["calls"] += 1
+                return True
+            self.stats["rejected"] += 1
+        raise CircuitOpenError(f"LLM端点 {self.name} 已熔断")
+
+    def record_success(self, probe: bool = False):
+        """记录一次成功调用，探测成功时恢复"""
+        with self._lock:
+            if probe:
+                self._probing = False
+            self.consecutive_failures = 0
+            if self.state != CLOSED:
+                self.state = CLOSED
+                self.opened_at = None
+                logger.info(f"熔断器 {self.name} 探测成功，恢复调用")
+
+    def record_failure(self, error: BaseException, probe: bool = False):
+        """
+        记录一次失败调用
+
+        不说明端点不可用的错误（如4xx）按成功处理
+        """
+        if not is_endpoint_failure(error):
+            self.record_success(probe)
+            return
+        with self._lock:
+            if probe:
+                self._probing = False
+            self.stats["failures"] += 1
+            self.consecutive_failures += 1
+            if self.state == HALF_OPEN or (
+                self.state == CLOSED and self.consecutive_failures >= settings.CIRCUIT_BREAKER_FAILURE_THRESHOLD
+            ):
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+                self.stats["opened"] += 1
+                logger.warning(
+                    f"熔断器 {self.name} 打开：连续失败 {self.consecutive_failures} 次，"
+                    f"{settings.CIRCUIT_BREAKER_RECOVERY_TIMEOUT}秒后探测，最近错误: {str(error)}"
+                )
+
+    def _release_probe(self, probe: bool):
+        """调用被取消时释放探测名额，不改变状态"""
+        if probe:
+            with self._lock:
+                self._probing = False
+
+    @contextmanager
+    def call(self):
+        """
+        包装一次LLM调用：熔断时抛出 CircuitOpenError，并根据调用结果更新熔断状态
+
+        with 语句中只应包含LLM调用本身（同步调用和 await 均可）
+        """
+        probe = self.before_call()
+        try:
+            yield
+        except Exception as e:
+            self.record_failure(e, probe)
+            raise
+        except BaseException:
+            self._release_probe(probe)
+            raise
+        else:
+            self.record_success(probe)
+
+    def report(self) -> Dict[str, Any]:
+        """熔断器状态"""
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "open_for": round(time.monotonic() - self.opened_at, 1) if self.opened_at else None,
+                **self.stats
+            }
+
+class CircuitBreakerRegistry:
+    """按端点地址管理熔断器，调用同一端点的生成器、质量检查器和增强器共享熔断状态"""
+
+    def __init__(self):
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def get(self, client) -> CircuitBreaker:
+        """获取客户端所调用端点的熔断器"""
+        name = str(client.base_url)
+        with self._lock:
+            if name not in self._breakers:
+                self._breakers[name] = CircuitBreaker(name)
+            return self._breakers[name]
+
+    def report(self) -> Dict[str, Any]:
+        """所有端点的熔断器状态"""
+        with self._lock:
+            breakers = dict(self._breakers)
+        return {name: breaker.report() for name, breaker in breakers.items()}
+
+# 进程内共享的熔断器（多进程部署时各工作进程独立判断）
+circuit_breakers = CircuitBreakerRegistry()
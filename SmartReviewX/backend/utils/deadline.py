@@ -0,0 +1,123 @@
+from typing import Optional
+from contextvars import ContextVar
+from ..config import settings
+import threading
+import time
+
+class DeadlineExceeded(Exception):
+    """请求剩余时间不足以发起新的LLM调用"""
+
+class RequestCancelled(Exception):
+    """请求已取消（客户端断开连接或请求超时）"""
+
+class Deadline:
+    """
+    请求级截止时间
+
+    通过 contextvars 传递：asyncio 任务和 asyncio.to_thread 启动的线程都会继承，
+    线程中的同步代码可以在每次LLM调用前检查剩余时间和取消状态。
+    """
+
+    # 单次LLM调用至少需要的秒数，剩余时间更少时不再发起调用
+    MIN_CALL_SECONDS = 1.0
+
+    def __init__(self, timeout: float):
+        self.timeout = timeout
+        self.expires_at = time.monotonic() + timeout
+        self._cancelled = threading.Event()
+
+    def remaining(self) -> float:
+        """剩余秒数"""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        """取消请求，线程中尚未发起的LLM调用和重试等待会立即停止"""
+        self._cancelled.set()
+
+    def call_timeout(self, default: float, expected: Optional[float] = None) -> Optional[float]:
+        """
+        计算本次LLM调用的超时时间：不超过默认值，并为降级策略和保存结果预留 REQUEST_DEADLINE_RESERVE 秒
+
+        Args:
+            default: 默认超时秒数
+            expected: 本次调用的预期耗时（调用点的延迟分位数），没有统计时只要求 MIN_CALL_SECONDS
+
+        Returns:
+            超时秒数，剩余时间不足以发起调用时返回None
+        """
+        available = self.remaining() - settings.REQUEST_DEADLINE_RESERVE
+        if available < max(self.MIN_CALL_SECONDS, expected or 0.0):
+            return None
+        return min(default, available)
+
+# 当前请求的截止时间，不在请求上下文中（如后台任务）时为None
+current_deadline: ContextVar[Optional[Deadline]] = ContextVar("current_deadline", default=None)
+
+def check_cancelled():
+    """当前请求已取消时抛出 RequestCancelled"""
+    deadline = current_deadline.get()
+    if deadline is not None and deadline.cancelled:
+        raise RequestCancelled("请求已取消")
+
+def llm_call_timeout(default: Optional[float] = None, expected: Optional[float] = None) -> float:
+    """
+    获取当前请求中一次LLM调用的超时时间
+
+    Args:
+        default: 不受截止时间限制时的超时秒数，默认读取配置 LLM_TIMEOUT
+        expected: 本次调用的预期耗时，剩余时间不足以覆盖时不发起调用
+
+    Returns:
+        超时秒数
+
+    Raises:
+        RequestCancelled: 请求已取消
+        DeadlineExceeded: 剩余时间不足以发起LLM调用
+    """
+    default = default or settings.LLM_TIMEOUT
+    deadline = current_deadline.get()
+    if deadline is None:
+        return default
+    check_cancelled()
+    timeout = deadline.call_timeout(default, expected)
+    if timeout is None:
+        if expected:
+            raise DeadlineExceeded(
+                f"剩余时间 {deadline.remaining():.1f}秒（预留 {settings.REQUEST_DEADLINE_RESERVE}秒），"
+                f"不足以覆盖LLM调用的预期耗时 {expected:.1f}秒"
+            )
+        raise DeadlineExceeded(f"剩余时间 {deadline.remaining():.1f}秒，不足以发起LLM调用")
+    return timeout
+
+def llm_client(client, timeout: float):
+    """
+    获取本次LLM调用使用的客户端
+
+    SDK内部的自动重试不受截止时间约束：剩余时间不够SDK完成全部重试时返回不自动重试的客户端副本，
+    否则返回原客户端
+
+    Args:
+        client: OpenAI 或 AsyncOpenAI 客户端
+        timeout: 本次调用的超时秒数（llm_call_timeout 的返回值）
+    """
+    deadline = current_deadline.get()
+    if deadline is None:
+        return client
+    if deadline.remaining() - settings.REQUEST_DEADLINE_RESERVE >= (client.max_retries + 1) * timeout:
+        return client
+    return client.with_options(max_retries=0)
+
+def sleep(seconds: float):
+    """
+    重试前等待：不超过剩余时间，请求取消时立即返回并抛出 RequestCancelled
+    """
+    deadline = current_deadline.get()
+    if deadline is None:
+        time.sleep(seconds)
+        return
+    deadline._cancelled.wait(min(seconds, deadline.remaining()))
+    check_cancelled()
@@ -0,0 +1,263 @@
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
+from dataclasses import dataclass
+from .call_stats import latency_tracker
+from .circuit_breaker import CircuitBreaker, circuit_breakers
+from .deadline import RequestCancelled
+from ..config import settings
+import asyncio
+import contextvars
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# 当前是否在对冲线程池中执行：池中的任务再次对冲会等待同一线程池，池满时互相等待而死锁，因此嵌套调用不对冲
+_in_hedge_pool: contextvars.ContextVar[bool] = contextvars.ContextVar("in_hedge_pool", default=False)
+
+@dataclass
+class LLMTarget:
+    """一次LLM调用的目标：客户端、端点的熔断器和模型"""
+    client: Any
+    circuit_breaker: CircuitBreaker
+    model: str
+
+class HedgeBudget:
+    """
+    对冲调用的预算（令牌桶）
+
+    每次可对冲的调用存入 HEDGE_BUDGET_RATIO 个令牌，每次对冲消耗1个，
+    长期来看对冲调用不超过可对冲调用数的 HEDGE_BUDGET_RATIO；最多积攒 HEDGE_BUDGET_BURST 个令牌，
+    端点整体变慢时对冲很快耗尽预算，不会成倍放大流量
+    """
+
+    def __init__(self):
+        self._tokens = 0.0
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self._tokens = min(settings.HEDGE_BUDGET_BURST, self._tokens + settings.HEDGE_BUDGET_RATIO)
+
+    def withdraw(self) -> bool:
+        """消耗一次对冲的预算，预算不足时返回False"""
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+    @property
+    def tokens(self) -> float:
+        with self._lock:
+            return self._tokens
+
+class RequestHedger:
+    """
+    LLM调用的请求对冲
+
+    调用超过调用点耗时的 HEDGE_PERCENTILE 分位数（见 latency_tracker）仍未返回时，在预算允许的情况下
+    发起对冲调用（同一端点的重复调用，或 HEDGE_API_BASE 备用端点），先成功的一方胜出。
+    异步调用中落败的一方被取消；同步客户端的调用无法中断，落败一方在后台结束后结果被丢弃。
+    同步调用只在预算允许对冲时才交给线程池执行，线程池中的调用不再嵌套对冲。
+    """
+
+    # 同步调用对冲时并发执行两方调用的线程数
+    WORKERS = 32
+
+    def __init__(self):
+        self.budget = HedgeBudget()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        # 是否异步客户端 -> 备用端点的客户端
+        self._alternates: Dict[bool, Any] = {}
+        self._lock = threading.Lock()
+        self.stats = {"calls": 0, "hedged": 0, "hedge_wins": 0, "denied": 0}
+
+    def _count(self, key: str):
+        with self._lock:
+            self.stats[key] += 1
+
+    def hedge_target(self, primary: LLMTarget, allow_alternate: bool = True) -> LLMTarget:
+        """
+        对冲调用的目标：配置了 HEDGE_API_BASE 时发往备用端点，否则与主调用相同
+
+        Args:
+            primary: 主调用的目标
+            allow_alternate: 是否允许发往备用端点（依赖服务商特有功能的调用只能发往同一端点）
+        """
+        if not settings.HEDGE_API_BASE or not allow_alternate:
+            return primary
+        import openai
+        is_async = isinstance(primary.client, openai.AsyncOpenAI)
+        with self._lock:
+            if is_async not in self._alternates:
+                client_class = openai.AsyncOpenAI if is_async else openai.OpenAI
+                self._alternates[is_async] = client_class(
+                    api_key=settings.HEDGE_API_KEY or settings.OPENAI_API_KEY3,
+                    base_url=settings.HEDGE_API_BASE
+                )
+            client = self._alternates[is_async]
+        return LLMTarget(client, circuit_breakers.get(client), settings.HEDGE_API_MODEL or primary.model)
+
+    def _delay(self, site: str, enabled: Optional[bool]) -> Optional[float]:
+        """发起对冲前等待的秒数，未启用或调用点样本不足时返回None（不对冲）"""
+        if not (settings.HEDGE_ENABLED if enabled is None else enabled):
+            return None
+        delay = latency_tracker.percentile(site, settings.HEDGE_PERCENTILE)
+        if delay is not None:
+            self._count("calls")
+            self.budget.deposit()
+        return delay
+
+    def _start_hedge(self, site: str, delay: float) -> bool:
+        if not self.budget.withdraw():
+            self._count("denied")
+            return False
+        self._count("hedged")
+        logger.info(f"调用点 {site} 超过 {delay:.1f}秒 未返回，发起对冲调用")
+        return True
+
+    def _submit(self, fn: Callable[[], T]):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.WORKERS, thread_name_prefix="llm-hedge")
+        # 复制上下文，使截止时间在线程中同样生效
+        return self._executor.submit(contextvars.copy_context().run, self._run_in_pool, fn)
+
+    @staticmethod
+    def _run_in_pool(fn: Callable[[], T]) -> T:
+        _in_hedge_pool.set(True)
+        return fn()
+
+    def run(
+        self,
+        site: str,
+        primary: Callable[[], T],
+        hedge: Callable[[], T],
+        accept: Optional[Callable[[T], bool]] = None,
+        enabled: Optional[bool] = None
+    ) -> T:
+        """
+        同步调用的对冲
+
+        Args:
+            site: 调用点名称，用于读取耗时分位数
+            primary: 主调用
+            hedge: 对冲调用
+            accept: 判断结果是否可用，默认不抛出异常即可用
+            enabled: 是否启用对冲，默认读取配置 HEDGE_ENABLED
+
+        Returns:
+            先得到的可用结果；两方都不可用时返回主调用的结果或抛出主调用的异常
+        """
+        if _in_hedge_pool.get():
+            return primary()
+        delay = self._delay(site, enabled)
+        if delay is None:
+            return primary()
+        if self.budget.tokens < 1:
+            # 预算不足时不会发起对冲，主调用直接在调用线程中执行，不占用线程池
+            started = time.monotonic()
+            try:
+                return primary()
+            finally:
+                if time.monotonic() - started > delay:
+                    self._count("denied")
+        first = self._submit(primary)
+        done, _ = wait([first], timeout=delay)
+        if done or not self._start_hedge(site, delay):
+            return first.result()
+        second = self._submit(hedge)
+
+        primary_result, primary_error = None, None
+        for future in as_completed([first, second]):
+            try:
+                result = future.result()
+            except RequestCancelled:
+                raise
+            except Exception as e:
+                if future is first:
+                    primary_error = e
+                continue
+            if accept is None or accept(result):
+                if future is second:
+                    self._count("hedge_wins")
+                return result
+            if future is first:
+                primary_result = result
+        if primary_error is not None:
+            raise primary_error
+        return primary_result
+
+    async def run_async(
+        self,
+        site: str,
+        primary: Callable[[], Awaitable[T]],
+        hedge: Callable[[], Awaitable[T]],
+        accept: Optional[Callable[[T], bool]] = None,
+        enabled: Optional[bool] = None
+    ) -> T:
+        """
+        异步调用的对冲，参数与 run 相同；得到结果后取消另一方
+        """
+        delay = self._delay(site, enabled)
+        if delay is None:
+            return await primary()
+        started = time.monotonic()
+        first = asyncio.ensure_future(primary())
+        # 调用方被取消（截止时间、客户端断开）时，任何阶段都要取消尚未完成的调用
+        pending = {first}
+        primary_result, primary_error = None, None
+        try:
+            done, _ = await asyncio.wait({first}, timeout=delay)
+            if done or not self._start_hedge(site, delay):
+                return await first
+            second = asyncio.ensure_future(hedge())
+            pending.add(second)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                # 同时完成时优先采用主调用的结果
+                for task in sorted(done, key=lambda task: task is not first):
+                    try:
+                        result = task.result()
+                    except RequestCancelled:
+                        raise
+                    except Exception as e:
+                        if task is first:
+                            primary_error = e
+                        continue
+                    if accept is None or accept(result):
+                        if task is second:
+                            self._count("hedge_wins")
+                        return result
+                    if task is first:
+                        primary_result = result
+        finally:
+            pending = {task for task in pending if not task.done()}
+            for task in pending:
+                task.cancel()
+            if first in pending:
+                # 被取消的主调用不会记录耗时，以已等待的时间作为下限记录，避免耗时统计丢掉长尾
+                latency_tracker.record(site, time.monotonic() - started)
+        if primary_error is not None:
+            raise primary_error
+        return primary_result
+
+    def report(self) -> Dict[str, Any]:
+        """对冲统计"""
+        with self._lock:
+            stats = dict(self.stats)
+        return {
+            "enabled": settings.HEDGE_ENABLED,
+            "alternate_endpoint": settings.HEDGE_API_BASE or None,
+            **stats,
+            "hedge_ratio": round(stats["hedged"] / stats["calls"], 4) if stats["calls"] else None,
+            "win_rate": round(stats["hedge_wins"] / stats["hedged"], 4) if stats["hedged"] else None,
+            "budget_tokens": round(self.budget.tokens, 2)
+        }
+
+# 进程内共享的请求对冲（预算和统计跨调用点累计）
+hedger = RequestHedger()
@@ -0,0 +1,96 @@
+from typing import Any, Callable, Dict, Optional
+from contextlib import contextmanager
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+class StartupProfile:
+    """记录启动阶段各步骤（模块导入、单例初始化、预热）的耗时"""
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.timings: Dict[str, float] = {}
+        self.ready_at: Optional[float] = None
+        # 最近一次预热失败的错误信息，预热成功后清空
+        self.error: Optional[str] = None
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def measure(self, name: str):
+        """记录代码块的耗时"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.timings[name] = time.perf_counter() - start
+
+    def mark_ready(self):
+        """标记预热完成"""
+        self.ready_at = time.perf_counter()
+        self.error = None
+        logger.info(f"预热完成，启动耗时: {self.report()}")
+
+    def mark_failed(self, error: str):
+        """记录预热失败"""
+        self.error = error
+
+    @property
+    def ready(self) -> bool:
+        return self.ready_at is not None
+
+    def report(self) -> Dict[str, Any]:
+        """
+        生成启动剖析报告
+
+        Returns:
+            是否就绪、从加载到就绪的耗时及各步骤耗时（毫秒）
+        """
+        with self._lock:
+            timings = dict(self.timings)
+        return {
+            "ready": self.ready,
+            "ready_after_ms": round((self.ready_at - self.started_at) * 1000, 1) if self.ready else None,
+            "error": self.error,
+            "steps_ms": {name: round(seconds * 1000, 1) for name, seconds in timings.items()}
+        }
+
+startup_profile = StartupProfile()
+
+class LazySingleton:
+    """
+    首次使用时才创建的单例，属性访问透明地转发给实例
+
+    创建过程线程安全，创建耗时记录到启动剖析中
+    """
+
+    def __init__(self, name: str, factory: Callable[[], Any]):
+        self._name = name
+        self._factory = factory
+        self._instance = None
+        self._lock = threading.Lock()
+
+    @property
+    def initialized(self) -> bool:
+        return self._instance is not None
+
+    def instance(self) -> Any:
+        """获取实例，尚未创建时立即创建（不命名为 get，避免遮蔽实例自身的 get 方法）"""
+        if self._instance is None:
+            with self._lock:
+                if self._instance is None:
+                    with startup_profile.measure(f"init:{self._name}"):
+                        self._instance = self._factory()
+        return self._instance
+
+    def __len__(self) -> int:
+        # 特殊方法不经过 __getattr__，需要单独转发
+        return len(self.instance())
+
+    def __getattr__(self, attr: str) -> Any:
+        # 自身属性尚未设置时（如复制对象）不转发，避免无限递归
+        if attr in ("_name", "_factory", "_instance", "_lock"):
+            raise AttributeError(attr)
+        return getattr(self.instance(), attr)
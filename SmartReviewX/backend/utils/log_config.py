@@ -0,0 +1,74 @@
+from typing import Optional
+from logging.handlers import QueueHandler, QueueListener
+from ..config import settings
+import atexit
+import json
+import logging
+import queue
+import sys
+
+# LogRecord 的标准属性，其余属性视为通过 extra 传入的结构化字段
+STANDARD_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "taskName"}
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+class JsonFormatter(logging.Formatter):
+    """将日志记录格式化为单行JSON，通过 extra 传入的字段作为顶层字段输出"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        for key, value in vars(record).items():
+            if key not in STANDARD_RECORD_ATTRS and not key.startswith("_"):
+                payload[key] = value
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+def should_log_progress(index: int, total: int, every: Optional[int] = None) -> bool:
+    """
+    逐条处理的进度日志采样：只记录第一条、最后一条和每隔 every 条
+
+    Args:
+        index: 当前序号（从1开始）
+        total: 总数
+        every: 采样间隔，默认读取配置 LOG_PROGRESS_EVERY
+    """
+    every = every or settings.LOG_PROGRESS_EVERY
+    return index == 1 or index == total or index % every == 0
+
+_listener: Optional[QueueListener] = None
+
+def setup_logging() -> QueueListener:
+    """
+    配置非阻塞日志：业务线程只把日志记录放入队列，由后台线程写入控制台和文件
+
+    Returns:
+        后台写日志的 QueueListener（进程退出时自动停止并刷新剩余日志）
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    formatter = JsonFormatter() if settings.LOG_FORMAT == "json" else logging.Formatter(TEXT_FORMAT)
+    handlers = [logging.StreamHandler(sys.stdout)]  # 使用stdout而不是默认的stderr
+    if settings.LOG_FILE:
+        handlers.append(logging.FileHandler(settings.LOG_FILE, encoding='utf-8'))  # 指定文件编码为utf-8
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(QueueHandler(log_queue))
+    root.setLevel(settings.LOG_LEVEL)
+
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+    return _listener
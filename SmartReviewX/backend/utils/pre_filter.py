@@ -0,0 +1,142 @@
+import re
+import logging
+from typing import Dict, Any, List
+from ..models.data_model import GeneratedReview
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+# 情感倾向标签（生成器可能返回中文或英文标签）
+POSITIVE_SENTIMENTS = {"积极", "正面", "positive"}
+NEGATIVE_SENTIMENTS = {"消极", "负面", "negative"}
+
+# _generate_with_fallback 生成的固定文本
+FALLBACK_CONTENT_PATTERN = re.compile(r"^这是一条关于.+的评价。$")
+
+# 计算重复率和词汇多样性时忽略的字符
+IGNORED_CHARS_PATTERN = re.compile(r"[\s，。！？、；：“”‘’（）《》【】,.!?;:'\"()\[\]<>\-]")
+
+
+class ReviewPreFilter:
+    """本地启发式预筛选器，在调用LLM质量检查之前过滤明显不合格的评价"""
+
+    # 重复率计算使用的n-gram长度
+    NGRAM_SIZE = 4
+    # 重复率高于该值时启发式得分降为0，并直接拒绝
+    MAX_REPETITION_RATIO = 0.5
+    # 词汇多样性低于该值时直接拒绝
+    MIN_LEXICAL_DIVERSITY = 0.1
+    # 词汇多样性达到该值时启发式得分为满分
+    TARGET_LEXICAL_DIVERSITY = 0.35
+
+    def __init__(self, reject_threshold: float = None):
+        """
+        初始化预筛选器
+
+        Args:
+            reject_threshold: 启发式综合得分低于该值时直接拒绝，默认读取配置
+        """
+        self.reject_threshold = (
+            settings.PRE_FILTER_REJECT_THRESHOLD if reject_threshold is None else reject_threshold
+        )
+
+    @staticmethod
+    def _normalize_text(content: str) -> str:
+        """去除空白和标点，只保留用于统计的字符"""
+        return IGNORED_CHARS_PATTERN.sub("", content or "")
+
+    def _repetition_ratio(self, text: str) -> float:
+        """计算重复n-gram所占比例，0表示没有重复"""
+        if len(text) < self.NGRAM_SIZE:
+            return 0.0
+        ngrams = [text[i:i + self.NGRAM_SIZE] for i in range(len(text) - self.NGRAM_SIZE + 1)]
+        return 1 - len(set(ngrams)) / len(ngrams)
+
+    @staticmethod
+    def _lexical_diversity(text: str) -> float:
+        """计算字符级别的词汇多样性（不同字符数/总字符数）"""
+        if not text:
+            return 0.0
+        return len(set(text)) / len(text)
+
+    @staticmethod
+    def _sentiment_consistent(rating: float, sentiment: str) -> bool:
+        """检查评分与情感倾向是否一致"""
+        label = (sentiment or "").strip().lower()
+        if rating >= 4 and label in NEGATIVE_SENTIMENTS:
+            return False
+        if rating <= 2 and label in POSITIVE_SENTIMENTS:
+            return False
+        return True
+
+    def extract_features(self, review: GeneratedReview) -> Dict[str, Any]:
+        """
+        提取评价的低成本特征
+
+        Args:
+            review: 评价对象
+
+        Returns:
+            特征字典
+        """
+        content = (review.content or "").strip()
+        text = self._normalize_text(content)
+        return {
+            "length": len(content),
+            "repetition_ratio": round(self._repetition_ratio(text), 4),
+            "lexical_diversity": round(self._lexical_diversity(text), 4),
+            "sentiment_consistent": self._sentiment_consistent(review.rating, review.sentiment),
+            "is_fallback": bool(FALLBACK_CONTENT_PATTERN.match(content))
+        }
+
+    def _score_features(self, features: Dict[str, Any]) -> float:
+        """将特征合成为0-1之间的启发式得分"""
+        length = features["length"]
+        if length < settings.MIN_REVIEW_LENGTH:
+            length_score = length / settings.MIN_REVIEW_LENGTH
+        elif length > settings.MAX_REVIEW_LENGTH:
+            length_score = settings.MAX_REVIEW_LENGTH / length
+        else:
+            length_score = 1.0
+
+        repetition_score = max(0.0, 1 - features["repetition_ratio"] / self.MAX_REPETITION_RATIO)
+        diversity_score = min(1.0, features["lexical_diversity"] / self.TARGET_LEXICAL_DIVERSITY)
+        consistency_score = 1.0 if features["sentiment_consistent"] else 0.0
+
+        return (length_score + repetition_score + diversity_score + consistency_score) / 4
+
+    def evaluate(self, review: GeneratedReview) -> Dict[str, Any]:
+        """
+        对评价进行预筛选
+
+        Args:
+            review: 评价对象
+
+        Returns:
+            包含特征、启发式得分、判定结果（reject/borderline）和拒绝原因的字典
+        """
+        features = self.extract_features(review)
+        score = self._score_features(features)
+
+        reasons: List[str] = []
+        if features["is_fallback"]:
+            reasons.append("评价内容为降级策略生成的固定文本")
+        if features["length"] < settings.MIN_REVIEW_LENGTH:
+            reasons.append(f"评价长度{features['length']}字，低于最小长度{settings.MIN_REVIEW_LENGTH}字")
+        if features["length"] > settings.MAX_REVIEW_LENGTH:
+            reasons.append(f"评价长度{features['length']}字，超过最大长度{settings.MAX_REVIEW_LENGTH}字")
+        if features["repetition_ratio"] > self.MAX_REPETITION_RATIO:
+            reasons.append(f"评价内容重复率{features['repetition_ratio']:.2f}过高")
+        if features["lexical_diversity"] < self.MIN_LEXICAL_DIVERSITY:
+            reasons.append(f"评价内容词汇多样性{features['lexical_diversity']:.2f}过低")
+        if not features["sentiment_consistent"]:
+            reasons.append(f"评分{review.rating}与情感倾向“{review.sentiment}”不一致")
+        if score < self.reject_threshold:
+            reasons.append(f"启发式得分{score:.2f}低于阈值{self.reject_threshold}")
+
+        return {
+            "decision": "reject" if reasons else "borderline",
+            "score": round(score, 4),
+            "features": features,
+            "reasons": reasons
+        }
@@ -0,0 +1,188 @@
+from typing import List, Dict, Any, Tuple
+from ..models.data_model import UserBackground, ProductInfo
+from ..config import settings
+import logging
+import math
+import re
+
+logger = logging.getLogger(__name__)
+
+# 中文字符及全角标点
+CJK_PATTERN = re.compile(r"[\u3000-\u303f\u3400-\u9fff\uff00-\uffef]")
+# 本地分词近似：中文约0.6 token/字，英文、数字及符号约0.3 token/字符
+CJK_TOKENS_PER_CHAR = 0.6
+ASCII_TOKENS_PER_CHAR = 0.3
+
+# 与 CategoryPromptTemplate.generate_review_prompt 中的产品信息标签保持一致
+FIELD_LABELS = {
+    "price_range": "价格区间",
+    "brand": "品牌",
+    "model_number": "型号",
+    "specifications": "规格",
+    "warranty_period": "保修期",
+    "expiration_date": "有效期",
+    "material": "材质",
+    "weight": "重量",
+    "dimensions": "尺寸",
+    "package_info": "包装信息",
+    "energy_efficiency": "能效等级",
+    "safety_certifications": "安全认证",
+    "usage_instructions": "使用说明",
+    "features": "特点"
+}
+
+# 各类别产品信息字段的优先级（靠前的字段优先保留，名称和类别始终保留）
+CATEGORY_FIELD_PRIORITY = {
+    "electronics": [
+        "price_range", "brand", "model_number", "specifications", "features", "warranty_period",
+        "safety_certifications", "dimensions", "weight", "energy_efficiency", "material"
+    ],
+    "daily_necessities": [
+        "price_range", "brand", "features", "material", "specifications", "package_info",
+        "usage_instructions", "safety_certifications", "weight", "dimensions"
+    ],
+    "food_beverage": [
+        "price_range", "brand", "expiration_date", "features", "specifications", "package_info",
+        "safety_certifications", "weight", "usage_instructions"
+    ],
+    "clothing": [
+        "price_range", "brand", "material", "specifications", "features", "dimensions",
+        "weight", "usage_instructions", "package_info"
+    ],
+    "home_appliance": [
+        "price_range", "brand", "model_number", "energy_efficiency", "specifications", "features",
+        "warranty_period", "dimensions", "weight", "safety_certifications", "usage_instructions"
+    ],
+    "stationery": [
+        "price_range", "brand", "features", "material", "specifications", "dimensions",
+        "safety_certifications", "package_info", "weight", "usage_instructions"
+    ]
+}
+
+class PromptBudget:
+    """提示词token预算：超出预算时按类别字段优先级压缩产品信息，并根据评价长度设置输出token上限"""
+
+    # 评价JSON中除评价内容以外的字段（体验、优缺点、评分等）预留的token数
+    OUTPUT_OVERHEAD_TOKENS = 300
+    # 压缩时列表、字典字段在第一轮中保留的条目数
+    LEAD_ITEMS = 5
+
+    @staticmethod
+    def estimate_tokens(text: str) -> int:
+        """用本地近似估算文本的token数"""
+        if not text:
+            return 0
+        cjk = len(CJK_PATTERN.findall(text))
+        return math.ceil(cjk * CJK_TOKENS_PER_CHAR + (len(text) - cjk) * ASCII_TOKENS_PER_CHAR)
+
+    @staticmethod
+    def field_priority(category: str) -> List[str]:
+        """获取类别的字段优先级，未列出的字段排在最后"""
+        priority = list(CATEGORY_FIELD_PRIORITY.get(category, CATEGORY_FIELD_PRIORITY["electronics"]))
+        priority.extend(field for field in FIELD_LABELS if field not in priority)
+        return priority
+
+    def _fit_items(self, items: List[str], remaining: int) -> Tuple[int, int]:
+        """在剩余预算内依次保留条目，返回保留的条目数和占用的token数"""
+        count, used = 0, 0
+        for item in items:
+            cost = self.estimate_tokens(f"{item}, ")
+            if used + cost > remaining:
+                break
+            count += 1
+            used += cost
+        return count, used
+
+    def compact_product_info(
+        self,
+        template,
+        category: str,
+        user_background: UserBackground,
+        product_info: ProductInfo
+    ) -> Tuple[ProductInfo, str, Dict[str, Any]]:
+        """
+        按预算压缩产品信息并渲染提示词
+
+        Args:
+            template: 类别提示词模板
+            category: 生成器类别，用于选择字段优先级
+            user_background: 用户背景信息
+            product_info: 产品信息
+
+        Returns:
+            (压缩后的产品信息, 提示词, 压缩报告)
+        """
+        prompt = template.generate_review_prompt(user_background, product_info)
+        tokens = self.estimate_tokens(prompt)
+        budget = settings.PROMPT_TOKEN_BUDGET
+        report = {"original_tokens": tokens, "tokens": tokens, "budget": budget, "dropped": [], "trimmed": []}
+        if budget <= 0 or tokens <= budget:
+            return product_info, prompt, report
+
+        # 只保留名称和类别时的固定开销
+        compacted = product_info.model_copy(update={field: None for field in FIELD_LABELS})
+        remaining = budget - self.estimate_tokens(template.generate_review_prompt(user_background, compacted))
+        if remaining <= 0:
+            logger.warning(f"提示词固定部分已超出预算 {budget}，只保留产品名称和类别")
+
+        # 第一轮：按优先级保留标量字段，以及列表、字典字段的前 LEAD_ITEMS 项，避免单个大字段挤占全部预算
+        priority = [field for field in self.field_priority(category) if getattr(product_info, field)]
+        field_items, counts = {}, {}
+        for field in priority:
+            value = getattr(product_info, field)
+            label = FIELD_LABELS[field]
+            if not isinstance(value, (dict, list)):
+                cost = self.estimate_tokens(f"- {label}：{value}\n")
+                if cost <= remaining:
+                    counts[field] = 1
+                    remaining -= cost
+                continue
+            items = [f"{key}: {item}" for key, item in value.items()] if isinstance(value, dict) else list(value)
+            field_items[field] = items
+            header = self.estimate_tokens(f"- {label}：\n")
+            count, used = self._fit_items(items[:self.LEAD_ITEMS], remaining - header)
+            if count:
+                counts[field] = count
+                remaining -= header + used
+
+        # 第二轮：剩余预算按优先级补充列表、字典字段的其余条目
+        for field, items in field_items.items():
+            if counts.get(field, 0) < min(len(items), self.LEAD_ITEMS):
+                continue
+            count, used = self._fit_items(items[counts[field]:], remaining)
+            counts[field] += count
+            remaining -= used
+
+        update = {}
+        for field in priority:
+            value = getattr(product_info, field)
+            if field not in counts:
+                report["dropped"].append(field)
+                continue
+            if isinstance(value, dict):
+                update[field] = dict(list(value.items())[:counts[field]])
+            elif isinstance(value, list):
+                update[field] = value[:counts[field]]
+            else:
+                update[field] = value
+            if field in field_items and counts[field] < len(field_items[field]):
+                report["trimmed"].append(field)
+
+        compacted = product_info.model_copy(update={**{field: None for field in FIELD_LABELS}, **update})
+        prompt = template.generate_review_prompt(user_background, compacted)
+        report["tokens"] = self.estimate_tokens(prompt)
+        logger.info(
+            f"提示词压缩: {report['original_tokens']} -> {report['tokens']} tokens，"
+            f"删除字段: {report['dropped']}，截断字段: {report['trimmed']}"
+        )
+        return compacted, prompt, report
+
+    def max_output_tokens(self, reviews: int = 1) -> int:
+        """根据评价最大长度估算生成所需的输出token上限，每条评价不超过 LLM_MAX_TOKENS，一次生成多条时按条数倍增"""
+        if not settings.ADAPTIVE_MAX_TOKENS:
+            return settings.LLM_MAX_TOKENS * reviews
+        content_tokens = math.ceil(settings.MAX_REVIEW_LENGTH * CJK_TOKENS_PER_CHAR)
+        return min(settings.LLM_MAX_TOKENS, content_tokens + self.OUTPUT_OVERHEAD_TOKENS) * reviews
+
+# 所有生成器共享的提示词预算
+prompt_budget = PromptBudget()
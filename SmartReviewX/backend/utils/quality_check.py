@@ -1,22 +1,170 @@
-import numpy as np
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 from ..models.data_model import GeneratedReview, UserBackground
 from ..models.check_prompt import CheckPromptTemplate
-from openai import AsyncOpenAI
+from .pre_filter import ReviewPreFilter
+from .call_stats import token_tracker, latency_tracker
+from .deadline import DeadlineExceeded, RequestCancelled, current_deadline, llm_call_timeout, llm_client
+from .circuit_breaker import CircuitOpenError, circuit_breakers
+from .hedging import LLMTarget, hedger
 from ..config import settings
 import json
 import logging
 import asyncio
+from collections import OrderedDict
+from uuid import uuid4
 
 logger = logging.getLogger(__name__)
 
+ANALYSIS_MODES = ("eager", "lazy", "background")
+
+def batch_result_id(task_id: str, index: int) -> str:
+    """批量任务中检查结果的ID：任务ID:下标，分析报告缓存过期后可据此从任务记录中找回检查结果"""
+    return f"{task_id}:{index}"
+
 class QualityChecker:
+    # 质量维度名称与对应的提示词模板方法
+    DIMENSIONS = {
+        "真实性": "check_authenticity_prompt",
+        "一致性": "check_consistency_prompt",
+        "具体性": "check_specificity_prompt",
+        "语言自然度": "check_language_naturalness_prompt"
+    }
+
     def __init__(self):
+        from openai import AsyncOpenAI
         self.client = AsyncOpenAI(
             api_key=settings.OPENAI_API_KEY3,
             base_url=settings.OPENAI_API_BASE3
         )
+        # 与调用同一端点的评价生成器共享熔断状态
+        self.circuit_breaker = circuit_breakers.get(self.client)
+        self.target = LLMTarget(self.client, self.circuit_breaker, settings.OPENAI_API_MODEL3)
         self.prompt_template = CheckPromptTemplate()
+        self.pre_filter = ReviewPreFilter()
+        # 分析报告缓存: result_id -> {"content", "scores", "analysis", "task"}
+        self._analysis_cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        # 后台分析任务引用，防止任务被垃圾回收
+        self._background_tasks = set()
+        # 多进程部署时共享分析报告缓存的任务存储
+        self._shared_store = None
+
+    def share_analysis_cache(self, store):
+        """通过任务存储在多个工作进程之间共享分析报告缓存"""
+        self._shared_store = store
+
+    def _build_pre_filter_result(self, pre_filter_result: Dict[str, Any]) -> Dict[str, Any]:
+        """为预筛选拒绝的评价构建质量检查结果（不调用LLM）"""
+        return {
+            "scores": {dimension: 1 for dimension in self.DIMENSIONS},
+            "overall_score": 1.0,
+            "analysis": pre_filter_result["reasons"],
+            "pre_filter": pre_filter_result
+        }
+
+    def _build_circuit_open_result(
+        self,
+        review: GeneratedReview,
+        pre_filter_result: Optional[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """LLM端点熔断时，以本地启发式预筛选得分（0-1映射到1-5）作为各维度的降级评分"""
+        if pre_filter_result is None:
+            pre_filter_result = self.pre_filter.evaluate(review)
+        score = round(1 + 4 * pre_filter_result["score"], 2)
+        return {
+            "scores": {dimension: score for dimension in self.DIMENSIONS},
+            "overall_score": score,
+            "analysis": ["LLM服务暂不可用，评分为本地启发式预筛选的估计值"] + pre_filter_result["reasons"],
+            "pre_filter": pre_filter_result,
+            "degraded": True
+        }
+
+    def _build_dimension_request(
+        self,
+        review: GeneratedReview,
+        prompt_method: str,
+        dimension_name: str
+    ) -> Dict[str, Any]:
+        """
+        构建质量维度检查的请求参数
+        
+        Args:
+            review: 评价对象
+            prompt_method: 提示词模板方法名
+            dimension_name: 质量维度名称
+            
+        Returns:
+            chat.completions.create 的请求参数
+        """
+        # 获取对应的提示词模板方法
+        prompt_method = getattr(self.prompt_template, prompt_method)
+        
+        # 根据不同的检查维度使用不同的参数
+        if dimension_name == "真实性":
+            prompt = prompt_method(review.content, review.user_background)
+        else:
+            prompt = prompt_method(review.content)
+        
+        return {
+            "model": settings.OPENAI_API_MODEL3,
+            "messages": [
+                {"role": "system", "content": "你是一个专业的评价质量检查助手。请根据评价内容的质量给出1-5分的评分，5分表示最高质量。"},
+                {"role": "user", "content": prompt}
+            ],
+            "temperature": 0.1,  # 降低温度以获得更稳定的结果
+            "max_tokens": token_tracker.max_tokens(f"check:{dimension_name}", 500),  # 按实际用量自动调整，最多500
+            "response_format": {"type": "json_object"}
+        }
+
+    async def _chat(self, site: str, timeout: float, **request) -> Any:
+        """
+        调用 chat.completions.create：经过熔断器、记录耗时，超过调用点耗时分位数仍未返回时发起对冲调用，
+        先成功的一方胜出，另一方被取消（见 hedger）
+        """
+        request.pop("model", None)
+
+        async def create(target: LLMTarget):
+            with target.circuit_breaker.call(), latency_tracker.measure(site):
+                return await llm_client(target.client, timeout).chat.completions.create(
+                    model=target.model,
+                    timeout=timeout,
+                    **request
+                )
+        return await hedger.run_async(
+            site,
+            lambda: create(self.target),
+            lambda: create(hedger.hedge_target(self.target))
+        )
+
+    @staticmethod
+    def _parse_dimension_result(result: Optional[str], dimension_name: str) -> Dict[str, Any]:
+        """
+        解析质量维度检查的响应内容
+        
+        Args:
+            result: 模型返回的内容
+            dimension_name: 质量维度名称
+            
+        Returns:
+            包含评分和原因的字典
+        """
+        try:
+            result_dict = json.loads(result)
+            score = result_dict.get("score", 0)
+            # 确保评分在1-5之间
+            if score < 1:
+                score = 1
+            elif score > 5:
+                score = 5
+            return {
+                "score": score,
+                "reason": result_dict.get("reason", "")
+            }
+        except (json.JSONDecodeError, TypeError):
+            logger.error(f"Failed to parse {dimension_name} check result: {result}")
+            return {
+                "score": 1,  # 最低分而不是0分
+                "reason": f"Failed to parse {dimension_name} check result"
+            }
 
     async def _check_quality_dimension(
         self,
@@ -36,48 +184,17 @@ class QualityChecker:
             包含评分和原因的字典
         """
         try:
-            # 获取对应的提示词模板方法
-            prompt_method = getattr(self.prompt_template, prompt_method)
-            
-            # 根据不同的检查维度使用不同的参数
-            if dimension_name == "真实性":
-                prompt = prompt_method(review.content, review.user_background)
-            else:
-                prompt = prompt_method(review.content)
-            
             # 调用OpenAI API
-            response = await self.client.chat.completions.create(
-                model=settings.OPENAI_API_MODEL3,
-                messages=[
-                    {"role": "system", "content": "你是一个专业的评价质量检查助手。请根据评价内容的质量给出1-5分的评分，5分表示最高质量。"},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.1,  # 降低温度以获得更稳定的结果
-                max_tokens=500,  # 增加token限制以确保完整响应
-                response_format={"type": "json_object"}
-            )
+            request = self._build_dimension_request(review, prompt_method, dimension_name)
+            timeout = llm_call_timeout()
+            response = await self._chat(f"check:{dimension_name}", timeout, **request)
+            token_tracker.record(f"check:{dimension_name}", response, request["max_tokens"])
             
             # 解析响应
-            result = response.choices[0].message.content
-            try:
-                result_dict = json.loads(result)
-                score = result_dict.get("score", 0)
-                # 确保评分在1-5之间
-                if score < 1:
-                    score = 1
-                elif score > 5:
-                    score = 5
-                return {
-                    "score": score,
-                    "reason": result_dict.get("reason", "")
-                }
-            except json.JSONDecodeError:
-                logger.error(f"Failed to parse {dimension_name} check result: {result}")
-                return {
-                    "score": 1,  # 最低分而不是0分
-                    "reason": f"Failed to parse {dimension_name} check result"
-                }
+            return self._parse_dimension_result(response.choices[0].message.content, dimension_name)
                 
+        except (DeadlineExceeded, RequestCancelled, CircuitOpenError):
+            raise
         except Exception as e:
             logger.error(f"Error in {dimension_name} check: {str(e)}")
             return {
@@ -85,33 +202,248 @@ class QualityChecker:
                 "reason": f"Error in {dimension_name} check: {str(e)}"
             }
 
-    async def check_quality(self, review: GeneratedReview) -> Dict[str, Any]:
+    def _cascade_order(self) -> List[str]:
+        """获取级联检查的维度顺序，未配置的维度排在最后"""
+        order = [dimension for dimension in settings.QUALITY_CASCADE_ORDER if dimension in self.DIMENSIONS]
+        return order + [dimension for dimension in self.DIMENSIONS if dimension not in order]
+
+    async def _check_dimensions_cascaded(
+        self,
+        review: GeneratedReview
+    ) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, Any]]:
+        """
+        按配置顺序级联检查质量维度
+
+        带截断规则的维度逐个检查，一旦评分低于截断值立即停止；
+        最后一个带截断规则的维度之后的维度并行检查。
+
+        Args:
+            review: 评价对象
+
+        Returns:
+            (各维度检查结果, 级联信息)
+        """
+        order = self._cascade_order()
+        cutoffs = settings.QUALITY_CASCADE_CUTOFFS
+        gated = [i for i, dimension in enumerate(order) if dimension in cutoffs]
+        sequential = order[:gated[-1] + 1] if gated else []
+        parallel = order[len(sequential):]
+
+        results = {}
+        for i, dimension in enumerate(sequential):
+            results[dimension] = await self._check_quality_dimension(review, self.DIMENSIONS[dimension], dimension)
+            cutoff = cutoffs.get(dimension)
+            if cutoff is not None and results[dimension]["score"] < cutoff:
+                return results, {
+                    "stopped_at": dimension,
+                    "cutoff": cutoff,
+                    "skipped": order[i + 1:],
+                    "llm_calls": len(results)
+                }
+
+        results.update(await self._check_dimensions_parallel(review, parallel))
+        return results, {
+            "stopped_at": None,
+            "cutoff": None,
+            "skipped": [],
+            "llm_calls": len(results)
+        }
+
+    async def _check_dimensions_parallel(
+        self,
+        review: GeneratedReview,
+        dimensions: List[str]
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        并行检查质量维度
+
+        熔断器尚未恢复时只放行一个探测调用，并行检查会使其余维度被拒绝而整体降级，
+        因此先单独检查第一个维度作为探测，探测成功、熔断器恢复后再并行检查其余维度。
+        """
+        results = {}
+        if dimensions and self.circuit_breaker.recovering:
+            probe = dimensions[0]
+            results[probe] = await self._check_quality_dimension(review, self.DIMENSIONS[probe], probe)
+            dimensions = dimensions[1:]
+        parallel_results = await asyncio.gather(*[
+            self._check_quality_dimension(review, self.DIMENSIONS[dimension], dimension)
+            for dimension in dimensions
+        ])
+        results.update(zip(dimensions, parallel_results))
+        return results
+
+    async def _generate_analysis(self, content: str, scores: Dict[str, float]) -> List[str]:
+        """调用LLM生成质量分析报告"""
+        analysis_prompt = self.prompt_template.generate_analysis_prompt(
+            content,
+            scores
+        )
+        
+        max_tokens = token_tracker.max_tokens("analysis", 1000)
+        timeout = llm_call_timeout()
+        analysis_response = await self._chat(
+            "analysis",
+            timeout,
+            messages=[
+                {"role": "system", "content": "你是一个专业的评价质量分析助手。"},
+                {"role": "user", "content": analysis_prompt}
+            ],
+            temperature=0.1,  # 降低温度以获得更稳定的结果
+            max_tokens=max_tokens,  # 按实际用量自动调整，最多1000
+            response_format={"type": "json_object"}
+        )
+        token_tracker.record("analysis", analysis_response, max_tokens)
+        
+        try:
+            analysis_result = json.loads(analysis_response.choices[0].message.content)
+            return analysis_result.get("analysis", [])
+        except json.JSONDecodeError:
+            logger.error("Failed to parse analysis result")
+            return ["无法生成分析报告"]
+
+    async def _defer_analysis(
+        self,
+        content: str,
+        scores: Dict[str, float],
+        analysis: Optional[List[str]] = None,
+        result_id: Optional[str] = None
+    ) -> str:
+        """登记待生成的分析报告（analysis 不为空时登记已有的分析意见），返回结果ID（未指定时随机生成）"""
+        result_id = result_id or uuid4().hex
+        self._analysis_cache[result_id] = {
+            "content": content,
+            "scores": dict(scores),
+            "analysis": analysis,
+            "task": None
+        }
+        while len(self._analysis_cache) > settings.ANALYSIS_CACHE_SIZE:
+            self._analysis_cache.popitem(last=False)
+        if self._shared_store is not None:
+            # SQLite 写入在跨进程锁竞争时可能等待数秒，不在事件循环中执行
+            prune = len(self._analysis_cache) % 100 == 0
+            await asyncio.to_thread(self._share_deferred, result_id, {"content": content, "scores": dict(scores), "analysis": analysis}, prune)
+        return result_id
+
+    def _share_deferred(self, result_id: str, value: Dict[str, Any], prune: bool):
+        """将待生成的分析报告写入共享存储（新增条目时偶尔清理共享缓存，控制其大小）"""
+        self._shared_store.set_value("analysis", result_id, value)
+        if prune:
+            self._shared_store.prune_values("analysis", settings.ANALYSIS_CACHE_SIZE)
+
+    def _start_analysis_task(self, result_id: str) -> asyncio.Task:
+        """启动（或复用）分析报告生成任务"""
+        entry = self._analysis_cache[result_id]
+        if entry["task"] is None:
+            async def run():
+                # 分析任务独立于发起它的请求，不受该请求截止时间和取消的影响
+                current_deadline.set(None)
+                try:
+                    entry["analysis"] = await self._generate_analysis(entry["content"], entry["scores"])
+                    if self._shared_store is not None:
+                        await asyncio.to_thread(self._shared_store.set_value, "analysis", result_id, {
+                            "content": entry["content"],
+                            "scores": entry["scores"],
+                            "analysis": entry["analysis"]
+                        })
+                finally:
+                    entry["task"] = None
+            entry["task"] = asyncio.create_task(run())
+            self._background_tasks.add(entry["task"])
+            entry["task"].add_done_callback(self._background_tasks.discard)
+            entry["task"].add_done_callback(self._log_analysis_error)
+        return entry["task"]
+
+    @staticmethod
+    def _log_analysis_error(task: asyncio.Task):
+        """记录分析报告生成任务的异常（后台生成时没有调用方等待结果）"""
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"生成分析报告失败: {str(task.exception())}")
+
+    async def get_analysis(self, result_id: str, source: Optional[Dict[str, Any]] = None) -> Optional[List[str]]:
+        """
+        获取延迟生成的分析报告，尚未生成时立即生成并缓存
+        
+        Args:
+            result_id: 质量检查结果ID
+            source: 检查结果中的 analysis_source（评价内容和评分），缓存中已没有该结果时据此重新生成
+            
+        Returns:
+            分析意见列表，结果ID不存在时返回None
+        """
+        entry = self._analysis_cache.get(result_id)
+        if entry is None and self._shared_store is not None:
+            # 结果可能由其他工作进程登记或生成
+            shared = await asyncio.to_thread(self._shared_store.get_value, "analysis", result_id)
+            if shared is not None:
+                if shared["analysis"] is not None:
+                    return shared["analysis"]
+                entry = self._analysis_cache[result_id] = dict(shared, task=None)
+        if entry is None and source is not None:
+            await self._defer_analysis(source["content"], source["scores"], result_id=result_id)
+            entry = self._analysis_cache[result_id]
+        if entry is None:
+            return None
+        self._analysis_cache.move_to_end(result_id)
+        if entry["analysis"] is None:
+            await asyncio.shield(self._start_analysis_task(result_id))
+        return entry["analysis"]
+
+    async def check_quality(
+        self,
+        review: GeneratedReview,
+        cascade: Optional[bool] = None,
+        analysis_mode: Optional[str] = None,
+        result_id: Optional[str] = None
+    ) -> Dict[str, Any]:
         """
         检查评价质量
         
         Args:
             review: 评价对象
+            cascade: 是否使用级联检查，默认读取配置 QUALITY_CASCADE_ENABLED
+            analysis_mode: 分析报告生成方式（eager/lazy/background），默认读取配置 QUALITY_ANALYSIS_MODE
+            result_id: 指定延迟生成分析报告的结果ID（批量任务中见 batch_result_id），
+                指定时结果附带 analysis_source，随任务记录保存，分析报告缓存过期后仍可重新生成
             
         Returns:
             包含各项质量评分的字典
         """
+        if cascade is None:
+            cascade = settings.QUALITY_CASCADE_ENABLED
+        if analysis_mode is None:
+            analysis_mode = settings.QUALITY_ANALYSIS_MODE
+        if analysis_mode not in ANALYSIS_MODES:
+            raise ValueError(f"不支持的分析报告生成方式: {analysis_mode}")
         try:
-            # 并行执行所有质量检查
-            tasks = [
-                self._check_quality_dimension(review, "check_authenticity_prompt", "真实性"),
-                self._check_quality_dimension(review, "check_consistency_prompt", "一致性"),
-                self._check_quality_dimension(review, "check_specificity_prompt", "具体性"),
-                self._check_quality_dimension(review, "check_language_naturalness_prompt", "语言自然度")
-            ]
-            
-            results = await asyncio.gather(*tasks)
+            # 本地预筛选，明显不合格的评价直接拒绝
+            pre_filter_result = None
+            if settings.PRE_FILTER_ENABLED:
+                pre_filter_result = self.pre_filter.evaluate(review)
+                if pre_filter_result["decision"] == "reject":
+                    logger.info(f"评价未通过预筛选，跳过LLM检查: {pre_filter_result['reasons']}")
+                    return self._build_pre_filter_result(pre_filter_result)
+
+            # LLM端点熔断期间不再等待调用超时，直接使用预筛选得分降级
+            if not self.circuit_breaker.available:
+                logger.warning("LLM端点已熔断，使用预筛选得分作为质量评分")
+                return self._build_circuit_open_result(review, pre_filter_result)
+
+            cascade_info = None
+            try:
+                if cascade:
+                    # 级联执行质量检查，低分维度提前终止
+                    results, cascade_info = await self._check_dimensions_cascaded(review)
+                else:
+                    # 并行执行所有质量检查
+                    results = await self._check_dimensions_parallel(review, list(self.DIMENSIONS))
+            except CircuitOpenError as e:
+                logger.warning(f"质量检查过程中{str(e)}，使用预筛选得分作为质量评分")
+                return self._build_circuit_open_result(review, pre_filter_result)
             
-            # 计算总体评分
+            # 计算总体评分（级联提前终止时只包含已检查的维度）
             scores = {
-                "真实性": results[0]["score"],
-                "一致性": results[1]["score"],
-                "具体性": results[2]["score"],
-                "语言自然度": results[3]["score"]
+                dimension: result["score"]
+                for dimension, result in results.items()
             }
             
             # 确保所有评分都在1-5之间
@@ -123,44 +455,157 @@ class QualityChecker:
             
             overall_score = sum(scores.values()) / len(scores)
             
-            # 生成分析报告
-            analysis_prompt = self.prompt_template.generate_analysis_prompt(
-                review.content,
-                scores
-            )
+            result = None
+            if cascade_info and cascade_info["stopped_at"]:
+                # 提前终止时不生成分析报告，以截断原因作为分析意见，其余字段与完整检查一致
+                stopped_at = cascade_info["stopped_at"]
+                logger.info(f"{stopped_at}评分低于{cascade_info['cutoff']}，跳过剩余维度和分析报告")
+                analysis = [
+                    f"{stopped_at}评分{scores[stopped_at]:.1f}低于{cascade_info['cutoff']}，"
+                    f"{results[stopped_at]['reason']}"
+                ]
+                result = {
+                    "scores": scores,
+                    "overall_score": overall_score,
+                    "analysis": analysis
+                }
+                if analysis_mode != "eager":
+                    result["analysis_status"] = "completed"
+                    result["result_id"] = await self._defer_analysis(review.content, scores, analysis, result_id)
+            elif analysis_mode == "eager":
+                # 同步生成分析报告，请求剩余时间不足或生成失败时改为延迟生成，保留已完成的评分
+                try:
+                    result = {
+                        "scores": scores,
+                        "overall_score": overall_score,
+                        "analysis": await self._generate_analysis(review.content, scores)
+                    }
+                except RequestCancelled:
+                    raise
+                except Exception as e:
+                    logger.warning(f"分析报告改为延迟生成: {str(e)}")
+                    analysis_mode = "lazy"
+            if result is None:
+                # 分析报告延迟生成，通过 result_id 获取
+                deferred_id = await self._defer_analysis(review.content, scores, result_id=result_id)
+                if analysis_mode == "background":
+                    self._start_analysis_task(deferred_id)
+                result = {
+                    "scores": scores,
+                    "overall_score": overall_score,
+                    "analysis": None,
+                    "analysis_status": "pending",
+                    "result_id": deferred_id
+                }
+                if result_id is not None:
+                    result["analysis_source"] = {"content": review.content, "scores": scores}
+            if pre_filter_result:
+                result["pre_filter"] = pre_filter_result
+            if cascade_info:
+                result["cascade"] = cascade_info
+                # 提前终止时总体评分只包含已检查的维度，与完整检查的总体评分不可直接比较
+                result["overall_partial"] = cascade_info["stopped_at"] is not None
+            return result
             
-            analysis_response = await self.client.chat.completions.create(
-                model=settings.OPENAI_API_MODEL3,
-                messages=[
-                    {"role": "system", "content": "你是一个专业的评价质量分析助手。"},
-                    {"role": "user", "content": analysis_prompt}
-                ],
-                temperature=0.1,  # 降低温度以获得更稳定的结果
-                max_tokens=1000,  # 增加token限制以确保完整响应
-                response_format={"type": "json_object"}
-            )
+        except Exception as e:
+            logger.error(f"Error in quality check: {str(e)}")
+            raise
+
+    def build_batch_requests(self, reviews: List[GeneratedReview]) -> List[Dict[str, Any]]:
+        """
+        将一组评价的维度检查请求打包为离线批处理请求
+        
+        未通过预筛选的评价不会加入批处理，custom_id 格式为 "{评价下标}:{维度名称}"。
+        
+        Args:
+            reviews: 评价列表
             
-            try:
-                analysis_result = json.loads(analysis_response.choices[0].message.content)
-                analysis = analysis_result.get("analysis", [])
-            except json.JSONDecodeError:
-                logger.error("Failed to parse analysis result")
-                analysis = ["无法生成分析报告"]
+        Returns:
+            批处理请求列表（每项包含 custom_id 和请求体 body）
+        """
+        requests = []
+        for index, review in enumerate(reviews):
+            if settings.PRE_FILTER_ENABLED and self.pre_filter.evaluate(review)["decision"] == "reject":
+                continue
+            for dimension, prompt_method in self.DIMENSIONS.items():
+                requests.append({
+                    "custom_id": f"{index}:{dimension}",
+                    "body": self._build_dimension_request(review, prompt_method, dimension)
+                })
+        return requests
+
+    async def assemble_batch_results(
+        self,
+        reviews: List[GeneratedReview],
+        outputs: Dict[str, Optional[str]],
+        task_id: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        将离线批处理的输出映射回每条评价的质量检查结果
+        
+        分析报告统一延迟生成，可通过 result_id 获取。服务商没有返回输出（请求失败或批处理过期）的评价
+        不以最低分代替，缺失维度的评分为None，结果标记为降级（degraded），不计入统计摘要和质量趋势。
+        
+        Args:
+            reviews: 评价列表（顺序与 build_batch_requests 一致）
+            outputs: custom_id 到模型返回内容的映射，失败的请求为None
+            task_id: 批量任务ID，指定时结果ID见 batch_result_id，结果附带 analysis_source
             
-            return {
+        Returns:
+            与评价列表顺序一致的质量检查结果列表
+        """
+        results = []
+        for index, review in enumerate(reviews):
+            if settings.PRE_FILTER_ENABLED:
+                pre_filter_result = self.pre_filter.evaluate(review)
+                if pre_filter_result["decision"] == "reject":
+                    results.append(self._build_pre_filter_result(pre_filter_result))
+                    continue
+            missing = [dimension for dimension in self.DIMENSIONS if outputs.get(f"{index}:{dimension}") is None]
+            if missing:
+                scores = {
+                    dimension: None if dimension in missing
+                    else self._parse_dimension_result(outputs[f"{index}:{dimension}"], dimension)["score"]
+                    for dimension in self.DIMENSIONS
+                }
+                available = [score for score in scores.values() if score is not None]
+                results.append({
+                    "scores": scores,
+                    "overall_score": sum(available) / len(available) if available else None,
+                    "analysis": [f"离线批处理未返回以下维度的检查结果: {', '.join(missing)}"],
+                    "analysis_status": "failed",
+                    "degraded": True,
+                    "failed_dimensions": missing
+                })
+                continue
+            scores = {
+                dimension: self._parse_dimension_result(outputs.get(f"{index}:{dimension}"), dimension)["score"]
+                for dimension in self.DIMENSIONS
+            }
+            result_id = batch_result_id(task_id, index) if task_id else None
+            result = {
                 "scores": scores,
-                "overall_score": overall_score,
-                "analysis": analysis
+                "overall_score": sum(scores.values()) / len(scores),
+                "analysis": None,
+                "analysis_status": "pending",
+                "result_id": await self._defer_analysis(review.content, scores, result_id=result_id)
             }
-            
-        except Exception as e:
-            logger.error(f"Error in quality check: {str(e)}")
-            raise
+            if result_id is not None:
+                result["analysis_source"] = {"content": review.content, "scores": scores}
+            results.append(result)
+        return results
 
-    async def check_quality_batch(self, reviews: List[GeneratedReview]) -> List[Dict[str, Any]]:
-        """批量检查评价质量"""
+    async def check_quality_batch(
+        self,
+        reviews: List[GeneratedReview],
+        cascade: Optional[bool] = None,
+        analysis_mode: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """批量检查评价质量，默认不同步生成分析报告"""
+        if analysis_mode is None:
+            analysis_mode = settings.BATCH_QUALITY_ANALYSIS_MODE
         results = []
         for review in reviews:
-            result = await self.check_quality(review)
+            result = await self.check_quality(review, cascade=cascade, analysis_mode=analysis_mode)
             results.append(result)
         return results 
\ No newline at end of file
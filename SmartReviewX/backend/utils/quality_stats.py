@@ -0,0 +1,193 @@
+from typing import Dict, Any, Iterable, List, Optional
+from ..config import settings
+import bisect
+import math
+
+# 维度评分和总分的取值范围
+MIN_SCORE = 1.0
+MAX_SCORE = 5.0
+# 直方图分桶宽度：[1, 1.5), [1.5, 2), ..., [4.5, 5]
+HISTOGRAM_BIN_WIDTH = 0.5
+
+def normalize_score(score: float) -> float:
+    """将1-5分映射到0-1（与质量检查降级评分的 1 + 4 × 得分 互逆），用于与 QUALITY_THRESHOLD 比较"""
+    return (score - MIN_SCORE) / (MAX_SCORE - MIN_SCORE)
+
+class RunningStats:
+    """Welford 算法在线计算均值和方差，不保存样本"""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+
+    def add(self, value: float):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    @property
+    def variance(self) -> float:
+        """总体方差"""
+        return self._m2 / self.count if self.count else 0.0
+
+    def report(self) -> Dict[str, Any]:
+        if not self.count:
+            return {"mean": None, "variance": None, "min": None, "max": None}
+        return {
+            "mean": round(self.mean, 4),
+            "variance": round(self.variance, 4),
+            "min": self.min,
+            "max": self.max
+        }
+
+class P2Quantile:
+    """
+    P² 算法（Jain & Chlamtac）流式估计分位数：只维护5个标记点，内存和单次更新均为常数
+
+    样本少于5个时返回精确分位数
+    """
+
+    def __init__(self, p: float):
+        self.p = p
+        self.heights: List[float] = []
+        self.positions = [1, 2, 3, 4, 5]
+        self.desired = [1, 1 + 2 * p, 1 + 4 * p, 3 + 2 * p, 5]
+        self.increments = [0, p / 2, p, (1 + p) / 2, 1]
+
+    def add(self, value: float):
+        q, n = self.heights, self.positions
+        if len(q) < 5:
+            bisect.insort(q, value)
+            return
+
+        # 找到样本所在的区间并调整两端标记
+        if value < q[0]:
+            q[0] = value
+            k = 0
+        elif value >= q[4]:
+            q[4] = value
+            k = 3
+        else:
+            k = bisect.bisect_right(q, value) - 1
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self.desired[i] += self.increments[i]
+
+        # 中间标记偏离期望位置时按分段抛物线（必要时退化为线性）插值移动
+        for i in range(1, 4):
+            d = self.desired[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                d = 1 if d > 0 else -1
+                height = self._parabolic(i, d)
+                if not q[i - 1] < height < q[i + 1]:
+                    height = q[i] + d * (q[i + d] - q[i]) / (n[i + d] - n[i])
+                q[i] = height
+                n[i] += d
+
+    def _parabolic(self, i: int, d: int) -> float:
+        q, n = self.heights, self.positions
+        return q[i] + d / (n[i + 1] - n[i - 1]) * (
+            (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+            + (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1])
+        )
+
+    def value(self) -> Optional[float]:
+        """当前分位数估计，没有样本时返回None"""
+        if not self.heights:
+            return None
+        if len(self.heights) < 5 or self.positions[4] == 5:
+            rank = max(0, math.ceil(self.p * len(self.heights)) - 1)
+            return self.heights[rank]
+        return self.heights[2]
+
+class QualitySummary:
+    """
+    批量质量检查的增量统计：每条结果写入时更新，查询任务状态时无需重新扫描结果
+
+    - 各维度评分的均值、方差、最值和直方图
+    - 总分的均值、方差和流式分位数（P²）
+    - 总分（折算为0-1）低于 QUALITY_THRESHOLD 的比例
+
+    以上统计只包含LLM完整评分的结果；预筛选拒绝、熔断降级和级联提前停止（overall_partial）的结果
+    总分不是各维度评分的完整平均，只单独计数
+    """
+
+    QUANTILES = (0.1, 0.5, 0.9)
+
+    def __init__(self, dimensions: Iterable[str]):
+        self.bins = int(round((MAX_SCORE - MIN_SCORE) / HISTOGRAM_BIN_WIDTH))
+        self.dimensions = {dimension: RunningStats() for dimension in dimensions}
+        self.histograms = {dimension: [0] * self.bins for dimension in self.dimensions}
+        self.overall = RunningStats()
+        self.quantiles = {p: P2Quantile(p) for p in self.QUANTILES}
+        self.below_threshold = 0
+        self.pre_filter_rejected = 0
+        self.cascade_partial = 0
+        self.degraded = 0
+
+    def _bin(self, score: float) -> int:
+        return min(self.bins - 1, max(0, int((score - MIN_SCORE) // HISTOGRAM_BIN_WIDTH)))
+
+    def add(self, result: Dict[str, Any]):
+        """加入一条质量检查结果（没有评分的结果忽略）"""
+        if result.get("degraded"):
+            self.degraded += 1
+            return
+        overall_score = result.get("overall_score")
+        if overall_score is None:
+            return
+        if (result.get("pre_filter") or {}).get("decision") == "reject":
+            self.pre_filter_rejected += 1
+            return
+        if result.get("overall_partial"):
+            self.cascade_partial += 1
+            return
+        for dimension, score in result.get("scores", {}).items():
+            if dimension in self.dimensions and score is not None:
+                self.dimensions[dimension].add(score)
+                self.histograms[dimension][self._bin(score)] += 1
+        self.overall.add(overall_score)
+        for estimator in self.quantiles.values():
+            estimator.add(overall_score)
+        if normalize_score(overall_score) < settings.QUALITY_THRESHOLD:
+            self.below_threshold += 1
+
+    def report(self) -> Dict[str, Any]:
+        """
+        生成统计报告
+
+        Returns:
+            LLM评分的结果数、各维度统计（含该维度的评分数，直方图以分桶下界为键）、总分统计、
+            低于阈值的比例，以及预筛选拒绝、级联提前停止和降级的结果数
+        """
+        edges = [f"{MIN_SCORE + i * HISTOGRAM_BIN_WIDTH:.1f}" for i in range(self.bins)]
+        count = self.overall.count
+        return {
+            "count": count,
+            "dimensions": {
+                dimension: {"count": stats.count, **stats.report(), "histogram": dict(zip(edges, self.histograms[dimension]))}
+                for dimension, stats in self.dimensions.items()
+            },
+            "overall": {
+                **self.overall.report(),
+                "quantiles": {
+                    f"p{int(p * 100)}": None if estimator.value() is None else round(estimator.value(), 4)
+                    for p, estimator in self.quantiles.items()
+                }
+            },
+            "below_threshold": {
+                "threshold": settings.QUALITY_THRESHOLD,
+                "count": self.below_threshold,
+                "fraction": round(self.below_threshold / count, 4) if count else None
+            },
+            "pre_filter_rejected": self.pre_filter_rejected,
+            "cascade_partial": self.cascade_partial,
+            "degraded": self.degraded
+        }
@@ -0,0 +1,250 @@
+from typing import Dict, Any, Iterable, Optional, Sequence, Tuple
+from pathlib import Path
+from datetime import date, datetime, timedelta, timezone
+from collections import defaultdict
+from urllib.parse import quote, unquote
+import json
+import logging
+import os
+import platform
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# 时间序列的分桶粒度（秒）
+TREND_BUCKETS = {"day": 86400, "hour": 3600}
+
+# 序列键：(产品类别, 生成模型, 提示词版本)
+SeriesKey = Tuple[str, str, str]
+
+def _series_filename(key: SeriesKey) -> str:
+    # quote 会转义 "+"，可以用作分隔符
+    return "+".join(quote(part, safe="") for part in key) + ".bin"
+
+def _parse_series_filename(name: str) -> SeriesKey:
+    return tuple(unquote(part) for part in name[:-len(".bin")].split("+"))
+
+def _day_start(day: date) -> float:
+    return datetime(day.year, day.month, day.day, tzinfo=timezone.utc).timestamp()
+
+class QualityTrendStore:
+    """
+    质量检查评分的时间序列存储
+
+    按UTC日期分目录、按序列键分文件，每条检查结果追加为一条定长二进制记录
+    （时间戳 float64、总分 float32、各维度评分 float32，缺失的维度为NaN），
+    查询时整文件读入 NumPy 数组后向量化计算。每次追加是文件锁内的一次 O_APPEND 写入，多进程可以同时写。
+    """
+
+    def __init__(self, directory: Path, dimensions: Sequence[str]):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.dimensions = list(dimensions)
+        self._lock = threading.Lock()
+        self._check_meta()
+
+    def _check_meta(self):
+        """记录维度顺序，维度变化后旧数据无法按列解读"""
+        meta_path = self.directory / "meta.json"
+        if meta_path.exists():
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+            if meta["dimensions"] != self.dimensions:
+                raise ValueError(f"质量趋势存储的维度 {meta['dimensions']} 与当前维度 {self.dimensions} 不一致")
+            return
+        meta_path.write_text(json.dumps({"dimensions": self.dimensions}, ensure_ascii=False), encoding="utf-8")
+
+    @property
+    def dtype(self):
+        import numpy as np
+        return np.dtype([("ts", "<f8"), ("overall", "<f4"), ("scores", "<f4", (len(self.dimensions),))])
+
+    def record(self, entries: Iterable[Tuple[SeriesKey, Dict[str, Any]]], timestamp: Optional[float] = None) -> int:
+        """
+        追加质量检查结果
+
+        Args:
+            entries: (序列键, 质量检查结果) 列表，没有总分的结果忽略
+            timestamp: 记录时间，默认当前时间
+
+        Returns:
+            写入的记录数
+        """
+        import numpy as np
+        timestamp = time.time() if timestamp is None else timestamp
+        grouped = defaultdict(list)
+        for key, result in entries:
+            if result.get("overall_score") is not None:
+                grouped[key].append(result)
+        if not grouped:
+            return 0
+
+        day_dir = self.directory / datetime.fromtimestamp(timestamp, timezone.utc).date().isoformat()
+        day_dir.mkdir(exist_ok=True)
+        written = 0
+        for key, results in grouped.items():
+            records = np.zeros(len(results), dtype=self.dtype)
+            records["ts"] = timestamp
+            records["overall"] = [result["overall_score"] for result in results]
+            records["scores"] = [
+                [result.get("scores", {}).get(dimension, np.nan) for dimension in self.dimensions]
+                for result in results
+            ]
+            with self._lock:
+                self._append(day_dir / _series_filename(key), records.tobytes())
+            written += len(results)
+        return written
+
+    def _append(self, path: Path, data: bytes):
+        """
+        在文件锁内追加记录
+
+        进程中途退出可能在文件末尾留下不完整的记录，之后追加的记录会整体错位，
+        因此写入前先截断到完整记录的边界
+        """
+        itemsize = self.dtype.itemsize
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            if platform.system() == 'Windows':
+                import msvcrt
+                msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            size = os.fstat(fd).st_size
+            if size % itemsize:
+                logger.warning(f"质量趋势文件 {path} 末尾有不完整的记录，已截断")
+                os.ftruncate(fd, size - size % itemsize)
+            while data:
+                data = data[os.write(fd, data):]
+        finally:
+            # 关闭文件时释放锁
+            os.close(fd)
+
+    def _read(self, path: Path):
+        import numpy as np
+        # 进程中途退出可能留下不完整的记录，只读取完整部分
+        count = path.stat().st_size // self.dtype.itemsize
+        return np.fromfile(path, dtype=self.dtype, count=count)
+
+    def _load(self, start: date, end: date, filters: Dict[str, Optional[str]]):
+        """读取日期范围内匹配过滤条件的全部记录"""
+        import numpy as np
+        arrays, series = [], set()
+        day = start
+        while day <= end:
+            day_dir = self.directory / day.isoformat()
+            if day_dir.is_dir():
+                for path in day_dir.glob("*.bin"):
+                    key = _parse_series_filename(path.name)
+                    if any(value is not None and key[i] != value for i, value in enumerate(filters.values())):
+                        continue
+                    arrays.append(self._read(path))
+                    series.add(key)
+            day += timedelta(days=1)
+        data = np.concatenate(arrays) if arrays else np.zeros(0, dtype=self.dtype)
+        return data, sorted(series)
+
+    def query(
+        self,
+        start: date,
+        end: date,
+        bucket: str = "day",
+        window: int = 1,
+        percentiles: Sequence[float] = (50, 90),
+        category: Optional[str] = None,
+        model: Optional[str] = None,
+        prompt_version: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        按时间分桶统计各维度和总分
+
+        每个分桶给出本桶的记录数和均值，以及最近 window 个分桶（含本桶）的滚动均值和滚动分位数
+
+        Args:
+            start, end: 起止日期（UTC，含两端）
+            bucket: 分桶粒度 day/hour
+            window: 滚动窗口包含的分桶数
+            percentiles: 分位数（0-100）
+            category, model, prompt_version: 序列过滤条件，为None时不过滤
+
+        Returns:
+            匹配的序列和各分桶的统计
+        """
+        import numpy as np
+        bucket_seconds = TREND_BUCKETS[bucket]
+        t0 = _day_start(start)
+        n_buckets = int((_day_start(end + timedelta(days=1)) - t0) // bucket_seconds)
+        data, series = self._load(start, end, {"category": category, "model": model, "prompt_version": prompt_version})
+
+        # 按分桶排序后，每个分桶及每个滚动窗口都是一段连续的行
+        idx = ((data["ts"] - t0) // bucket_seconds).astype(np.int64)
+        in_range = (idx >= 0) & (idx < n_buckets)
+        data, idx = data[in_range], idx[in_range]
+        order = np.argsort(idx, kind="stable")
+        idx = idx[order]
+        values = np.column_stack([data["scores"][order], data["overall"][order]]).astype(np.float64)
+        valid = ~np.isnan(values)
+        filled = np.where(valid, values, 0.0)
+        columns = self.dimensions + ["overall"]
+
+        # 每个分桶、每列的有效样本数和总和
+        counts = np.stack([np.bincount(idx, weights=valid[:, j], minlength=n_buckets) for j in range(len(columns))], axis=1)
+        sums = np.stack([np.bincount(idx, weights=filled[:, j], minlength=n_buckets) for j in range(len(columns))], axis=1)
+
+        # 前缀和相减得到滚动窗口的总和
+        window_end = np.arange(1, n_buckets + 1)
+        window_start = np.maximum(0, window_end - window)
+        count_prefix = np.vstack([np.zeros(len(columns)), np.cumsum(counts, axis=0)])
+        sum_prefix = np.vstack([np.zeros(len(columns)), np.cumsum(sums, axis=0)])
+        rolling_counts = count_prefix[window_end] - count_prefix[window_start]
+        rolling_sums = sum_prefix[window_end] - sum_prefix[window_start]
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means = sums / counts
+            rolling_means = rolling_sums / rolling_counts
+
+        # 滚动分位数：窗口内的行连续，逐个窗口、逐列在去掉NaN的切片上计算
+        # （np.nanpercentile 按行回退到逐元素处理，百万级数据上慢一个数量级）
+        boundaries = np.searchsorted(idx, np.arange(n_buckets + 1))
+        by_column = np.ascontiguousarray(values.T)
+        rolling_percentiles = np.full((n_buckets, len(percentiles), len(columns)), np.nan)
+        for b in range(n_buckets):
+            lo, hi = boundaries[window_start[b]], boundaries[b + 1]
+            for j in range(len(columns)):
+                if not rolling_counts[b, j]:
+                    continue
+                column = by_column[j, lo:hi]
+                if rolling_counts[b, j] < hi - lo:
+                    column = column[~np.isnan(column)]
+                rolling_percentiles[b, :, j] = np.percentile(column, percentiles)
+
+        def number(value):
+            return None if np.isnan(value) else round(float(value), 4)
+
+        points = []
+        for b in range(n_buckets):
+            bucket_start = datetime.fromtimestamp(t0 + b * bucket_seconds, timezone.utc)
+            points.append({
+                "time": bucket_start.date().isoformat() if bucket == "day" else bucket_start.isoformat(),
+                "count": int(counts[b, -1]),
+                **{
+                    column: {
+                        "mean": number(means[b, j]),
+                        "rolling_mean": number(rolling_means[b, j]),
+                        **{
+                            f"p{p:g}": number(rolling_percentiles[b, k, j])
+                            for k, p in enumerate(percentiles)
+                        }
+                    }
+                    for j, column in enumerate(columns)
+                }
+            })
+
+        return {
+            "series": [
+                {"category": key[0], "model": key[1], "prompt_version": key[2]} for key in series
+            ],
+            "records": int(len(data)),
+            "points": points
+        }
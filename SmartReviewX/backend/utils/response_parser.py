@@ -0,0 +1,274 @@
+from typing import List, Dict, Any, Optional, Tuple
+from collections import Counter
+import json
+import logging
+import re
+import threading
+
+logger = logging.getLogger(__name__)
+
+# 代码块包裹的JSON，如 ```json {...} ```
+FENCE_PATTERN = re.compile(r"```(?:json|JSON)?\s*(.*?)(?:```|$)", re.S)
+# 从 "4分"、"0.9（较高）" 等字符串中提取数值
+NUMBER_PATTERN = re.compile(r"-?\d+(?:\.\d+)?")
+
+class ReviewResponseParser:
+    """容错的评价响应解析器：修复被截断或被代码块包裹的JSON，填充可默认的字段，并统计挽救率"""
+
+    # 必要字段及其补充请求时的说明
+    REQUIRED_FIELDS = {
+        "content": "评价内容（200-300字）",
+        "rating": "评分（1-5）",
+        "sentiment": "情感倾向（积极/消极/中性）",
+        "sentiment_score": "情感倾向置信度（0-1）",
+        "quality_score": "质量置信度（0-1）"
+    }
+    NUMERIC_FIELDS = ("rating", "sentiment_score", "quality_score")
+
+    def __init__(self):
+        self._stats = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, outcome: str):
+        """记录一次解析结果"""
+        with self._lock:
+            self._stats[outcome] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取解析统计信息
+
+        Returns:
+            各类结果的次数及挽救率（修复、默认值填充、补充请求后可用的响应占全部响应的比例）
+        """
+        with self._lock:
+            stats = dict(self._stats)
+        total = stats.get("total", 0)
+        salvaged = stats.get("repaired", 0) + stats.get("defaults_filled", 0) + stats.get("followup_succeeded", 0)
+        unusable = stats.get("failed", 0) + stats.get("incomplete", 0) - stats.get("followup_succeeded", 0)
+        stats["salvage_rate"] = round(salvaged / total, 4) if total else 0.0
+        stats["failure_rate"] = round(unusable / total, 4) if total else 0.0
+        return stats
+
+    @staticmethod
+    def _repair_truncated(text: str) -> Optional[str]:
+        """
+        修复被截断的JSON：截到最后一个完整值的位置，并补齐未闭合的括号
+
+        Args:
+            text: 以 { 开头的JSON文本
+
+        Returns:
+            修复后的JSON文本，无法修复时返回None
+        """
+        stack = []
+        in_string = False
+        escaped = False
+        safe_cut, safe_stack = None, None
+        for i, char in enumerate(text):
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif char == "\\":
+                    escaped = True
+                elif char == '"':
+                    in_string = False
+                continue
+            if char == '"':
+                in_string = True
+            elif char in "{[":
+                stack.append("}" if char == "{" else "]")
+            elif char in "}]":
+                if not stack:
+                    return None
+                stack.pop()
+                safe_cut, safe_stack = i + 1, list(stack)
+                if not stack:
+                    return text[:i + 1]
+            elif char == ",":
+                safe_cut, safe_stack = i, list(stack)
+        if safe_cut is None:
+            return None
+        return text[:safe_cut] + "".join(reversed(safe_stack))
+
+    def extract_json(self, raw: Optional[str]) -> Tuple[Optional[Dict[str, Any]], bool]:
+        """
+        从模型返回内容中提取JSON对象
+
+        Args:
+            raw: 模型返回内容
+
+        Returns:
+            (JSON对象, 是否经过修复)，无法解析时JSON对象为None
+        """
+        if not raw:
+            return None, False
+        try:
+            result = json.loads(raw)
+            return (result, False) if isinstance(result, dict) else (None, False)
+        except json.JSONDecodeError:
+            pass
+
+        text = raw
+        fenced = FENCE_PATTERN.search(text)
+        if fenced:
+            text = fenced.group(1)
+        start = text.find("{")
+        if start < 0:
+            return None, False
+        text = text[start:]
+
+        end = text.rfind("}")
+        if end >= 0:
+            try:
+                result = json.loads(text[:end + 1])
+                if isinstance(result, dict):
+                    return result, True
+            except json.JSONDecodeError:
+                pass
+
+        repaired = self._repair_truncated(text)
+        if repaired:
+            try:
+                result = json.loads(repaired)
+                if isinstance(result, dict):
+                    return result, True
+            except json.JSONDecodeError:
+                pass
+        return None, False
+
+    def _normalize(self, result: Dict[str, Any]) -> bool:
+        """转换数值字段并填充可默认的字段，返回是否填充了默认值"""
+        for field in self.NUMERIC_FIELDS:
+            value = result.get(field)
+            if isinstance(value, str):
+                match = NUMBER_PATTERN.search(value)
+                if match:
+                    result[field] = float(match.group())
+                else:
+                    result.pop(field)
+
+        filled = False
+        for field in ("experience",):
+            if not isinstance(result.get(field), str):
+                result[field] = ""
+                filled = True
+        for field in ("pros", "cons"):
+            if not isinstance(result.get(field), list):
+                result[field] = []
+                filled = True
+        if not result.get("sentiment") and isinstance(result.get("rating"), (int, float)):
+            rating = result["rating"]
+            result["sentiment"] = "积极" if rating >= 4 else ("消极" if rating <= 2 else "中性")
+            filled = True
+        return filled
+
+    def missing_fields(self, result: Dict[str, Any], required: Optional[List[str]] = None) -> List[str]:
+        """返回缺失或无效的必要字段"""
+        missing = []
+        for field in required or self.REQUIRED_FIELDS:
+            value = result.get(field)
+            if value is None or value == "":
+                missing.append(field)
+            elif field in self.NUMERIC_FIELDS and not isinstance(value, (int, float)):
+                missing.append(field)
+        return missing
+
+    def parse(self, raw: Optional[str], required: Optional[List[str]] = None) -> Tuple[Optional[Dict[str, Any]], List[str]]:
+        """
+        解析模型返回的评价内容
+
+        Args:
+            raw: 模型返回内容
+            required: 必要字段列表，默认为 REQUIRED_FIELDS
+
+        Returns:
+            (解析结果, 缺失的必要字段)，完全无法解析时解析结果为None
+        """
+        self.record("total")
+        result, repaired = self.extract_json(raw)
+        if result is None:
+            self.record("failed")
+            return None, []
+        return result, self._check(result, repaired, required)
+
+    def parse_candidates(self, raw: Optional[str], required: Optional[List[str]] = None) -> List[Tuple[Dict[str, Any], List[str]]]:
+        """
+        解析一次返回多条评价的响应（{"reviews": [...]}），每条候选单独规范化和校验
+
+        被截断的响应修复后只保留完整的候选，最后一条不完整的候选会因缺少字段被调用方丢弃
+
+        Args:
+            raw: 模型返回内容
+            required: 必要字段列表，默认为 REQUIRED_FIELDS
+
+        Returns:
+            各候选的 (解析结果, 缺失的必要字段)，完全无法解析时返回空列表
+        """
+        container, repaired = self.extract_json(raw)
+        if container is None:
+            self.record("total")
+            self.record("failed")
+            return []
+        items = container.get("reviews")
+        if not isinstance(items, list):
+            # 模型只返回了一条评价
+            items = [container]
+
+        parsed = []
+        for item in items:
+            self.record("total")
+            if not isinstance(item, dict):
+                self.record("failed")
+                continue
+            parsed.append((item, self._check(item, repaired, required)))
+        return parsed
+
+    def _check(self, result: Dict[str, Any], repaired: bool, required: Optional[List[str]]) -> List[str]:
+        """规范化解析结果、记录解析结果类别，返回缺失的必要字段"""
+        filled = self._normalize(result)
+        missing = self.missing_fields(result, required)
+        if missing:
+            self.record("incomplete")
+        elif repaired:
+            self.record("repaired")
+        elif filled:
+            self.record("defaults_filled")
+        else:
+            self.record("clean")
+        return missing
+
+    def build_followup_prompt(self, result: Dict[str, Any], missing: List[str]) -> str:
+        """构建只请求缺失字段的简短补充提示词"""
+        fields = "\n".join(f"- {field}: {self.REQUIRED_FIELDS[field]}" for field in missing)
+        partial = json.dumps(
+            {key: value for key, value in result.items() if key in self.REQUIRED_FIELDS},
+            ensure_ascii=False
+        )
+        return f"""以下是一条已生成但不完整的用户评价（JSON）：
+{partial}
+
+请保持已有内容不变，只补充以下缺失字段，并以JSON格式返回这些字段：
+{fields}"""
+
+    def merge_followup(self, result: Dict[str, Any], raw: Optional[str], missing: List[str]) -> List[str]:
+        """
+        合并补充请求的响应，返回仍然缺失的字段
+
+        Args:
+            result: 原解析结果（原地更新）
+            raw: 补充请求的模型返回内容
+            missing: 补充前缺失的字段
+        """
+        supplement, _ = self.extract_json(raw)
+        if supplement:
+            for field in missing:
+                if field in supplement:
+                    result[field] = supplement[field]
+            self._normalize(result)
+        still_missing = self.missing_fields(result, missing)
+        self.record("followup_failed" if still_missing else "followup_succeeded")
+        return still_missing
+
+# 所有生成器共享的解析器，统计信息跨请求累计
+review_response_parser = ReviewResponseParser()
@@ -1,346 +1,434 @@
-import pandas as pd
-import os
-import shutil
-import logging
-import json
-from datetime import datetime
-from typing import List, Dict, Optional
-from ..models.data_model import GeneratedReview
-from pathlib import Path
-import platform
-
-logger = logging.getLogger(__name__)
-
-class ReviewSaver:
-    """评价保存工具类"""
-    
-    def __init__(self):
-        self.base_path = Path("data/reviews")
-        self.base_path.mkdir(parents=True, exist_ok=True)
-        self._load_schema()
-        
-    def _load_schema(self):
-        """加载数据模式"""
-        schema_file = self.base_path / "schema.json"
-        if schema_file.exists():
-            with open(schema_file, 'r', encoding='utf-8') as f:
-                self.schema = json.load(f)
-        else:
-            self.schema = {
-                "fieldnames": self._get_fieldnames(),
-                "version": "1.0",
-                "last_updated": datetime.now().isoformat()
-            }
-            self._save_schema()
-            
-    def _save_schema(self):
-        """保存数据模式"""
-        schema_file = self.base_path / "schema.json"
-        with open(schema_file, 'w', encoding='utf-8') as f:
-            json.dump(self.schema, f, indent=2, ensure_ascii=False)
-            
-    def _get_filename(self, category: str) -> str:
-        """获取保存文件名"""
-        date_str = datetime.now().strftime("%Y%m%d")
-        return self.base_path / f"{category}_reviews_{date_str}.csv"
-        
-    def _get_fieldnames(self) -> List[str]:
-        """获取CSV文件的字段名"""
-        return [
-            # 用户背景信息
-            "user_gender", "user_age", "user_occupation", "user_income_level",
-            "user_experience", "user_tech_familiarity", "user_purchase_purpose",
-            "user_region", "user_education_level", "user_usage_frequency",
-            "user_brand_loyalty",
-            
-            # 产品信息
-            "product_name", "product_category", "product_price_range",
-            "product_brand", "product_model_number", "product_specifications",
-            "product_warranty_period", "product_expiration_date",
-            "product_material", "product_weight", "product_dimensions",
-            "product_package_info", "product_energy_efficiency",
-            "product_safety_certifications", "product_usage_instructions",
-            "product_features",
-            
-            # 评价信息
-            "rating", "content", "sentiment", "experience",
-            "pros", "cons", "sentiment_score", "quality_score",
-            "generation_time"
-        ]
-        
-    def _validate_review_data(self, review_dict: Dict) -> bool:
-        """
-        验证评价数据
-        
-        Args:
-            review_dict: 评价数据字典
-            
-        Returns:
-            验证是否通过
-        """
-        try:
-            # 验证必要字段
-            required_fields = ["product_name", "product_category", "rating", "content"]
-            if not all(field in review_dict and review_dict[field] for field in required_fields):
-                logger.error(f"缺少必要字段: {required_fields}")
-                return False
-                
-            # 验证数值字段
-            numeric_fields = ["rating", "sentiment_score", "quality_score"]
-            for field in numeric_fields:
-                if field in review_dict and review_dict[field]:
-                    try:
-                        value = float(review_dict[field])
-                        if field == "rating" and not (1 <= value <= 5):
-                            logger.error(f"评分超出范围: {value}")
-                            return False
-                        if field in ["sentiment_score", "quality_score"] and not (0 <= value <= 1):
-                            logger.error(f"分数超出范围: {value}")
-                            return False
-                    except ValueError:
-                        logger.error(f"无效的数值: {review_dict[field]}")
-                        return False
-                        
-            return True
-            
-        except Exception as e:
-            logger.error(f"数据验证失败: {str(e)}")
-            return False
-            
-    def _check_header_consistency(self, filename: str) -> bool:
-        """
-        检查CSV文件头一致性
-        
-        Args:
-            filename: CSV文件路径
-            
-        Returns:
-            是否一致
-        """
-        try:
-            if not filename.exists():
-                return True
-                
-            with open(filename, 'r', encoding='utf-8') as f:
-                reader = pd.read_csv(f)
-                header = reader.columns.tolist()
-                if not header:
-                    return True
-                    
-                return set(header) == set(self.schema["fieldnames"])
-                
-        except Exception as e:
-            logger.error(f"检查文件头一致性失败: {str(e)}")
-            return False
-            
-    def _backup_file(self, filename: str):
-        """
-        备份文件
-        
-        Args:
-            filename: 要备份的文件路径
-        """
-        try:
-            if not filename.exists():
-                return
-                
-            backup_dir = self.base_path / "backups"
-            backup_dir.mkdir(exist_ok=True)
-            
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            backup_filename = backup_dir / f"{filename.stem}_{timestamp}.csv"
-            
-            shutil.copy2(filename, backup_filename)
-            logger.info(f"文件已备份: {backup_filename}")
-            
-        except Exception as e:
-            logger.error(f"文件备份失败: {str(e)}")
-            
-    def _review_to_dict(self, review: GeneratedReview) -> dict:
-        """将评价对象转换为字典"""
-        # 用户背景信息
-        user_dict = {
-            "user_gender": review.user_background.gender,
-            "user_age": review.user_background.age,
-            "user_occupation": review.user_background.occupation,
-            "user_income_level": review.user_background.income_level,
-            "user_experience": review.user_background.experience,
-            "user_tech_familiarity": review.user_background.tech_familiarity,
-            "user_purchase_purpose": review.user_background.purchase_purpose,
-            "user_region": review.user_background.region,
-            "user_education_level": review.user_background.education_level,
-            "user_usage_frequency": review.user_background.usage_frequency,
-            "user_brand_loyalty": review.user_background.brand_loyalty
-        }
-        
-        # 产品信息
-        product_dict = {
-            "product_name": review.product_info.name,
-            "product_category": review.product_info.category,
-            "product_price_range": review.product_info.price_range,
-            "product_brand": review.product_info.brand,
-            "product_model_number": review.product_info.model_number,
-            "product_specifications": str(review.product_info.specifications) if review.product_info.specifications else None,
-            "product_warranty_period": review.product_info.warranty_period,
-            "product_expiration_date": review.product_info.expiration_date,
-            "product_material": review.product_info.material,
-            "product_weight": review.product_info.weight,
-            "product_dimensions": review.product_info.dimensions,
-            "product_package_info": review.product_info.package_info,
-            "product_energy_efficiency": review.product_info.energy_efficiency,
-            "product_safety_certifications": str(review.product_info.safety_certifications) if review.product_info.safety_certifications else None,
-            "product_usage_instructions": review.product_info.usage_instructions,
-            "product_features": str(review.product_info.features) if review.product_info.features else None
-        }
-        
-        # 评价信息
-        review_dict = {
-            "rating": review.rating,
-            "content": review.content,
-            "sentiment": review.sentiment,
-            "experience": review.experience,
-            "pros": str(review.pros),
-            "cons": str(review.cons),
-            "sentiment_score": review.sentiment_score,
-            "quality_score": review.quality_score,
-            "generation_time": datetime.now().isoformat()
-        }
-        
-        return {**user_dict, **product_dict, **review_dict}
-        
-    def _get_lock_file(self, file_path):
-        """获取锁文件路径"""
-        return str(file_path) + ".lock"
-        
-    def _acquire_lock(self, file_path):
-        """获取文件锁"""
-        lock_file = self._get_lock_file(file_path)
-        try:
-            if platform.system() == 'Windows':
-                import msvcrt
-                file_handle = open(lock_file, 'w')
-                msvcrt.locking(file_handle.fileno(), msvcrt.LK_NBLCK, 1)
-                return file_handle
-            else:
-                import fcntl
-                file_handle = open(lock_file, 'w')
-                fcntl.flock(file_handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
-                return file_handle
-        except (IOError, OSError):
-            if 'file_handle' in locals():
-                file_handle.close()
-            return None
-            
-    def _release_lock(self, file_handle):
-        """释放文件锁"""
-        if file_handle:
-            if platform.system() == 'Windows':
-                import msvcrt
-                msvcrt.locking(file_handle.fileno(), msvcrt.LK_UNLCK, 1)
-            else:
-                import fcntl
-                fcntl.flock(file_handle.fileno(), fcntl.LOCK_UN)
-            file_handle.close()
-            try:
-                os.remove(self._get_lock_file(file_handle.name))
-            except:
-                pass
-
-    def save_reviews(self, reviews: List[GeneratedReview], category: str):
-        """
-        保存评价到CSV文件
-        
-        Args:
-            reviews: 评价列表
-            category: 产品类别
-            
-        Raises:
-            ValueError: 当数据验证失败或文件头不一致时
-        """
-        filename = self._get_filename(category)
-        file_exists = filename.exists()
-        
-        # 检查文件头一致性
-        if file_exists and not self._check_header_consistency(filename):
-            logger.error(f"文件头不一致: {filename}")
-            self._backup_file(filename)
-            raise ValueError("文件头不一致，已创建备份")
-            
-        try:
-            # 获取文件锁
-            lock_handle = self._acquire_lock(filename)
-            if not lock_handle:
-                logger.warning(f"无法获取文件锁: {filename}")
-                return
-                
-            try:
-                # 转换评价为DataFrame
-                df = pd.DataFrame([self._review_to_dict(review) for review in reviews])
-                
-                # 保存到CSV
-                df.to_csv(filename, index=False, encoding='utf-8')
-                logger.info(f"评价已保存到: {filename}")
-                
-            finally:
-                # 释放文件锁
-                self._release_lock(lock_handle)
-                
-        except Exception as e:
-            logger.error(f"保存评价失败: {str(e)}")
-            raise
-            
-    def get_review_stats(self, category: str) -> dict:
-        """
-        获取评价统计信息
-        
-        Args:
-            category: 产品类别
-            
-        Returns:
-            统计信息字典
-        """
-        try:
-            filename = self._get_filename(category)
-            if not filename.exists():
-                return {
-                    "total_reviews": 0,
-                    "average_rating": 0,
-                    "rating_distribution": {},
-                    "sentiment_distribution": {}
-                }
-                
-            # 读取所有CSV文件
-            all_reviews = []
-            for file in self.base_path.glob(f"{category}_reviews_*.csv"):
-                df = pd.read_csv(file)
-                all_reviews.append(df)
-            
-            if not all_reviews:
-                return {
-                    "total_reviews": 0,
-                    "average_rating": 0,
-                    "rating_distribution": {},
-                    "sentiment_distribution": {}
-                }
-            
-            # 合并所有评价
-            combined_df = pd.concat(all_reviews, ignore_index=True)
-            
-            # 计算统计信息
-            stats = {
-                "total_reviews": len(combined_df),
-                "average_rating": combined_df["rating"].mean(),
-                "rating_distribution": combined_df["rating"].value_counts().to_dict(),
-                "sentiment_distribution": combined_df["sentiment"].value_counts().to_dict()
-            }
-            
-            return stats
-            
-        except Exception as e:
-            logger.error(f"获取评价统计信息失败: {str(e)}")
-            return {
-                "total_reviews": 0,
-                "average_rating": 0,
-                "rating_distribution": {},
-                "sentiment_distribution": {}
-            } 
\ No newline at end of file
+import os
+import io
+import csv
+import logging
+import json
+from datetime import datetime
+from typing import Any, Callable, List, Dict, Optional, Tuple
+from ..models.data_model import GeneratedReview
+from ..config import settings
+from pathlib import Path
+import platform
+
+logger = logging.getLogger(__name__)
+
+def _str_or_none(value: Any) -> Optional[str]:
+    return str(value) if value else None
+
+# CSV字段及其取值：字段名与写入内容的唯一来源，数据模式版本由此登记，增删字段只需修改这里
+REVIEW_COLUMNS: List[Tuple[str, Callable[[GeneratedReview], Any]]] = [
+    # 用户背景信息
+    ("user_gender", lambda review: review.user_background.gender),
+    ("user_age", lambda review: review.user_background.age),
+    ("user_occupation", lambda review: review.user_background.occupation),
+    ("user_income_level", lambda review: review.user_background.income_level),
+    ("user_experience", lambda review: review.user_background.experience),
+    ("user_tech_familiarity", lambda review: review.user_background.tech_familiarity),
+    ("user_purchase_purpose", lambda review: review.user_background.purchase_purpose),
+    ("user_region", lambda review: review.user_background.region),
+    ("user_education_level", lambda review: review.user_background.education_level),
+    ("user_usage_frequency", lambda review: review.user_background.usage_frequency),
+    ("user_brand_loyalty", lambda review: review.user_background.brand_loyalty),
+    
+    # 产品信息
+    ("product_name", lambda review: review.product_info.name),
+    ("product_category", lambda review: review.product_info.category),
+    ("product_price_range", lambda review: review.product_info.price_range),
+    ("product_brand", lambda review: review.product_info.brand),
+    ("product_model_number", lambda review: review.product_info.model_number),
+    ("product_specifications", lambda review: _str_or_none(review.product_info.specifications)),
+    ("product_warranty_period", lambda review: review.product_info.warranty_period),
+    ("product_expiration_date", lambda review: review.product_info.expiration_date),
+    ("product_material", lambda review: review.product_info.material),
+    ("product_weight", lambda review: review.product_info.weight),
+    ("product_dimensions", lambda review: review.product_info.dimensions),
+    ("product_package_info", lambda review: review.product_info.package_info),
+    ("product_energy_efficiency", lambda review: review.product_info.energy_efficiency),
+    ("product_safety_certifications", lambda review: _str_or_none(review.product_info.safety_certifications)),
+    ("product_usage_instructions", lambda review: review.product_info.usage_instructions),
+    ("product_features", lambda review: _str_or_none(review.product_info.features)),
+    
+    # 评价信息
+    ("rating", lambda review: review.rating),
+    ("content", lambda review: review.content),
+    ("sentiment", lambda review: review.sentiment),
+    ("experience", lambda review: review.experience),
+    ("pros", lambda review: str(review.pros)),
+    ("cons", lambda review: str(review.cons)),
+    ("sentiment_score", lambda review: review.sentiment_score),
+    ("quality_score", lambda review: review.quality_score),
+    ("generation_time", lambda review: datetime.now().isoformat()),
+    
+    # 评价标识与生成信息
+    ("id", lambda review: review.id),
+    ("timeliness_analysis", lambda review: json.dumps(review.timeliness_analysis, ensure_ascii=False) if review.timeliness_analysis else None),
+    ("generation_tier", lambda review: review.generation_tier)
+]
+
+class ReviewSaver:
+    """
+    评价保存工具类
+
+    schema.json 是字段名的版本登记表，字段变化时自动登记新版本，不改写已有文件。
+    每个版本的评价写入独立的分区目录 v{版本号}/{category}_reviews_{日期}.csv，
+    同一文件的表头必然一致，保存时只需追加写入，不再读取整个文件校验表头；
+    旧格式（数据目录下直接存放的CSV）视为版本1的分区。
+    读取时合并所有版本的分区，缺少的字段补空值。
+    统计信息按分区增量计数（见 _partition_stats），不重新读取全部评价。
+    """
+    
+    def __init__(self):
+        self.base_path = Path(settings.REVIEWS_SAVE_PATH)
+        self.base_path.mkdir(parents=True, exist_ok=True)
+        self._load_schema()
+        
+    def _load_schema(self):
+        """加载数据模式，字段与已登记的版本都不同时登记新版本"""
+        schema_file = self.base_path / "schema.json"
+        fieldnames = self._get_fieldnames()
+        # 多个工作进程同时启动时串行登记，避免登记出相同版本号的不同字段
+        lock_handle = self._acquire_lock(schema_file)
+        try:
+            if schema_file.exists():
+                with open(schema_file, 'r', encoding='utf-8') as f:
+                    self.schema = self._upgrade_schema(json.load(f))
+            else:
+                self.schema = {"versions": []}
+                
+            entry = next(
+                (entry for entry in self.schema["versions"] if entry["fieldnames"] == fieldnames),
+                None
+            )
+            if entry is None:
+                self._register_version(fieldnames)
+                self._save_schema()
+                entry = self.schema["versions"][-1]
+                logger.info(f"评价数据模式已登记新版本: v{entry['version']}")
+        finally:
+            self._release_lock(lock_handle)
+        # 写入使用登记表中该版本的字段，保证分区表头与登记的版本一致
+        self.schema_version = entry["version"]
+        self.fieldnames = list(entry["fieldnames"])
+        
+    def _upgrade_schema(self, schema: Dict) -> Dict:
+        """
+        将旧格式的 schema.json（单一 fieldnames）转换为版本登记表
+        
+        Args:
+            schema: schema.json 的内容
+            
+        Returns:
+            版本登记表
+        """
+        if "versions" in schema:
+            return schema
+        return {
+            "versions": [{
+                "version": 1,
+                "fieldnames": schema["fieldnames"],
+                "added": [],
+                "removed": [],
+                "created_at": schema.get("last_updated")
+            }]
+        }
+        
+    def _register_version(self, fieldnames: List[str]) -> int:
+        """登记新版本，记录相对上一版本增加和删除的字段"""
+        versions = self.schema["versions"]
+        previous = versions[-1]["fieldnames"] if versions else []
+        version = versions[-1]["version"] + 1 if versions else 1
+        versions.append({
+            "version": version,
+            "fieldnames": fieldnames,
+            "added": [field for field in fieldnames if field not in previous] if versions else [],
+            "removed": [field for field in previous if field not in fieldnames],
+            "created_at": datetime.now().isoformat()
+        })
+        return version
+            
+    def _save_schema(self):
+        """保存数据模式（先写临时文件再替换，读取方不会看到写了一半的文件）"""
+        schema_file = self.base_path / "schema.json"
+        self.schema["current_version"] = self.schema["versions"][-1]["version"]
+        self.schema["last_updated"] = datetime.now().isoformat()
+        tmp_file = schema_file.with_suffix(".json.tmp")
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(self.schema, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_file, schema_file)
+            
+    def _get_filename(self, category: str) -> Path:
+        """获取保存文件名（当前版本的分区）"""
+        date_str = datetime.now().strftime("%Y%m%d")
+        partition = self.base_path / f"v{self.schema_version}"
+        partition.mkdir(exist_ok=True)
+        return partition / f"{category}_reviews_{date_str}.csv"
+        
+    def _get_partitions(self, category: str) -> List[Tuple[int, Path]]:
+        """
+        获取指定类别所有版本的分区文件
+        
+        Returns:
+            (版本号, 文件路径) 列表，按版本和日期排序
+        """
+        # 旧格式的文件直接存放在数据目录下，对应版本1
+        partitions = [(1, file) for file in self.base_path.glob(f"{category}_reviews_*.csv")]
+        for directory in self.base_path.glob("v*"):
+            if directory.is_dir() and directory.name[1:].isdigit():
+                version = int(directory.name[1:])
+                partitions.extend((version, file) for file in directory.glob(f"{category}_reviews_*.csv"))
+        return sorted(partitions, key=lambda partition: (partition[0], partition[1].name))
+        
+    def _get_fieldnames(self) -> List[str]:
+        """获取CSV文件的字段名（由 REVIEW_COLUMNS 得出，与 _review_to_dict 写入的字段一致）"""
+        return [column for column, _ in REVIEW_COLUMNS]
+        
+    def _validate_review_data(self, review_dict: Dict) -> bool:
+        """
+        验证评价数据
+        
+        Args:
+            review_dict: 评价数据字典
+            
+        Returns:
+            验证是否通过
+        """
+        try:
+            # 验证必要字段
+            required_fields = ["product_name", "product_category", "rating", "content"]
+            if not all(field in review_dict and review_dict[field] for field in required_fields):
+                logger.error(f"缺少必要字段: {required_fields}")
+                return False
+                
+            # 验证数值字段
+            numeric_fields = ["rating", "sentiment_score", "quality_score"]
+            for field in numeric_fields:
+                if field in review_dict and review_dict[field]:
+                    try:
+                        value = float(review_dict[field])
+                        if field == "rating" and not (1 <= value <= 5):
+                            logger.error(f"评分超出范围: {value}")
+                            return False
+                        if field in ["sentiment_score", "quality_score"] and not (0 <= value <= 1):
+                            logger.error(f"分数超出范围: {value}")
+                            return False
+                    except ValueError:
+                        logger.error(f"无效的数值: {review_dict[field]}")
+                        return False
+                        
+            return True
+            
+        except Exception as e:
+            logger.error(f"数据验证失败: {str(e)}")
+            return False
+            
+    def _review_to_dict(self, review: GeneratedReview) -> dict:
+        """将评价对象转换为字典（按当前版本的字段顺序）"""
+        return {column: extract(review) for column, extract in REVIEW_COLUMNS}
+        
+    def _get_lock_file(self, file_path):
+        """获取锁文件路径"""
+        return str(file_path) + ".lock"
+        
+    def _acquire_lock(self, file_path):
+        """获取文件锁（阻塞等待；追加写入很快，等待比放弃保存更合适）"""
+        lock_file = self._get_lock_file(file_path)
+        try:
+            if platform.system() == 'Windows':
+                import msvcrt
+                file_handle = open(lock_file, 'w')
+                msvcrt.locking(file_handle.fileno(), msvcrt.LK_LOCK, 1)
+                return file_handle
+            else:
+                import fcntl
+                file_handle = open(lock_file, 'w')
+                fcntl.flock(file_handle.fileno(), fcntl.LOCK_EX)
+                return file_handle
+        except (IOError, OSError):
+            if 'file_handle' in locals():
+                file_handle.close()
+            return None
+            
+    def _release_lock(self, file_handle):
+        """释放文件锁"""
+        if file_handle:
+            if platform.system() == 'Windows':
+                import msvcrt
+                msvcrt.locking(file_handle.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(file_handle.fileno(), fcntl.LOCK_UN)
+            # 不删除锁文件：其他进程可能正在等待同一个锁文件，删除后新进程会锁住另一个文件
+            file_handle.close()
+
+    def save_reviews(self, reviews: List[GeneratedReview], category: str):
+        """
+        保存评价到CSV文件（追加到当前版本分区的当日文件）
+        
+        Args:
+            reviews: 评价列表
+            category: 产品类别
+        """
+        if not reviews:
+            return
+        filename = self._get_filename(category)
+        rows = [self._review_to_dict(review) for review in reviews]
+            
+        try:
+            # 获取文件锁
+            lock_handle = self._acquire_lock(filename)
+            if not lock_handle:
+                logger.warning(f"无法获取文件锁: {filename}")
+                return
+                
+            try:
+                # 分区内的文件表头都是当前版本的字段，新文件写入表头后直接追加
+                with open(filename, 'a', newline='', encoding='utf-8') as f:
+                    writer = csv.DictWriter(f, fieldnames=self.fieldnames)
+                    if f.tell() == 0:
+                        writer.writeheader()
+                    writer.writerows(rows)
+                logger.info(f"{len(rows)}条评价已保存到: {filename}")
+                
+            finally:
+                # 释放文件锁
+                self._release_lock(lock_handle)
+                
+        except Exception as e:
+            logger.error(f"保存评价失败: {str(e)}")
+            raise
+            
+    def load_reviews(self, category: str, columns: Optional[List[str]] = None) -> Any:
+        """
+        读取指定类别所有版本分区的评价
+        
+        Args:
+            category: 产品类别
+            columns: 只读取的字段，默认读取全部字段
+            
+        Returns:
+            合并后的 DataFrame：字段为当前版本的字段加上旧版本中已删除的字段，
+            分区中缺少的字段为空值；schema_version 列为评价所在分区的版本
+        """
+        import pandas as pd  # 延迟导入，加快服务启动
+        union = list(self.fieldnames)
+        for entry in self.schema["versions"]:
+            union.extend(field for field in entry["fieldnames"] if field not in union)
+        if columns is not None:
+            union = [field for field in union if field in columns]
+            
+        frames = []
+        for version, file in self._get_partitions(category):
+            # 只读取需要的字段，旧版本文件缺少的字段在合并时补空值
+            df = pd.read_csv(file, usecols=lambda column: column in union)
+            df["schema_version"] = version
+            frames.append(df)
+        if not frames:
+            return pd.DataFrame(columns=union + ["schema_version"])
+        return pd.concat(frames, ignore_index=True).reindex(columns=union + ["schema_version"])
+            
+    def _partition_stats(self, file: Path) -> Dict[str, Any]:
+        """
+        获取分区文件的行数、评分和情感计数
+        
+        计数保存在分区旁的 .stats.json 中，并记录已统计到的文件偏移。分区只追加写入，
+        之后只需解析偏移之后新增的行；文件变小（被替换）时重新统计
+        
+        Args:
+            file: 分区文件
+            
+        Returns:
+            计数字典（评分以字符串为键）
+        """
+        stats_file = file.with_name(file.name + ".stats.json")
+        empty = {"offset": 0, "rows": 0, "rating_sum": 0.0, "rating_count": 0, "ratings": {}, "sentiments": {}}
+        stats = empty
+        if stats_file.exists():
+            try:
+                with open(stats_file, 'r', encoding='utf-8') as f:
+                    stats = json.load(f)
+            except (OSError, ValueError):
+                stats = empty
+        if file.stat().st_size < stats["offset"]:
+            stats = empty
+        if file.stat().st_size == stats["offset"]:
+            return stats
+        
+        # 在写入锁内读取新增部分，保证只读到完整的行
+        lock_handle = self._acquire_lock(file)
+        try:
+            with open(file, 'rb') as f:
+                header = f.readline()
+                f.seek(max(stats["offset"], len(header)))
+                data = f.read()
+                offset = f.tell()
+        finally:
+            self._release_lock(lock_handle)
+        
+        fieldnames = next(csv.reader([header.decode('utf-8')]))
+        for row in csv.DictReader(io.StringIO(data.decode('utf-8'), newline=''), fieldnames=fieldnames):
+            stats["rows"] += 1
+            if row.get("rating"):
+                rating = float(row["rating"])
+                stats["rating_sum"] += rating
+                stats["rating_count"] += 1
+                stats["ratings"][str(rating)] = stats["ratings"].get(str(rating), 0) + 1
+            if row.get("sentiment"):
+                stats["sentiments"][row["sentiment"]] = stats["sentiments"].get(row["sentiment"], 0) + 1
+        stats["offset"] = offset
+        
+        # 先写临时文件再替换，多个工作进程同时更新时写入的内容相同
+        tmp_file = stats_file.with_name(f"{stats_file.name}.{os.getpid()}.tmp")
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(stats, f, ensure_ascii=False)
+        os.replace(tmp_file, stats_file)
+        return stats
+            
+    def get_review_stats(self, category: str) -> dict:
+        """
+        获取评价统计信息（合并各分区的增量计数）
+        
+        Args:
+            category: 产品类别
+            
+        Returns:
+            统计信息字典
+        """
+        empty_stats = {
+            "total_reviews": 0,
+            "average_rating": 0,
+            "rating_distribution": {},
+            "sentiment_distribution": {},
+            "schema_versions": {}
+        }
+        try:
+            total, rating_sum, rating_count = 0, 0.0, 0
+            ratings, sentiments, versions = {}, {}, {}
+            for version, file in self._get_partitions(category):
+                partition = self._partition_stats(file)
+                if not partition["rows"]:
+                    continue
+                total += partition["rows"]
+                rating_sum += partition["rating_sum"]
+                rating_count += partition["rating_count"]
+                for rating, count in partition["ratings"].items():
+                    ratings[float(rating)] = ratings.get(float(rating), 0) + count
+                for sentiment, count in partition["sentiments"].items():
+                    sentiments[sentiment] = sentiments.get(sentiment, 0) + count
+                versions[f"v{version}"] = versions.get(f"v{version}", 0) + partition["rows"]
+            if not total:
+                return empty_stats
+            
+            # 计算统计信息
+            stats = {
+                "total_reviews": total,
+                "average_rating": rating_sum / rating_count if rating_count else None,
+                "rating_distribution": dict(sorted(ratings.items(), key=lambda item: -item[1])),
+                "sentiment_distribution": dict(sorted(sentiments.items(), key=lambda item: -item[1])),
+                "schema_versions": dict(sorted(versions.items(), key=lambda item: int(item[0][1:])))
+            }
+            
+            return stats
+            
+        except Exception as e:
+            logger.error(f"获取评价统计信息失败: {str(e)}")
+            return empty_stats
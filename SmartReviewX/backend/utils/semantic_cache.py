@@ -0,0 +1,222 @@
+from typing import Dict, Any, List, Set, Tuple
+from collections import OrderedDict, defaultdict
+from itertools import count
+from ..config import settings
+import hashlib
+import json
+import logging
+import random
+import threading
+import zlib
+
+logger = logging.getLogger(__name__)
+
+class PersonaVectorizer:
+    """
+    用户背景的哈希向量化（本地、纯CPU，无需模型）
+
+    每个字段的取值按字符 1-gram 和 2-gram 哈希到固定维度（带符号，减小冲突的影响），
+    字段向量归一化后按字段权重相加。取值完全不同的字段对余弦相似度的影响约为
+    权重² / 权重平方和，地区、使用频率等次要字段权重较低，只有这些字段不同的用户背景仍然相似。
+    """
+
+    DIM = 512
+    NGRAMS = (1, 2)
+    FIELD_WEIGHTS = {
+        "occupation": 2.0,
+        "gender": 1.5,
+        "age": 1.5,
+        "purchase_purpose": 1.5,
+        "region": 0.5,
+        "usage_frequency": 0.5
+    }
+    DEFAULT_WEIGHT = 1.0
+
+    def _field_text(self, field: str, value: Any) -> str:
+        # 年龄按5岁分段，相差一两岁的用户背景视为相同
+        if field == "age" and isinstance(value, int):
+            low = value // 5 * 5
+            return f"{low}-{low + 4}"
+        return "".join(str(value).split())
+
+    def vectorize(self, user_background) -> Any:
+        """
+        Returns:
+            L2归一化的 float32 向量
+        """
+        import numpy as np
+        vector = np.zeros(self.DIM, dtype=np.float32)
+        for field, value in user_background.model_dump(exclude_none=True).items():
+            text = self._field_text(field, value)
+            grams = [f"{field}:{text[i:i + n]}" for n in self.NGRAMS for i in range(len(text) - n + 1)]
+            if not grams:
+                continue
+            hashes = np.array([zlib.crc32(gram.encode("utf-8")) for gram in grams], dtype=np.uint64)
+            signs = np.where((hashes >> np.uint64(31)) & np.uint64(1), 1.0, -1.0)
+            field_vector = np.bincount((hashes % self.DIM).astype(np.int64), weights=signs, minlength=self.DIM)
+            norm = np.linalg.norm(field_vector)
+            if norm:
+                vector += self.FIELD_WEIGHTS.get(field, self.DEFAULT_WEIGHT) * field_vector / norm
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+def product_scope(product_info) -> str:
+    """产品信息的摘要：只在完全相同的产品之间复用评价"""
+    canonical = json.dumps(product_info.model_dump(exclude_none=True), ensure_ascii=False, sort_keys=True)
+    return hashlib.sha1(canonical.encode("utf-8")).hexdigest()
+
+class SemanticCache:
+    """
+    评价生成的语义缓存：同一产品、用户背景相似度不低于 SEMANTIC_CACHE_THRESHOLD 的请求复用已生成的评价
+
+    近邻检索使用随机超平面LSH：TABLES 个哈希表，每个表取 BITS 个超平面的符号作为桶号，
+    候选为任一表中同桶的条目，再精确计算余弦相似度。相似度0.95时单表命中概率约0.35，8个表的召回率约0.97。
+    """
+
+    TABLES = 8
+    BITS = 10
+
+    def __init__(self, name: str):
+        import numpy as np
+        self.name = name
+        self.vectorizer = PersonaVectorizer()
+        # 固定种子：同一进程内的各缓存及重启后桶号一致
+        planes = np.random.default_rng(0).standard_normal((self.TABLES * self.BITS, PersonaVectorizer.DIM))
+        self._planes = planes.astype(np.float32)
+        self._powers = (1 << np.arange(self.BITS)).astype(np.int64)
+        self._entries: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self._buckets: List[Dict[Tuple[str, int], Set[int]]] = [defaultdict(set) for _ in range(self.TABLES)]
+        self._ids = count()
+        self._lock = threading.Lock()
+        self.stats = {"lookups": 0, "hits": 0, "misses": 0, "bypassed": 0, "stored": 0, "evicted": 0}
+
+    def key(self, user_background, product_info) -> Tuple[str, Any]:
+        """计算缓存键：(产品摘要, 用户背景向量)"""
+        return product_scope(product_info), self.vectorizer.vectorize(user_background)
+
+    def _codes(self, vector) -> List[int]:
+        bits = (self._planes @ vector > 0).reshape(self.TABLES, self.BITS)
+        return (bits @ self._powers).tolist()
+
+    def _remove(self, entry_id: int):
+        entry = self._entries.pop(entry_id)
+        for table, code in zip(self._buckets, entry["codes"]):
+            bucket = table[(entry["scope"], code)]
+            bucket.discard(entry_id)
+            if not bucket:
+                del table[(entry["scope"], code)]
+
+    def get(self, key: Tuple[str, Any], user_background, product_info, exclude: Set[int]):
+        """
+        查找相似请求生成的评价
+
+        Args:
+            key: 缓存键
+            user_background, product_info: 本次请求的用户背景和产品信息，替换到复用的评价中
+            exclude: 本次请求已使用的缓存条目（同一请求生成多条评价时不重复复用），复用的条目会加入其中
+
+        Returns:
+            复用的评价（优缺点顺序随机打乱），未命中时返回None
+        """
+        scope, vector = key
+        codes = self._codes(vector)
+        with self._lock:
+            self.stats["lookups"] += 1
+            candidates = set()
+            for table, code in zip(self._buckets, codes):
+                candidates |= table.get((scope, code), set())
+            candidates -= exclude
+            best_id, best_similarity = None, settings.SEMANTIC_CACHE_THRESHOLD
+            for entry_id in candidates:
+                similarity = float(self._entries[entry_id]["vector"] @ vector)
+                if similarity >= best_similarity:
+                    best_id, best_similarity = entry_id, similarity
+            if best_id is None:
+                self.stats["misses"] += 1
+                return None
+            # 按配置的比例复用，其余请求照常生成，扩充缓存中的候选评价
+            if random.random() >= settings.SEMANTIC_CACHE_HIT_RATIO:
+                self.stats["bypassed"] += 1
+                return None
+
+            entry = self._entries[best_id]
+            self._entries.move_to_end(best_id)
+            entry["served"] += 1
+            if entry["served"] >= settings.SEMANTIC_CACHE_MAX_REUSE:
+                self._remove(best_id)
+            self.stats["hits"] += 1
+        exclude.add(best_id)
+
+        review = entry["review"]
+        pros, cons = list(review.pros or []), list(review.cons or [])
+        random.shuffle(pros)
+        random.shuffle(cons)
+        logger.info(f"语义缓存命中（{self.name}，相似度 {best_similarity:.3f}）")
+        return review.model_copy(
+            update={
+                "user_background": user_background,
+                "product_info": product_info,
+                "pros": pros,
+                "cons": cons,
+                "generation_tier": "cache"
+            },
+            deep=True
+        )
+
+    def put(self, key: Tuple[str, Any], review, exclude: Set[int]):
+        """
+        缓存新生成的评价
+
+        Args:
+            key: 缓存键
+            review: 评价
+            exclude: 本次请求已使用的缓存条目，新条目会加入其中
+        """
+        scope, vector = key
+        codes = self._codes(vector)
+        with self._lock:
+            entry_id = next(self._ids)
+            self._entries[entry_id] = {"scope": scope, "vector": vector, "codes": codes, "review": review, "served": 0}
+            for table, code in zip(self._buckets, codes):
+                table[(scope, code)].add(entry_id)
+            self.stats["stored"] += 1
+            while len(self._entries) > settings.SEMANTIC_CACHE_SIZE:
+                self._remove(next(iter(self._entries)))
+                self.stats["evicted"] += 1
+        exclude.add(entry_id)
+
+    def report(self) -> Dict[str, Any]:
+        """缓存条目数和命中统计"""
+        with self._lock:
+            stats = dict(self.stats)
+            entries = len(self._entries)
+        return {
+            "entries": entries,
+            **stats,
+            "hit_rate": round(stats["hits"] / stats["lookups"], 4) if stats["lookups"] else None
+        }
+
+class SemanticCacheRegistry:
+    """按生成器类别管理语义缓存"""
+
+    def __init__(self):
+        self._caches: Dict[str, SemanticCache] = {}
+        self._lock = threading.Lock()
+
+    def get(self, category: str) -> SemanticCache:
+        with self._lock:
+            if category not in self._caches:
+                self._caches[category] = SemanticCache(category)
+            return self._caches[category]
+
+    def report(self) -> Dict[str, Any]:
+        """所有类别的缓存统计"""
+        with self._lock:
+            caches = dict(self._caches)
+        return {
+            "enabled": settings.SEMANTIC_CACHE_ENABLED,
+            "categories": {category: cache.report() for category, cache in caches.items()}
+        }
+
+# 进程内共享的语义缓存（多进程部署时各工作进程独立缓存）
+semantic_caches = SemanticCacheRegistry()
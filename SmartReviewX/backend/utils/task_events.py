@@ -0,0 +1,110 @@
+from typing import Dict, Any, Set
+from collections import defaultdict
+from urllib.parse import urlsplit
+from ..config import settings
+import asyncio
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+def task_event(task_id: str, task: Dict[str, Any]) -> Dict[str, Any]:
+    """由任务记录（不含结果列表）生成进度事件"""
+    event = {
+        "task_id": task_id,
+        "status": task["status"],
+        "total_reviews": task.get("total_reviews"),
+        "processed_reviews": task.get("processed_reviews")
+    }
+    # 离线批处理任务附带服务商批处理进度
+    if "batch_status" in task:
+        event["batch_status"] = task["batch_status"]
+    if task["status"] == "failed":
+        event["error"] = task.get("error", "未知错误")
+    return event
+
+def format_sse(event: Dict[str, Any]) -> str:
+    """格式化为 Server-Sent Events 消息，事件名为 progress/completed/failed"""
+    name = "progress" if event["status"] == "processing" else event["status"]
+    return f"event: {name}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+class TaskEventBroker:
+    """
+    进程内的任务进度发布/订阅
+
+    publish 只能在事件循环线程中调用；多进程部署时订阅者只能收到本进程处理的任务的事件，
+    其余进度由订阅方定期读取任务存储补齐
+    """
+
+    # 每个订阅者最多缓存的事件数，慢订阅者丢弃最旧的进度事件
+    QUEUE_SIZE = 100
+
+    def __init__(self):
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = defaultdict(set)
+
+    def subscribe(self, task_id: str) -> asyncio.Queue:
+        """订阅任务事件"""
+        queue = asyncio.Queue(maxsize=self.QUEUE_SIZE)
+        self._subscribers[task_id].add(queue)
+        return queue
+
+    def unsubscribe(self, task_id: str, queue: asyncio.Queue):
+        """取消订阅"""
+        subscribers = self._subscribers.get(task_id)
+        if subscribers is None:
+            return
+        subscribers.discard(queue)
+        if not subscribers:
+            del self._subscribers[task_id]
+
+    def publish(self, task_id: str, event: Dict[str, Any]):
+        """向任务的所有订阅者发布事件，没有订阅者时什么都不做"""
+        for queue in self._subscribers.get(task_id, ()):
+            if queue.full():
+                # 终态事件总是最后发布，丢弃的只会是过时的进度事件
+                queue.get_nowait()
+            queue.put_nowait(event)
+
+    def report(self) -> Dict[str, int]:
+        """各任务的订阅者数"""
+        return {task_id: len(subscribers) for task_id, subscribers in self._subscribers.items()}
+
+# 进程内共享的任务事件代理
+task_events = TaskEventBroker()
+
+def validate_callback_url(url: str):
+    """
+    检查任务完成回调地址：只允许 TASK_CALLBACK_ALLOWED_HOSTS 中的主机，避免服务端请求伪造
+
+    Raises:
+        ValueError: 地址无效或主机不被允许
+    """
+    allowed_hosts = {host.lower() for host in settings.TASK_CALLBACK_ALLOWED_HOSTS}
+    if not allowed_hosts:
+        raise ValueError("未启用任务回调（TASK_CALLBACK_ALLOWED_HOSTS 为空）")
+    parsed = urlsplit(url)
+    if parsed.scheme not in ("http", "https") or not parsed.hostname:
+        raise ValueError("callback_url 必须是 http 或 https 地址")
+    if parsed.hostname.lower() not in allowed_hosts:
+        raise ValueError(f"回调主机 {parsed.hostname} 不在 TASK_CALLBACK_ALLOWED_HOSTS 中")
+
+async def send_callback(url: str, payload: Dict[str, Any]) -> bool:
+    """
+    向回调地址 POST 任务结束事件，失败时按 1、2、4... 秒间隔重试 TASK_CALLBACK_RETRIES 次
+
+    Returns:
+        是否送达（回调地址返回2xx）
+    """
+    import httpx
+    async with httpx.AsyncClient(timeout=settings.TASK_CALLBACK_TIMEOUT, follow_redirects=False) as client:
+        for attempt in range(1, settings.TASK_CALLBACK_RETRIES + 1):
+            try:
+                response = await client.post(url, json=payload)
+                response.raise_for_status()
+                return True
+            except httpx.HTTPError as e:
+                logger.warning(f"任务回调失败（第 {attempt} 次）: {url}: {str(e)}")
+                if attempt < settings.TASK_CALLBACK_RETRIES:
+                    await asyncio.sleep(2 ** (attempt - 1))
+    logger.error(f"任务 {payload.get('task_id')} 的回调未送达: {url}")
+    return False
@@ -0,0 +1,225 @@
+from typing import Dict, Any, Optional, List, Iterator
+from pathlib import Path
+from collections import defaultdict
+from itertools import islice
+from datetime import datetime
+from uuid import uuid4
+from ..config import settings
+import asyncio
+import gzip
+import json
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+class TaskArchive:
+    """
+    过期任务的冷存储：按任务ID前两位分片的 gzip NDJSON 文件
+
+    每次归档向分片文件追加一个gzip成员，读取时只需解压任务所在的分片。
+    每个任务写入一行任务记录（不含结果，附带 result_count）和每条检查结果各一行，
+    读取结果时逐行解压并只解析需要的部分，不在内存中构建完整的结果列表
+    """
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def _shard_path(self, task_id: str) -> Path:
+        return self.directory / f"tasks-{task_id[:2].lower()}.ndjson.gz"
+
+    def archive(self, tasks: Dict[str, Dict[str, Any]]) -> int:
+        """
+        归档任务（包含检查结果）
+
+        Args:
+            tasks: 任务ID -> 任务记录
+
+        Returns:
+            归档的任务数
+        """
+        shards = defaultdict(list)
+        archived_at = time.time()
+        for task_id, task in tasks.items():
+            # task_id 作为第一个字段，读取时可以先按行前缀过滤再解析
+            results = task.get("results") or []
+            meta = {key: value for key, value in task.items() if key != "results"}
+            record = {"task_id": task_id, "archived_at": archived_at, **meta, "result_count": len(results)}
+            lines = shards[self._shard_path(task_id)]
+            lines.append(json.dumps(record, ensure_ascii=False))
+            for index, result in enumerate(results):
+                item = {"task_id": task_id, "index": index, "archived_at": archived_at, "result": result}
+                lines.append(json.dumps(item, ensure_ascii=False))
+        for path, lines in shards.items():
+            with gzip.open(path, "at", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+        return len(tasks)
+
+    def _prefix(self, task_id: str, key: str) -> str:
+        """任务记录行（key 为 archived_at）或检查结果行（key 为 index）的前缀"""
+        return json.dumps({"task_id": task_id, key: None}, ensure_ascii=False)[:-5]
+
+    def _lines(self, task_id: str, prefix: str) -> Iterator[str]:
+        path = self._shard_path(task_id)
+        if not path.exists():
+            return
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith(prefix):
+                    yield line
+
+    def _record(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """任务记录行（同一任务被重复归档时取最后一条）"""
+        found = None
+        for found in self._lines(task_id, self._prefix(task_id, "archived_at")):
+            pass
+        if found is None:
+            return None
+        record = json.loads(found)
+        record.pop("task_id")
+        return record
+
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """读取归档的任务（不含结果列表，结果通过 get_results / iter_results 读取），不存在时返回None"""
+        record = self._record(task_id)
+        if record is not None and "results" in record:
+            # 旧格式的任务记录内嵌结果列表
+            record["result_count"] = len(record.pop("results"))
+        return record
+
+    def iter_results(self, task_id: str, start: int = 0) -> Iterator[Dict[str, Any]]:
+        """从下标 start 开始逐条读取归档任务的检查结果"""
+        record = self._record(task_id)
+        if record is None:
+            return
+        if "results" in record:
+            yield from record["results"][start:]
+            return
+        # 只取最后一次归档写入的结果
+        for line in self._lines(task_id, self._prefix(task_id, "index")):
+            item = json.loads(line)
+            if item["archived_at"] == record["archived_at"] and item["index"] >= start:
+                yield item["result"]
+
+    def get_results(self, task_id: str, start: int = 0, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """获取从下标 start 开始的至多 limit 条检查结果（与任务存储的同名方法一致）"""
+        return list(islice(self.iter_results(task_id, start), limit))
+
+    def report(self) -> Dict[str, Any]:
+        """归档文件数与占用空间"""
+        files = list(self.directory.glob("tasks-*.ndjson.gz"))
+        return {
+            "path": str(self.directory),
+            "files": len(files),
+            "bytes": sum(path.stat().st_size for path in files)
+        }
+
+class TaskJanitor:
+    """
+    任务清理：定期将超过保留时间的已结束任务归档到冷存储，并从任务存储（热存储）中删除
+
+    服务重启等原因中断、一直处于处理中的任务先标记为失败，之后同样按保留时间清理
+
+    多进程部署时通过任务存储的共享键值加租约，同一时间只有一个工作进程执行清理
+
+    store 和 archive 可以是惰性单例：构造和启动时不访问，首次清理（在工作线程中执行）时才创建
+    """
+
+    # 每批归档并删除的任务数
+    BATCH_SIZE = 500
+
+    def __init__(self, store, archive: TaskArchive):
+        self.store = store
+        self.archive = archive
+        self.owner = f"{os.getpid()}-{uuid4().hex[:8]}"
+        self.stats = {"runs": 0, "archived": 0, "evicted": 0, "stale_failed": 0, "last_run": None, "last_duration_ms": None}
+        self._task: Optional[asyncio.Task] = None
+
+    def _acquire_lease(self, now: float) -> bool:
+        """获取清理租约，租约在下一次清理前过期"""
+        lease_seconds = settings.TASK_CLEANUP_INTERVAL * 0.9
+
+        def claim(lease):
+            if lease is None or lease["expires_at"] <= now or lease["owner"] == self.owner:
+                return {"owner": self.owner, "expires_at": now + lease_seconds}
+            return lease
+
+        return self.store.update_value("janitor", "lease", claim)["owner"] == self.owner
+
+    def run_once(self, now: Optional[float] = None) -> Dict[str, Any]:
+        """
+        执行一次清理
+
+        Returns:
+            本次归档和删除的任务数，未获得租约时 skipped 为 True
+        """
+        now = time.time() if now is None else now
+        if not self._acquire_lease(now):
+            return {"skipped": True, "archived": 0, "evicted": 0}
+
+        start = time.perf_counter()
+        stale = self.store.stale_tasks(now)
+        for task_id in stale:
+            self.store.update(
+                task_id,
+                status="failed",
+                error=f"任务超过 {settings.TASK_STALE_TIMEOUT} 秒未结束，可能因服务重启而中断",
+                end_time=datetime.fromtimestamp(now).isoformat()
+            )
+        if stale:
+            logger.warning(f"{len(stale)} 个处理中的任务已中断，标记为失败")
+        self.stats["stale_failed"] += len(stale)
+        expired = self.store.expired_tasks(now)
+        archived = evicted = 0
+        for offset in range(0, len(expired), self.BATCH_SIZE):
+            batch: List[str] = expired[offset:offset + self.BATCH_SIZE]
+            tasks = {task_id: self.store.get(task_id) for task_id in batch}
+            tasks = {task_id: task for task_id, task in tasks.items() if task is not None}
+            # 先写入冷存储再删除，中途失败时最多重复归档，不会丢失任务
+            archived += self.archive.archive(tasks)
+            evicted += self.store.evict(list(tasks))
+        if evicted:
+            self.store.compact()
+
+        duration_ms = round((time.perf_counter() - start) * 1000, 1)
+        self.stats["runs"] += 1
+        self.stats["archived"] += archived
+        self.stats["evicted"] += evicted
+        self.stats["last_run"] = now
+        self.stats["last_duration_ms"] = duration_ms
+        if evicted:
+            logger.info(
+                f"任务清理完成：归档 {archived} 个，删除 {evicted} 个，耗时 {duration_ms}ms",
+                extra={"archived": archived, "evicted": evicted}
+            )
+        return {"skipped": False, "archived": archived, "evicted": evicted}
+
+    async def _run_forever(self):
+        while True:
+            try:
+                await asyncio.to_thread(self.run_once)
+            except Exception as e:
+                logger.error(f"任务清理失败: {str(e)}")
+            await asyncio.sleep(settings.TASK_CLEANUP_INTERVAL)
+
+    def start(self):
+        """启动后台清理（启动时立即清理一次），TASK_CLEANUP_INTERVAL 不大于0时不启动"""
+        if settings.TASK_CLEANUP_INTERVAL <= 0 or self._task is not None:
+            return
+        self._task = asyncio.create_task(self._run_forever())
+
+    def stop(self):
+        """停止后台清理"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def report(self) -> Dict[str, Any]:
+        """清理统计、热存储任务数和冷存储占用"""
+        return {
+            **self.stats,
+            "hot_tasks": len(self.store),
+            "archive": self.archive.report()
+        }
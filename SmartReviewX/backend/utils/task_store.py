@@ -0,0 +1,443 @@
+from typing import Dict, Any, Optional, Callable, List, Iterator
+from pathlib import Path
+from datetime import datetime
+from ..config import settings
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+TASK_STORE_BACKENDS = ("json", "sqlite")
+# 已结束、可以按保留时间清理的任务状态
+TASK_FINISHED_STATUSES = ("completed", "failed")
+
+def task_is_stale(task: Dict[str, Any], now: float) -> bool:
+    """处理中的任务从开始起超过 TASK_STALE_TIMEOUT 仍未结束（服务重启后不会再有进程处理它）"""
+    started = task.get("start_time")
+    return (
+        task.get("status") == "processing"
+        and bool(started)
+        and datetime.fromisoformat(started).timestamp() + settings.TASK_STALE_TIMEOUT <= now
+    )
+
+def task_expires_at(task: Dict[str, Any]) -> float:
+    """
+    计算已结束任务的过期时间戳：结束时间加任务的 ttl（未指定时使用配置 TASK_RESULT_TTL）
+
+    缺少结束时间的旧任务使用开始时间，两者都没有时视为已过期
+    """
+    finished = task.get("end_time") or task.get("start_time")
+    if not finished:
+        return 0.0
+    ttl = task.get("ttl") or settings.TASK_RESULT_TTL
+    return datetime.fromisoformat(finished).timestamp() + ttl
+
+class JsonTaskStore:
+    """
+    单进程任务存储：任务状态保存在内存中，每次更新后整体写入JSON文件
+
+    共享键值（分析报告缓存等）只保存在内存中，多进程部署时请使用 SqliteTaskStore
+    """
+
+    shared = False
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.RLock()
+        self._tasks = self._load()
+        self._values: Dict[str, Dict[str, Any]] = {}
+
+    def _load(self) -> Dict[str, Any]:
+        """从文件加载任务结果"""
+        try:
+            if self.path.exists():
+                logger.info(f"从文件加载任务结果: {self.path}")
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                logger.info(f"已加载 {len(data)} 个任务")
+                return data
+            logger.info("存储文件不存在，创建新的存储")
+            return {}
+        except Exception as e:
+            logger.error(f"初始化存储时发生错误: {str(e)}")
+            return {}
+
+    def save(self):
+        """将全部任务结果写入文件"""
+        try:
+            with self._lock:
+                with open(self.path, 'w', encoding='utf-8') as f:
+                    json.dump(self._tasks, f, ensure_ascii=False, indent=2)
+            logger.debug(f"任务结果已保存到文件: {self.path}")
+        except Exception as e:
+            logger.error(f"保存任务结果时发生错误: {str(e)}")
+
+    def __contains__(self, task_id: str) -> bool:
+        return task_id in self._tasks
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    def create(self, task_id: str, record: Dict[str, Any]):
+        """创建任务"""
+        with self._lock:
+            self._tasks[task_id] = dict(record, results=list(record.get("results", [])))
+        self.save()
+
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """获取任务（包含结果列表），不存在时返回None"""
+        with self._lock:
+            task = self._tasks.get(task_id)
+            return dict(task, results=list(task.get("results", []))) if task else None
+
+    def get_meta(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """获取任务（不含结果列表），不存在时返回None"""
+        with self._lock:
+            task = self._tasks.get(task_id)
+            return {key: value for key, value in task.items() if key != "results"} if task else None
+
+    def get_results(self, task_id: str, start: int = 0, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """获取从下标 start 开始的至多 limit 条检查结果"""
+        with self._lock:
+            results = self._tasks.get(task_id, {}).get("results", [])
+            return list(results[start:None if limit is None else start + limit])
+
+    def update(self, task_id: str, persist: bool = True, **fields):
+        """
+        更新任务字段
+
+        Args:
+            task_id: 任务ID
+            persist: 是否立即写入文件（频繁变化的进度信息可以不写）
+            **fields: 要更新的字段
+        """
+        with self._lock:
+            self._tasks[task_id].update(fields)
+        if persist:
+            self.save()
+
+    def add_result(self, task_id: str, index: int, result: Dict[str, Any], **fields):
+        """追加一条检查结果，并更新任务字段（如处理进度）"""
+        with self._lock:
+            task = self._tasks[task_id]
+            results = task.setdefault("results", [])
+            results[index:index + 1] = [result]
+            task.update(fields)
+        self.save()
+
+    def set_results(self, task_id: str, results: List[Dict[str, Any]], **fields):
+        """写入全部检查结果，并更新任务字段"""
+        with self._lock:
+            self._tasks[task_id].update(fields, results=list(results))
+        self.save()
+
+    def expired_tasks(self, now: float) -> List[str]:
+        """获取已结束且超过保留时间的任务ID"""
+        with self._lock:
+            return [
+                task_id for task_id, task in self._tasks.items()
+                if task.get("status") in TASK_FINISHED_STATUSES and task_expires_at(task) <= now
+            ]
+
+    def stale_tasks(self, now: float) -> List[str]:
+        """获取已中断的处理中任务ID（见 task_is_stale）"""
+        with self._lock:
+            return [task_id for task_id, task in self._tasks.items() if task_is_stale(task, now)]
+
+    def processing_tasks(self) -> List[str]:
+        """获取处理中的任务ID"""
+        with self._lock:
+            return [task_id for task_id, task in self._tasks.items() if task.get("status") == "processing"]
+
+    def evict(self, task_ids: List[str]) -> int:
+        """从存储中删除任务，返回删除的任务数"""
+        with self._lock:
+            evicted = sum(1 for task_id in task_ids if self._tasks.pop(task_id, None) is not None)
+        if evicted:
+            self.save()
+        return evicted
+
+    def compact(self):
+        """压缩存储：JSON文件在每次保存时整体重写，删除任务后无需额外处理"""
+
+    def get_value(self, namespace: str, key: str) -> Any:
+        """读取共享键值"""
+        with self._lock:
+            return self._values.get(namespace, {}).get(key)
+
+    def set_value(self, namespace: str, key: str, value: Any):
+        """写入共享键值"""
+        with self._lock:
+            self._values.setdefault(namespace, {})[key] = value
+
+    def update_value(self, namespace: str, key: str, func: Callable[[Any], Any]) -> Any:
+        """原子地读取-修改-写入共享键值，返回新值"""
+        with self._lock:
+            values = self._values.setdefault(namespace, {})
+            values[key] = func(values.get(key))
+            return values[key]
+
+    def prune_values(self, namespace: str, keep: int):
+        """只保留命名空间中最近写入的 keep 个键"""
+        with self._lock:
+            values = self._values.get(namespace, {})
+            for key in list(values)[:max(0, len(values) - keep)]:
+                values.pop(key)
+
+class SqliteTaskStore:
+    """
+    多进程共享的任务存储：SQLite（WAL模式），各工作进程读写同一个数据库文件
+
+    任务元数据与检查结果分表保存，追加一条结果只写入一行，而不是重写整个任务
+    """
+
+    shared = True
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._local = threading.local()
+        self._connect().executescript("""
+            CREATE TABLE IF NOT EXISTS tasks (
+                task_id TEXT PRIMARY KEY,
+                status TEXT,
+                data TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS task_results (
+                task_id TEXT NOT NULL,
+                idx INTEGER NOT NULL,
+                result TEXT NOT NULL,
+                PRIMARY KEY (task_id, idx)
+            );
+            CREATE TABLE IF NOT EXISTS shared_values (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (namespace, key)
+            );
+            CREATE INDEX IF NOT EXISTS idx_shared_values_updated ON shared_values (namespace, updated_at);
+        """)
+        logger.info(f"SQLite任务存储: {self.path}")
+
+    def _connect(self) -> sqlite3.Connection:
+        """获取当前线程的数据库连接"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = _Transaction(conn)
+        return self._local.conn
+
+    def __contains__(self, task_id: str) -> bool:
+        row = self._connect().execute("SELECT 1 FROM tasks WHERE task_id = ?", (task_id,)).fetchone()
+        return row is not None
+
+    def __len__(self) -> int:
+        return self._connect().execute("SELECT COUNT(*) FROM tasks").fetchone()[0]
+
+    def create(self, task_id: str, record: Dict[str, Any]):
+        """创建任务"""
+        data = {key: value for key, value in record.items() if key != "results"}
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO tasks (task_id, status, data, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (task_id, data.get("status"), json.dumps(data, ensure_ascii=False), now, now)
+            )
+            conn.execute("DELETE FROM task_results WHERE task_id = ?", (task_id,))
+            for index, result in enumerate(record.get("results", [])):
+                conn.execute(
+                    "INSERT INTO task_results (task_id, idx, result) VALUES (?, ?, ?)",
+                    (task_id, index, json.dumps(result, ensure_ascii=False))
+                )
+
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """获取任务（包含结果列表），不存在时返回None"""
+        task = self.get_meta(task_id)
+        if task is not None:
+            task["results"] = self.get_results(task_id)
+        return task
+
+    def get_meta(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """获取任务（不含结果列表），不存在时返回None"""
+        row = self._connect().execute("SELECT data FROM tasks WHERE task_id = ?", (task_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_results(self, task_id: str, start: int = 0, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """获取从下标 start 开始的至多 limit 条检查结果（按主键范围读取，不扫描之前的结果）"""
+        rows = self._connect().execute(
+            "SELECT result FROM task_results WHERE task_id = ? AND idx >= ? ORDER BY idx LIMIT ?",
+            (task_id, start, -1 if limit is None else limit)
+        ).fetchall()
+        return [json.loads(result) for (result,) in rows]
+
+    def _update_data(self, conn: sqlite3.Connection, task_id: str, fields: Dict[str, Any]):
+        row = conn.execute("SELECT data FROM tasks WHERE task_id = ?", (task_id,)).fetchone()
+        if row is None:
+            raise KeyError(task_id)
+        data = json.loads(row[0])
+        data.update(fields)
+        conn.execute(
+            "UPDATE tasks SET status = ?, data = ?, updated_at = ? WHERE task_id = ?",
+            (data.get("status"), json.dumps(data, ensure_ascii=False), time.time(), task_id)
+        )
+
+    def update(self, task_id: str, persist: bool = True, **fields):
+        """更新任务字段（SQLite每次更新都会持久化，persist 参数仅为与 JsonTaskStore 保持一致）"""
+        with self._connect() as conn:
+            self._update_data(conn, task_id, fields)
+
+    def add_result(self, task_id: str, index: int, result: Dict[str, Any], **fields):
+        """追加一条检查结果，并更新任务字段（如处理进度）"""
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO task_results (task_id, idx, result) VALUES (?, ?, ?)",
+                (task_id, index, json.dumps(result, ensure_ascii=False))
+            )
+            if fields:
+                self._update_data(conn, task_id, fields)
+
+    def set_results(self, task_id: str, results: List[Dict[str, Any]], **fields):
+        """写入全部检查结果，并更新任务字段"""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM task_results WHERE task_id = ?", (task_id,))
+            conn.executemany(
+                "INSERT INTO task_results (task_id, idx, result) VALUES (?, ?, ?)",
+                [(task_id, index, json.dumps(result, ensure_ascii=False)) for index, result in enumerate(results)]
+            )
+            if fields:
+                self._update_data(conn, task_id, fields)
+
+    def expired_tasks(self, now: float) -> List[str]:
+        """获取已结束且超过保留时间的任务ID（任务元数据不含检查结果，逐行解析的开销很小）"""
+        placeholders = ", ".join("?" for _ in TASK_FINISHED_STATUSES)
+        rows = self._connect().execute(
+            f"SELECT task_id, data FROM tasks WHERE status IN ({placeholders})", TASK_FINISHED_STATUSES
+        ).fetchall()
+        return [task_id for task_id, data in rows if task_expires_at(json.loads(data)) <= now]
+
+    def stale_tasks(self, now: float) -> List[str]:
+        """获取已中断的处理中任务ID（见 task_is_stale）"""
+        rows = self._connect().execute("SELECT task_id, data FROM tasks WHERE status = 'processing'").fetchall()
+        return [task_id for task_id, data in rows if task_is_stale(json.loads(data), now)]
+
+    def processing_tasks(self) -> List[str]:
+        """获取处理中的任务ID"""
+        rows = self._connect().execute("SELECT task_id FROM tasks WHERE status = 'processing'").fetchall()
+        return [task_id for (task_id,) in rows]
+
+    def evict(self, task_ids: List[str]) -> int:
+        """从存储中删除任务及其检查结果，返回删除的任务数"""
+        evicted = 0
+        with self._connect() as conn:
+            for task_id in task_ids:
+                conn.execute("DELETE FROM task_results WHERE task_id = ?", (task_id,))
+                evicted += conn.execute("DELETE FROM tasks WHERE task_id = ?", (task_id,)).rowcount
+        return evicted
+
+    def compact(self):
+        """空闲页超过一半时执行 VACUUM 缩小数据库文件，并截断WAL文件"""
+        conn = self._connect()
+        page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+        freelist_count = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        if page_count and freelist_count * 2 > page_count:
+            logger.info(f"压缩SQLite任务存储：{freelist_count}/{page_count} 页空闲")
+            conn.execute("VACUUM")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def get_value(self, namespace: str, key: str) -> Any:
+        """读取共享键值"""
+        row = self._connect().execute(
+            "SELECT value FROM shared_values WHERE namespace = ? AND key = ?", (namespace, key)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set_value(self, namespace: str, key: str, value: Any):
+        """写入共享键值"""
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO shared_values (namespace, key, value, updated_at) VALUES (?, ?, ?, ?)",
+                (namespace, key, json.dumps(value, ensure_ascii=False), time.time())
+            )
+
+    def update_value(self, namespace: str, key: str, func: Callable[[Any], Any]) -> Any:
+        """原子地读取-修改-写入共享键值（跨进程），返回新值"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT value FROM shared_values WHERE namespace = ? AND key = ?", (namespace, key)
+            ).fetchone()
+            value = func(json.loads(row[0]) if row else None)
+            conn.execute(
+                "INSERT OR REPLACE INTO shared_values (namespace, key, value, updated_at) VALUES (?, ?, ?, ?)",
+                (namespace, key, json.dumps(value, ensure_ascii=False), time.time())
+            )
+            return value
+
+    def prune_values(self, namespace: str, keep: int):
+        """只保留命名空间中最近写入的 keep 个键"""
+        with self._connect() as conn:
+            conn.execute(
+                """DELETE FROM shared_values WHERE namespace = ? AND key NOT IN (
+                    SELECT key FROM shared_values WHERE namespace = ? ORDER BY updated_at DESC LIMIT ?
+                )""",
+                (namespace, namespace, keep)
+            )
+
+class _Transaction:
+    """SQLite连接包装：with 语句中以 BEGIN IMMEDIATE 开启写事务，保证跨进程的读取-修改-写入是原子的"""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+    def execute(self, *args):
+        return self.conn.execute(*args)
+
+    def executemany(self, *args):
+        return self.conn.executemany(*args)
+
+    def executescript(self, script: str):
+        return self.conn.executescript(script)
+
+    def __enter__(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
+
+def iter_results(store, task_id: str, start: int = 0, chunk_size: int = 200) -> Iterator[Dict[str, Any]]:
+    """
+    分块读取任务的检查结果，内存中只保留一块
+
+    每块单独读取，可以在不同线程中继续迭代（如 StreamingResponse 在线程池中迭代同步生成器）
+    """
+    while True:
+        chunk = store.get_results(task_id, start, chunk_size)
+        yield from chunk
+        if len(chunk) < chunk_size:
+            return
+        start += chunk_size
+
+def create_task_store(storage_dir: Path):
+    """
+    根据配置创建任务存储
+
+    多进程部署（WORKERS > 1）时强制使用 SQLite，避免各进程持有不一致的任务状态并覆盖同一个JSON文件
+    """
+    backend = settings.TASK_STORE_BACKEND
+    if backend not in TASK_STORE_BACKENDS:
+        raise ValueError(f"不支持的任务存储后端: {backend}")
+    if settings.WORKERS > 1 and backend == "json":
+        logger.warning(f"WORKERS={settings.WORKERS}，JSON任务存储不支持多进程，改用SQLite")
+        backend = "sqlite"
+    if backend == "sqlite":
+        return SqliteTaskStore(Path(settings.TASK_STORE_PATH) if settings.TASK_STORE_PATH else Path(storage_dir) / "tasks.db")
+    return JsonTaskStore(Path(storage_dir) / "quality_check_results.json")
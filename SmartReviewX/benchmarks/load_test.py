@@ -0,0 +1,233 @@
+"""
+API 压测工具
+
+以固定的目标RPS（开环到达）驱动 FastAPI 应用，统计每个接口的 p50/p95/p99 延迟、吞吐量和错误分布。
+默认在进程内通过 ASGI 直接驱动应用，并将所有LLM调用指向本地模拟服务（见 mock_llm_server.py），
+评价CSV和任务存储写入临时目录，不会污染仓库中的数据。
+
+使用方法（在 SmartReviewX 目录下）：
+    python -m benchmarks.mock_llm_server --port 9000 &
+    python -m benchmarks.load_test --llm-base-url http://127.0.0.1:9000/v1 --endpoint generate_reviews --rps 5 --duration 30
+
+也可以压测已部署的服务：
+    python -m benchmarks.load_test --base-url http://127.0.0.1:8000 --endpoint check_quality_batch --rps 2
+"""
+from typing import List, Dict, Any, Optional
+from collections import Counter, defaultdict
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+import httpx
+
+ENDPOINTS = ("generate_reviews", "enhance_reviews", "check_quality_batch")
+
+USER_BACKGROUND = {
+    "gender": "男",
+    "age": 30,
+    "occupation": "工程师",
+    "income_level": "中高收入",
+    "experience": "专家",
+    "tech_familiarity": "精通",
+    "purchase_purpose": "自用",
+    "region": "北京",
+    "education_level": "硕士",
+    "usage_frequency": "每天",
+    "brand_loyalty": "高"
+}
+
+PRODUCT_INFO = {
+    "name": "iPhone 15 Pro",
+    "category": "electronics",
+    "price_range": "高端",
+    "brand": "Apple",
+    "model_number": "A3096",
+    "specifications": {
+        "处理器": "A17 Pro",
+        "内存": "8GB",
+        "存储": "256GB",
+        "屏幕": "6.1英寸 Super Retina XDR"
+    },
+    "warranty_period": "1年",
+    "features": ["5G网络", "Pro相机系统", "钛金属边框"]
+}
+
+REVIEW = {
+    "user_background": USER_BACKGROUND,
+    "product_info": PRODUCT_INFO,
+    "rating": 5,
+    "content": (
+        "作为一名工程师，我对iPhone 15 Pro的性能和设计感到非常满意。A17 Pro处理器的运行速度令人印象深刻，"
+        "无论是日常使用还是运行专业应用都毫无压力。8GB的内存和256GB的存储空间完全满足我的需求，"
+        "Super Retina XDR屏幕的显示效果也非常出色。钛金属边框不仅美观，还增加了手机的耐用性。"
+        "5G网络的加入让我的网络体验更上一层楼，Pro相机系统的拍照效果也非常专业。电池续航表现良好，"
+        "能够支持我一天的高强度使用。总的来说，iPhone 15 Pro是一款非常适合技术精通用户的高端手机。"
+    ),
+    "sentiment": "积极",
+    "pros": ["A17 Pro处理器运行速度快", "屏幕显示效果出色"],
+    "cons": ["价格较高"],
+    "sentiment_score": 0.95,
+    "quality_score": 0.95
+}
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """线性插值计算分位数"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+class LoadTester:
+    """开环压测：按目标RPS发出请求，不受响应速度影响"""
+
+    def __init__(self, client: httpx.AsyncClient, batch_size: int, poll_interval: float, timeout: float):
+        self.client = client
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, Counter] = defaultdict(Counter)
+        self.sent: Counter = Counter()
+
+    async def _call(self, endpoint: str):
+        """发送一次请求；批量质量检查会轮询到任务结束，统计端到端延迟"""
+        if endpoint == "check_quality_batch":
+            response = await self.client.post(
+                "/check_quality_batch",
+                json={"reviews": [REVIEW] * self.batch_size, "generation_time": 0},
+                timeout=self.timeout
+            )
+            response.raise_for_status()
+            task_id = response.json()["task_id"]
+            while True:
+                await asyncio.sleep(self.poll_interval)
+                status = await self.client.get(f"/check_quality_batch/{task_id}", timeout=self.timeout)
+                status.raise_for_status()
+                body = status.json()
+                if body["status"] == "failed":
+                    raise RuntimeError("task_failed")
+                if body["status"] == "completed":
+                    return
+        response = await self.client.post(
+            f"/{endpoint}",
+            json={"user_background": USER_BACKGROUND, "product_info": PRODUCT_INFO, "num_reviews": 1},
+            timeout=self.timeout
+        )
+        response.raise_for_status()
+
+    async def _timed_call(self, endpoint: str):
+        self.sent[endpoint] += 1
+        start = time.perf_counter()
+        try:
+            await self._call(endpoint)
+            self.latencies[endpoint].append(time.perf_counter() - start)
+        except httpx.HTTPStatusError as e:
+            self.errors[endpoint][f"HTTP {e.response.status_code}"] += 1
+        except httpx.TimeoutException:
+            self.errors[endpoint]["timeout"] += 1
+        except Exception as e:
+            self.errors[endpoint][str(e) if isinstance(e, RuntimeError) else type(e).__name__] += 1
+
+    async def run(self, endpoints: List[str], rps: float, duration: float) -> Dict[str, Any]:
+        """按目标RPS轮流压测各接口，返回统计报告"""
+        tasks = []
+        total = int(rps * duration)
+        start = time.perf_counter()
+        for i in range(total):
+            # 开环调度：第i个请求在 start + i/rps 时刻发出
+            delay = start + i / rps - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(self._timed_call(endpoints[i % len(endpoints)])))
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - start
+        return self.report(endpoints, elapsed, rps)
+
+    def report(self, endpoints: List[str], elapsed: float, rps: float) -> Dict[str, Any]:
+        report = {"target_rps": rps, "elapsed_seconds": round(elapsed, 3), "endpoints": {}}
+        for endpoint in endpoints:
+            latencies = self.latencies[endpoint]
+            report["endpoints"][endpoint] = {
+                "sent": self.sent[endpoint],
+                "succeeded": len(latencies),
+                "failed": sum(self.errors[endpoint].values()),
+                "throughput_rps": round(len(latencies) / elapsed, 3) if elapsed else 0,
+                "latency_ms": {
+                    name: round(value * 1000, 1) if value is not None else None
+                    for name, value in (
+                        ("p50", percentile(latencies, 0.50)),
+                        ("p95", percentile(latencies, 0.95)),
+                        ("p99", percentile(latencies, 0.99)),
+                        ("max", max(latencies) if latencies else None)
+                    )
+                },
+                "errors": dict(self.errors[endpoint])
+            }
+        return report
+
+def _format_ms(value: Optional[float]) -> str:
+    return f"{value:.1f}" if value is not None else "-"
+
+def print_report(report: Dict[str, Any]):
+    print(f"目标RPS: {report['target_rps']}  实际耗时: {report['elapsed_seconds']}s")
+    header = f"{'endpoint':<22}{'sent':>6}{'ok':>6}{'fail':>6}{'rps':>8}{'p50':>10}{'p95':>10}{'p99':>10}  errors"
+    print(header)
+    print("-" * len(header))
+    for endpoint, item in report["endpoints"].items():
+        latency = item["latency_ms"]
+        print(
+            f"{endpoint:<22}{item['sent']:>6}{item['succeeded']:>6}{item['failed']:>6}{item['throughput_rps']:>8}"
+            f"{_format_ms(latency['p50']):>10}{_format_ms(latency['p95']):>10}{_format_ms(latency['p99']):>10}  {item['errors'] or ''}"
+        )
+
+def build_in_process_app(llm_base_url: str):
+    """在进程内加载后端应用，LLM调用指向模拟服务，数据写入临时目录"""
+    workdir = tempfile.mkdtemp(prefix="smartreviewx_load_test_")
+    for index in (1, 2, 3):
+        os.environ[f"OPENAI_API_BASE{index}"] = llm_base_url
+        os.environ[f"OPENAI_API_KEY{index}"] = "mock-key"
+    os.environ["BATCH_API_BASE"] = llm_base_url
+    os.environ["REVIEWS_SAVE_PATH"] = os.path.join(workdir, "reviews")
+    os.environ["STORAGE_PATH"] = os.path.join(workdir, "storage")
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from backend.service.routes import app
+    print(f"进程内压测，临时数据目录: {workdir}")
+    return app
+
+async def main_async(args):
+    if args.base_url:
+        client = httpx.AsyncClient(base_url=args.base_url)
+    else:
+        app = build_in_process_app(args.llm_base_url)
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://load-test")
+    async with client:
+        tester = LoadTester(client, args.batch_size, args.poll_interval, args.timeout)
+        report = await tester.run(args.endpoint, args.rps, args.duration)
+    print_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+def main(argv: Optional[list] = None):
+    parser = argparse.ArgumentParser(description="SmartReviewX API 压测工具")
+    parser.add_argument("--base-url", help="已部署服务的地址；不指定时在进程内驱动应用")
+    parser.add_argument("--llm-base-url", default="http://127.0.0.1:9000/v1", help="进程内模式下的LLM模拟服务地址")
+    parser.add_argument("--endpoint", action="append", choices=ENDPOINTS, help="压测的接口，可重复指定，默认全部")
+    parser.add_argument("--rps", type=float, default=2.0, help="目标每秒请求数")
+    parser.add_argument("--duration", type=float, default=30.0, help="压测时长（秒）")
+    parser.add_argument("--batch-size", type=int, default=5, help="批量质量检查每个任务的评价数量")
+    parser.add_argument("--poll-interval", type=float, default=0.5, help="批量质量检查结果轮询间隔（秒）")
+    parser.add_argument("--timeout", type=float, default=120.0, help="单次请求超时（秒）")
+    parser.add_argument("--output", help="将JSON报告写入该文件")
+    args = parser.parse_args(argv)
+    args.endpoint = args.endpoint or list(ENDPOINTS)
+    asyncio.run(main_async(args))
+
+if __name__ == "__main__":
+    main()
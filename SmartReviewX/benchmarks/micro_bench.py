@@ -0,0 +1,274 @@
+"""
+CPU 热点路径微基准测试
+
+覆盖每个请求中除LLM调用之外的CPU开销：类别提示词渲染、质量检查提示词渲染、GeneratedReview 构建、
+ReviewSaver._review_to_dict 与 DataFrame 构建、LLM响应的容错解析与JSON解析、任务存储写入。
+结果可以保存为基线，之后的运行与基线对比并输出变化报告，用于证明优化效果或发现性能回退。
+
+使用方法（在 SmartReviewX 目录下）：
+    python -m benchmarks.micro_bench                      # 运行并与基线对比
+    python -m benchmarks.micro_bench --save-baseline      # 运行并保存为新的基线
+    python -m benchmarks.micro_bench -k prompt            # 只运行名称包含 prompt 的用例
+"""
+from typing import Callable, Dict, Any, List, Optional
+from pathlib import Path
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import timeit
+
+BASELINE_FILE = Path(__file__).parent / "baselines" / "micro_bench.json"
+
+# 基准测试用例注册表: 名称 -> 构建函数（返回被测的无参可调用对象）
+BENCHMARKS: Dict[str, Callable[[], Callable[[], Any]]] = {}
+
+def benchmark(name: str):
+    """注册基准测试用例"""
+    def decorator(setup: Callable[[], Callable[[], Any]]):
+        BENCHMARKS[name] = setup
+        return setup
+    return decorator
+
+def _prepare_environment():
+    """将评价CSV和任务存储指向临时目录，避免污染仓库数据"""
+    workdir = tempfile.mkdtemp(prefix="smartreviewx_micro_bench_")
+    os.environ["REVIEWS_SAVE_PATH"] = os.path.join(workdir, "reviews")
+    os.environ["STORAGE_PATH"] = os.path.join(workdir, "storage")
+    for index in (1, 2, 3):
+        os.environ[f"OPENAI_API_KEY{index}"] = "bench-key"
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+CATEGORIES = ["electronics", "daily_necessities", "food_beverage", "clothing", "home_appliance", "stationery"]
+
+REVIEW_CONTENT = (
+    "作为一名工程师，我对iPhone 15 Pro的性能和设计感到非常满意。A17 Pro处理器的运行速度令人印象深刻，"
+    "无论是日常使用还是运行专业应用都毫无压力。8GB的内存和256GB的存储空间完全满足我的需求，"
+    "Super Retina XDR屏幕的显示效果也非常出色。钛金属边框不仅美观，还增加了手机的耐用性。"
+    "5G网络的加入让我的网络体验更上一层楼，Pro相机系统的拍照效果也非常专业。电池续航表现良好，"
+    "能够支持我一天的高强度使用。散热方面，即使在长时间使用高性能应用时，手机也只是微温，表现令人满意。"
+    "Apple的售后服务一直很可靠，1年的保修期也让我购买时更加放心。总的来说，iPhone 15 Pro是一款非常适合技术精通用户的高端手机。"
+)
+
+def _user_background():
+    from backend.models.data_model import UserBackground
+    return UserBackground(
+        gender="男", age=30, occupation="工程师", income_level="中高收入", experience="专家",
+        tech_familiarity="精通", purchase_purpose="自用", region="北京", education_level="硕士",
+        usage_frequency="每天", brand_loyalty="高"
+    )
+
+def _product_info(category: str = "electronics", spec_count: int = 12, feature_count: int = 10):
+    from backend.models.data_model import ProductInfo
+    return ProductInfo(
+        name="iPhone 15 Pro", category=category, price_range="高端", brand="Apple", model_number="A3096",
+        specifications={f"规格项{i}": f"参数值{i} 详细说明" for i in range(spec_count)},
+        warranty_period="1年", material="钛金属", weight="187g", dimensions="146.6×70.6×8.25mm",
+        package_info="环保纸盒包装", safety_certifications=["3C认证", "CE认证"],
+        usage_instructions="首次使用前请充满电",
+        features=[f"特点{i}" for i in range(feature_count)]
+    )
+
+def _review_payload() -> Dict[str, Any]:
+    return {
+        "rating": 5,
+        "content": REVIEW_CONTENT,
+        "sentiment": "积极",
+        "experience": "使用一个月，整体体验良好",
+        "pros": ["A17 Pro处理器运行速度快", "屏幕显示效果出色", "钛金属边框美观耐用", "5G网络体验优秀"],
+        "cons": ["价格较高"],
+        "sentiment_score": 0.95,
+        "quality_score": 0.95
+    }
+
+def _generated_review():
+    from backend.models.data_model import GeneratedReview
+    return GeneratedReview(user_background=_user_background(), product_info=_product_info(), **_review_payload())
+
+for _category in CATEGORIES:
+    def _make_prompt_bench(category=_category):
+        from backend.models.category_prompts import PromptTemplateFactory
+        template = PromptTemplateFactory.create_template(category)
+        user_background, product_info = _user_background(), _product_info(category)
+        return lambda: template.generate_review_prompt(user_background, product_info)
+    benchmark(f"category_prompt[{_category}]")(_make_prompt_bench)
+
+@benchmark("check_prompts[all]")
+def bench_check_prompts():
+    from backend.models.check_prompt import CheckPromptTemplate
+    template = CheckPromptTemplate()
+    user_background = _user_background()
+    scores = {"真实性": 4.5, "一致性": 4.0, "具体性": 4.5, "语言自然度": 5.0}
+    def run():
+        template.check_authenticity_prompt(REVIEW_CONTENT, user_background)
+        template.check_consistency_prompt(REVIEW_CONTENT)
+        template.check_specificity_prompt(REVIEW_CONTENT)
+        template.check_language_naturalness_prompt(REVIEW_CONTENT)
+        template.generate_analysis_prompt(REVIEW_CONTENT, scores)
+    return run
+
+@benchmark("generated_review[construct]")
+def bench_generated_review():
+    from backend.models.data_model import GeneratedReview
+    user_background, product_info = _user_background(), _product_info()
+    payload = _review_payload()
+    return lambda: GeneratedReview(user_background=user_background, product_info=product_info, **payload)
+
+@benchmark("review_saver[to_dict x10]")
+def bench_review_to_dict():
+    from backend.utils.review_saver import ReviewSaver
+    saver = ReviewSaver()
+    reviews = [_generated_review() for _ in range(10)]
+    return lambda: [saver._review_to_dict(review) for review in reviews]
+
+@benchmark("review_saver[dataframe x10]")
+def bench_review_dataframe():
+    import pandas as pd
+    from backend.utils.review_saver import ReviewSaver
+    saver = ReviewSaver()
+    reviews = [_generated_review() for _ in range(10)]
+    return lambda: pd.DataFrame([saver._review_to_dict(review) for review in reviews])
+
+@benchmark("review_saver[append x10]")
+def bench_review_append():
+    from backend.utils.review_saver import ReviewSaver
+    saver = ReviewSaver()
+    reviews = [_generated_review() for _ in range(10)]
+    return lambda: saver.save_reviews(reviews, "bench")
+
+@benchmark("response_parser[generation x4]")
+def bench_parse_generation():
+    from backend.utils.response_parser import review_response_parser
+    content = json.dumps(_review_payload(), ensure_ascii=False, indent=2)
+    # 模型输出的常见形态：合法JSON、前有说明文字并被代码块包裹、数值带单位、被 max_tokens 截断
+    samples = [
+        content,
+        f"好的，以下是为您生成的评价：\n```json\n{content}\n```",
+        content.replace('"rating": 5', '"rating": "5分"'),
+        content[:int(len(content) * 0.8)]
+    ]
+    def run():
+        for sample in samples:
+            review_response_parser.parse(sample)
+    return run
+
+@benchmark("json_parse[check x4 + analysis]")
+def bench_parse_check():
+    check = json.dumps({"score": 4.5, "reason": "评价内容与用户背景相符，语气自然，重点突出，体现了用户的使用习惯和品牌偏好"}, ensure_ascii=False)
+    analysis = json.dumps({"analysis": ["评价真实可信，充分体现了用户的教育背景和职业特点"] * 4}, ensure_ascii=False)
+    def run():
+        for _ in range(4):
+            json.loads(check)
+        json.loads(analysis)
+    return run
+
+def _task_record(index: int) -> Dict[str, Any]:
+    result = {
+        "scores": {"真实性": 5, "一致性": 5, "具体性": 4.5, "语言自然度": 5},
+        "overall_score": 4.875,
+        "analysis": ["评价真实可信，充分体现了用户的教育背景和职业特点，特别是对高性能手机的需求和评价"] * 4
+    }
+    return {
+        "status": "completed",
+        "total_reviews": 10,
+        "processed_reviews": 10,
+        "results": [result] * 10,
+        "start_time": "2025-05-22T22:54:50.143553",
+        "end_time": "2025-05-22T22:55:50.143553"
+    }
+
+@benchmark("save_storage[100 tasks x 10 results]")
+def bench_save_storage():
+    from backend.utils.task_store import JsonTaskStore
+    store = JsonTaskStore(Path(tempfile.mkdtemp(prefix="smartreviewx_micro_bench_")) / "quality_check_results.json")
+    for i in range(100):
+        store._tasks[f"task-{i}"] = _task_record(i)
+    return store.save
+
+@benchmark("sqlite_store[add_result]")
+def bench_sqlite_add_result():
+    from backend.utils.task_store import SqliteTaskStore
+    store = SqliteTaskStore(Path(tempfile.mkdtemp(prefix="smartreviewx_micro_bench_")) / "tasks.db")
+    record = _task_record(0)
+    store.create("task-0", dict(record, results=[]))
+    result = record["results"][0]
+    return lambda: store.add_result("task-0", 0, result, processed_reviews=1)
+
+def measure(func: Callable[[], Any], repeat: int, min_time: float) -> Dict[str, float]:
+    """测量单次调用耗时（微秒），自动确定每轮循环次数"""
+    timer = timeit.Timer(func)
+    number = 1
+    while timer.timeit(number) < min_time:
+        number *= 2
+    samples = [t / number * 1e6 for t in timer.repeat(repeat=repeat, number=number)]
+    return {
+        "min_us": round(min(samples), 3),
+        "median_us": round(statistics.median(samples), 3),
+        "mean_us": round(statistics.mean(samples), 3),
+        "stdev_us": round(statistics.stdev(samples), 3) if len(samples) > 1 else 0.0,
+        "loops": number,
+        "rounds": repeat
+    }
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """输出与基线的对比报告，返回超过阈值的回退用例"""
+    regressions = []
+    print(f"{'benchmark':<40}{'baseline(us)':>14}{'current(us)':>14}{'change':>10}")
+    print("-" * 78)
+    for name, stats in results.items():
+        base = baseline.get("results", {}).get(name)
+        if not base:
+            print(f"{name:<40}{'-':>14}{stats['median_us']:>14.2f}{'new':>10}")
+            continue
+        change = (stats["median_us"] - base["median_us"]) / base["median_us"]
+        flag = ""
+        if change > threshold:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        elif change < -threshold:
+            flag = "  faster"
+        print(f"{name:<40}{base['median_us']:>14.2f}{stats['median_us']:>14.2f}{change:>+10.1%}{flag}")
+    return regressions
+
+def main(argv: Optional[list] = None):
+    parser = argparse.ArgumentParser(description="CPU热点路径微基准测试")
+    parser.add_argument("-k", dest="keyword", help="只运行名称包含该关键字的用例")
+    parser.add_argument("--repeat", type=int, default=7, help="每个用例的测量轮数")
+    parser.add_argument("--min-time", type=float, default=0.05, help="每轮最少耗时（秒）")
+    parser.add_argument("--save-baseline", action="store_true", help="将本次结果保存为基线")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_FILE, help="基线文件路径")
+    parser.add_argument("--threshold", type=float, default=0.10, help="判定为回退的中位数变化比例")
+    args = parser.parse_args(argv)
+
+    _prepare_environment()
+
+    results = {}
+    for name, setup in BENCHMARKS.items():
+        if args.keyword and args.keyword not in name:
+            continue
+        results[name] = measure(setup(), args.repeat, args.min_time)
+
+    if args.save_baseline:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({
+                "machine": {"python": platform.python_version(), "platform": platform.platform(), "processor": platform.processor()},
+                "results": results
+            }, f, ensure_ascii=False, indent=2)
+        print(f"基线已保存: {args.baseline}")
+
+    baseline = {}
+    if args.baseline.exists() and not args.save_baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"\n{len(regressions)} 个用例相对基线变慢超过 {args.threshold:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+"""
+确定性的本地 OpenAI 兼容模拟服务
+
+用于在不消耗真实 token 的情况下压测 /generate_reviews、/enhance_reviews、/check_quality_batch。
+根据系统提示词判断调用方（评价生成、质量检查、质量分析、评价增强），返回格式正确的JSON内容。
+相同种子下，同一请求体第N次出现时总是得到相同的延迟、错误注入结果和响应内容。
+
+使用方法（在 SmartReviewX 目录下）：
+    python -m benchmarks.mock_llm_server --port 9000 --latency-dist lognormal --latency-mean 800 --error-rate 0.01 --rate-limit-rate 0.02
+
+然后将后端指向模拟服务：
+    OPENAI_API_BASE1=http://127.0.0.1:9000/v1 OPENAI_API_BASE2=http://127.0.0.1:9000/v1 OPENAI_API_BASE3=http://127.0.0.1:9000/v1
+"""
+from fastapi import FastAPI, Request, UploadFile, File, Form
+from fastapi.responses import JSONResponse, PlainTextResponse
+from typing import Dict, Any, Optional
+from dataclasses import dataclass
+from collections import Counter
+from uuid import uuid4
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import random
+import re
+import time
+import uvicorn
+
+@dataclass
+class MockConfig:
+    """模拟服务配置"""
+    latency_dist: str = "lognormal"  # fixed / uniform / normal / lognormal
+    latency_mean: float = 500.0  # 毫秒
+    latency_sigma: float = 0.5  # normal 时为相对标准差，lognormal 时为对数标准差，uniform 时为相对半宽
+    error_rate: float = 0.0  # 返回500的概率
+    rate_limit_rate: float = 0.0  # 返回429的概率
+    completion_tokens: int = 0  # 固定的 completion token 数，0 表示按返回内容估算
+    seed: int = 42
+
+config = MockConfig()
+stats = Counter()
+
+app = FastAPI(title="Mock LLM Server")
+
+REVIEW_CONTENT = (
+    "作为一名经常使用这类产品的用户，这次购买的{name}整体表现让我比较满意。"
+    "收到货后第一时间上手体验，做工扎实，细节处理到位，和商品描述基本一致。"
+    "日常使用了两周左右，核心功能稳定可靠，没有出现明显的故障或者异常情况，"
+    "操作逻辑也比较直观，家里老人上手也不算困难。和之前用过的同价位产品相比，"
+    "它在使用体验上有一定优势，尤其是细节上的打磨能看出厂家的用心。"
+    "不足之处在于价格略高，部分配件需要单独购买，包装也可以再环保一些。"
+    "总体来说这是一款值得考虑的产品，适合对品质有要求、预算相对充足的用户。"
+)
+
+# 多候选生成提示词中的评价条数
+MULTI_REVIEW_PATTERN = re.compile(r"生成(\d+)条互不相同的评价")
+
+# 每个请求体出现的次数，保证重复请求得到不同但可复现的结果
+occurrences = Counter()
+
+def _rng(body: bytes) -> random.Random:
+    """基于种子、请求体及其出现次数创建确定性的随机数生成器"""
+    body_digest = hashlib.sha256(body).hexdigest()
+    occurrences[body_digest] += 1
+    digest = hashlib.sha256(f"{config.seed}:{body_digest}:{occurrences[body_digest]}".encode()).hexdigest()
+    return random.Random(int(digest[:16], 16))
+
+def _sample_latency(rng: random.Random) -> float:
+    """按配置的分布采样延迟（秒）"""
+    mean = config.latency_mean
+    if config.latency_dist == "fixed":
+        latency = mean
+    elif config.latency_dist == "uniform":
+        latency = rng.uniform(mean * (1 - config.latency_sigma), mean * (1 + config.latency_sigma))
+    elif config.latency_dist == "normal":
+        latency = rng.gauss(mean, mean * config.latency_sigma)
+    else:
+        # 对数正态分布，保证期望为 latency_mean
+        mu = math.log(mean) - config.latency_sigma ** 2 / 2
+        latency = rng.lognormvariate(mu, config.latency_sigma)
+    return max(latency, 0.0) / 1000
+
+def _estimate_tokens(text: str) -> int:
+    """粗略估算token数"""
+    return max(1, int(len(text) / 1.5))
+
+def _extract_product_name(prompt: str) -> str:
+    for line in prompt.splitlines():
+        line = line.strip()
+        if line.startswith("- 名称：") or line.startswith("产品名称："):
+            return line.split("：", 1)[1].strip()
+    return "这款产品"
+
+def _build_content(messages: list, rng: random.Random) -> str:
+    """根据调用方的系统提示词构建响应内容"""
+    system_prompt = messages[0].get("content", "") if messages else ""
+    user_prompt = messages[-1].get("content", "") if messages else ""
+
+    if "质量检查" in system_prompt:
+        score = rng.choice([3, 3.5, 4, 4.5, 5])
+        return json.dumps({"score": score, "reason": "模拟评分：评价内容较为具体，表达自然"}, ensure_ascii=False)
+
+    if "质量分析" in system_prompt:
+        return json.dumps({"analysis": [
+            "评价内容与用户背景基本匹配",
+            "观点前后一致，逻辑连贯",
+            "包含一定的使用场景和体验细节",
+            "语言表达自然流畅"
+        ]}, ensure_ascii=False)
+
+    if "融入" in system_prompt:
+        return json.dumps({
+            "enhanced_content": REVIEW_CONTENT.format(name=_extract_product_name(user_prompt)),
+            "added_info": ["模拟补充信息：市场定位为中高端"],
+            "confidence_score": 0.8,
+            "pros": ["做工扎实", "功能稳定"],
+            "cons": ["价格略高"]
+        }, ensure_ascii=False)
+
+    if "网络搜索" in system_prompt:
+        return "模拟搜索结果：该产品近期用户反馈整体积极，主要关注点为做工和性价比。"
+
+    # 多候选生成：提示词要求一次返回多条评价
+    multi = MULTI_REVIEW_PATTERN.search(user_prompt)
+    if multi:
+        reviews = [_build_review(user_prompt, rng) for _ in range(int(multi.group(1)))]
+        return json.dumps({"reviews": reviews}, ensure_ascii=False)
+    return json.dumps(_build_review(user_prompt, rng), ensure_ascii=False)
+
+def _build_review(user_prompt: str, rng: random.Random) -> Dict[str, Any]:
+    rating = rng.choice([3, 4, 4, 5, 5])
+    return {
+        "rating": rating,
+        "content": REVIEW_CONTENT.format(name=_extract_product_name(user_prompt)),
+        "sentiment": "积极" if rating >= 4 else "中性",
+        "experience": "使用两周，整体体验良好",
+        "pros": ["做工扎实", "功能稳定", "操作直观"],
+        "cons": ["价格略高", "配件需单独购买"],
+        "sentiment_score": round(rng.uniform(0.8, 0.95), 2),
+        "quality_score": round(rng.uniform(0.8, 0.95), 2)
+    }
+
+def _completion(payload: Dict[str, Any], rng: random.Random) -> Dict[str, Any]:
+    """构建 chat.completions 响应体，支持 n 参数返回多个 choices"""
+    messages = payload.get("messages", [])
+    contents = [_build_content(messages, rng) for _ in range(payload.get("n") or 1)]
+    prompt_tokens = sum(_estimate_tokens(str(message.get("content", ""))) for message in messages)
+    completion_tokens = sum(config.completion_tokens or _estimate_tokens(content) for content in contents)
+    return {
+        "id": f"chatcmpl-{uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": payload.get("model", "mock-model"),
+        "choices": [
+            {
+                "index": index,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop"
+            }
+            for index, content in enumerate(contents)
+        ],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens
+        }
+    }
+
+@app.post("/chat/completions")
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.body()
+    rng = _rng(body)
+    stats["requests"] += 1
+
+    await asyncio.sleep(_sample_latency(rng))
+
+    roll = rng.random()
+    if roll < config.rate_limit_rate:
+        stats["rate_limited"] += 1
+        return JSONResponse(
+            status_code=429,
+            content={"error": {"message": "Rate limit reached (mock)", "type": "rate_limit_error"}},
+            headers={"Retry-After": "1"}
+        )
+    if roll < config.rate_limit_rate + config.error_rate:
+        stats["errors"] += 1
+        return JSONResponse(
+            status_code=500,
+            content={"error": {"message": "Internal error (mock)", "type": "server_error"}}
+        )
+
+    response = _completion(json.loads(body or b"{}"), rng)
+    stats["completion_tokens"] += response["usage"]["completion_tokens"]
+    stats["prompt_tokens"] += response["usage"]["prompt_tokens"]
+    return response
+
+# 批处理接口（/files + /batches），批处理任务在创建时立即完成
+files: Dict[str, bytes] = {}
+batches: Dict[str, Dict[str, Any]] = {}
+
+@app.post("/files")
+@app.post("/v1/files")
+async def upload_file(file: UploadFile = File(...), purpose: str = Form(...)):
+    file_id = f"file-{uuid4().hex}"
+    files[file_id] = await file.read()
+    return {"id": file_id, "object": "file", "purpose": purpose, "bytes": len(files[file_id])}
+
+@app.get("/files/{file_id}/content")
+@app.get("/v1/files/{file_id}/content")
+async def file_content(file_id: str):
+    if file_id not in files:
+        return JSONResponse(status_code=404, content={"error": {"message": "file not found"}})
+    return PlainTextResponse(files[file_id].decode("utf-8"))
+
+@app.post("/batches")
+@app.post("/v1/batches")
+async def create_batch(request: Request):
+    payload = await request.json()
+    lines = files.get(payload["input_file_id"], b"").decode("utf-8").splitlines()
+    outputs = []
+    for line in filter(None, lines):
+        item = json.loads(line)
+        response = _completion(item["body"], _rng(line.encode("utf-8")))
+        outputs.append(json.dumps({
+            "id": f"batch_req_{uuid4().hex}",
+            "custom_id": item["custom_id"],
+            "response": {"status_code": 200, "body": response},
+            "error": None
+        }, ensure_ascii=False))
+    output_file_id = f"file-{uuid4().hex}"
+    files[output_file_id] = "\n".join(outputs).encode("utf-8")
+    batch_id = f"batch_{uuid4().hex}"
+    batches[batch_id] = {
+        "id": batch_id,
+        "object": "batch",
+        "status": "completed",
+        "output_file_id": output_file_id,
+        "request_counts": {"total": len(outputs), "completed": len(outputs), "failed": 0}
+    }
+    stats["batches"] += 1
+    return batches[batch_id]
+
+@app.get("/batches/{batch_id}")
+@app.get("/v1/batches/{batch_id}")
+async def retrieve_batch(batch_id: str):
+    if batch_id not in batches:
+        return JSONResponse(status_code=404, content={"error": {"message": "batch not found"}})
+    return batches[batch_id]
+
+@app.get("/stats")
+async def get_stats():
+    """模拟服务的调用统计"""
+    return dict(stats)
+
+def main(argv: Optional[list] = None):
+    parser = argparse.ArgumentParser(description="确定性的本地 OpenAI 兼容模拟服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--latency-dist", choices=["fixed", "uniform", "normal", "lognormal"], default=config.latency_dist)
+    parser.add_argument("--latency-mean", type=float, default=config.latency_mean, help="平均延迟（毫秒）")
+    parser.add_argument("--latency-sigma", type=float, default=config.latency_sigma)
+    parser.add_argument("--error-rate", type=float, default=config.error_rate, help="返回500的概率")
+    parser.add_argument("--rate-limit-rate", type=float, default=config.rate_limit_rate, help="返回429的概率")
+    parser.add_argument("--completion-tokens", type=int, default=config.completion_tokens, help="固定的completion token数，0表示按内容估算")
+    parser.add_argument("--seed", type=int, default=config.seed)
+    args = parser.parse_args(argv)
+
+    config.latency_dist = args.latency_dist
+    config.latency_mean = args.latency_mean
+    config.latency_sigma = args.latency_sigma
+    config.error_rate = args.error_rate
+    config.rate_limit_rate = args.rate_limit_rate
+    config.completion_tokens = args.completion_tokens
+    config.seed = args.seed
+
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()